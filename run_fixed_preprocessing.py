@@ -10,7 +10,9 @@ sys.path.insert(0, str(project_root))
 
 from src.preprocessor.uci import UCIPreprocessor
 from src.preprocessor.ai import AIPreprocessor
+from src.profiling import profiled
 
+@profiled('run_fixed_preprocessing')
 def main():
     print("="*70)
     print("RUNNING FIXED PREPROCESSING WITH TEMPORAL VALIDATION")
@@ -1,15 +1,57 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from typing import Dict, List, Tuple
 from scipy import stats
+from report_renderer import ReportRenderer
+
+
+def draw_course_overview(fig, target_col, grades, class_dist, box_df, correlations, top_correlations):
+    """Five-panel overview of the AI course dataset"""
+    import seaborn as sns
+    
+    # 1. Grade Distribution
+    ax = fig.add_subplot(2, 3, 1)
+    sns.histplot(x=grades, bins=20, ax=ax)
+    ax.set_xlabel(target_col)
+    ax.set_title('Distribution of Final Grades')
+    
+    # 2. Class Balance Pie Chart
+    ax = fig.add_subplot(2, 3, 2)
+    ax.pie(class_dist.values, labels=class_dist.index, autopct='%1.1f%%')
+    ax.set_title('Grade Categories Distribution')
+    
+    # 3. Box Plots
+    ax = fig.add_subplot(2, 3, 3)
+    box_df.boxplot(ax=ax)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.set_title('Key Features Distribution')
+    
+    # 4. Correlation Heatmap
+    ax = fig.add_subplot(2, 3, 4)
+    sns.heatmap(
+        correlations,
+        annot=True,
+        fmt='.2f',
+        cmap='coolwarm',
+        ax=ax
+    )
+    ax.set_title('Feature Correlations')
+    
+    # 5. Feature Importance (based on correlation with target)
+    ax = fig.add_subplot(2, 3, 5)
+    pd.Series(top_correlations).plot(kind='bar', ax=ax)
+    ax.set_title('Top 5 Correlated Features')
+    ax.tick_params(axis='x', labelrotation=45)
+    
+    fig.tight_layout()
+
 
 class AICourseAnalyzer:
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.df = None
         self.analysis_results = {}
+        self.renderer = ReportRenderer()
         
     def load_data(self) -> None:
         """Load dataset and handle basic preprocessing"""
@@ -103,49 +145,26 @@ class AICourseAnalyzer:
         self.analysis_results['outliers'] = outliers
         
     def create_visualizations(self) -> None:
-        """Generate all required visualizations"""
-        plt.style.use('seaborn')
-        fig = plt.figure(figsize=(20, 15))
-        
-        # 1. Grade Distribution
-        plt.subplot(2, 3, 1)
+        """Queue all required visualizations (rendered by render_figures)"""
         target_col = [col for col in self.df.columns if 'final' in col.lower() or 'grade' in col.lower()][0]
-        sns.histplot(data=self.df, x=target_col, bins=20)
-        plt.title('Distribution of Final Grades')
-        
-        # 2. Class Balance Pie Chart
-        plt.subplot(2, 3, 2)
-        class_dist = self.df['grade_category'].value_counts()
-        plt.pie(class_dist.values, labels=class_dist.index, autopct='%1.1f%%')
-        plt.title('Grade Categories Distribution')
-        
-        # 3. Box Plots
-        plt.subplot(2, 3, 3)
         numerical_cols = self.df.select_dtypes(include=[np.number]).columns[:5]  # First 5 numerical columns
-        self.df[numerical_cols].boxplot()
-        plt.xticks(rotation=45)
-        plt.title('Key Features Distribution')
-        
-        # 4. Correlation Heatmap
-        plt.subplot(2, 3, 4)
-        sns.heatmap(
-            self.analysis_results['correlations'],
-            annot=True,
-            fmt='.2f',
-            cmap='coolwarm'
-        )
-        plt.title('Feature Correlations')
-        
-        # 5. Feature Importance (based on correlation with target)
-        plt.subplot(2, 3, 5)
-        top_corr = pd.Series(self.analysis_results['top_correlations'])
-        top_corr.plot(kind='bar')
-        plt.title('Top 5 Correlated Features')
-        plt.xticks(rotation=45)
         
-        plt.tight_layout()
-        plt.savefig('ai_course_analysis.png')
-        plt.close()
+        self.renderer.add(
+            draw_course_overview,
+            'ai_course_analysis.png',
+            figsize=(20, 15),
+            style='seaborn-v0_8',
+            target_col=target_col,
+            grades=self.df[target_col].to_numpy(),
+            class_dist=self.df['grade_category'].value_counts(),
+            box_df=self.df[numerical_cols],
+            correlations=self.analysis_results['correlations'],
+            top_correlations=self.analysis_results['top_correlations']
+        )
+    
+    def render_figures(self) -> None:
+        """Render queued visualizations once the analysis is complete"""
+        self.renderer.render()
         
     def save_report(self) -> None:
         """Save analysis report to file"""
@@ -216,6 +235,7 @@ def main():
     
     print("Saving analysis report...")
     analyzer.save_report()
+    analyzer.render_figures()
     
     print("\nAnalysis complete! Check 'AI_Course_dataset_analysis.txt' and 'ai_course_analysis.png'")
 
@@ -0,0 +1,231 @@
+"""
+Queues of "attempt completed" events
+
+When a quiz attempt is saved, the submitting service (or the scoring
+server's /api/ml/attempt-completed endpoint) puts an event with the fields
+of the saved quiz_attempts row on one of these queues; the incremental
+scorer (incremental_scoring.py) consumes it in batches.
+
+Both queues offer put, get_batch, ack and retry:
+
+- InProcessEventQueue: producer and consumer in the same process;
+- SQLiteEventQueue: durable, in a SQLite file shared between processes.
+
+retry() counts a failed attempt per event and holds the event back for an
+exponentially growing delay (retry_base_seconds * 2**(failures - 1), at most
+retry_max_seconds); get_batch() skips events that are not due yet, so one
+failing event does not hot-loop the consumer or block the events behind it.
+After max_attempts failures the event is dead-lettered: moved to
+dead_letters() (in memory, or the attempt_events_dead table for SQLite)
+instead of being retried again.
+
+This module only needs the standard library, so producers can import it
+without the scoring dependencies.
+"""
+import heapq
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Fields of an "attempt completed" event; the quiz_attempts row that was just saved
+ATTEMPT_EVENT_FIELDS = [
+    'attempt_id', 'user_id', 'topic_id', 'total_questions', 'correct_answers',
+    'score_percentage', 'time_taken_seconds', 'completed_at'
+]
+# Optional per-response summary of the attempt (from quiz_responses)
+OPTIONAL_EVENT_FIELDS = ['responses', 'correct_responses', 'avg_response_seconds']
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+
+def retry_delay(failures: int, base: float = RETRY_BASE_SECONDS, cap: float = RETRY_MAX_SECONDS) -> float:
+    """Seconds to hold an event back after its failures-th failed attempt"""
+    return min(cap, base * 2 ** (failures - 1))
+
+
+def validate_event(event: Dict) -> Dict:
+    """Check an event has the required fields; returns it with enqueued_at set"""
+    missing = [field for field in ATTEMPT_EVENT_FIELDS if event.get(field) is None]
+    if missing:
+        raise ValueError(f"Attempt event is missing fields: {missing}")
+    return {**event, 'enqueued_at': event.get('enqueued_at') or time.time()}
+
+
+class InProcessEventQueue:
+    """
+    Event queue for a producer and the scorer running in the same process
+
+    The handle of each batch item is the number of failed attempts so far.
+    """
+
+    def __init__(self, maxsize: int = 0, max_attempts: int = MAX_ATTEMPTS,
+                 retry_base_seconds: float = RETRY_BASE_SECONDS, retry_max_seconds: float = RETRY_MAX_SECONDS):
+        self._queue = queue.Queue(maxsize)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        # (due time, tie-breaker, failures, event) of events waiting out their backoff
+        self._delayed: List[Tuple[float, int, int, Dict]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._dead_letters: List[Dict] = []
+
+    def put(self, event: Dict):
+        self._queue.put(validate_event(event))
+
+    def _due(self, max_items: int) -> List[Tuple[int, Dict]]:
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            while self._delayed and self._delayed[0][0] <= now and len(batch) < max_items:
+                _, _, failures, event = heapq.heappop(self._delayed)
+                batch.append((failures, event))
+        return batch
+
+    def get_batch(self, max_items: int, timeout: float) -> List[Tuple[int, Dict]]:
+        """Wait up to timeout for one event, then take whatever else is queued or due"""
+        batch = self._due(max_items)
+        if not batch:
+            with self._lock:
+                if self._delayed:
+                    timeout = min(timeout, max(0.0, self._delayed[0][0] - time.monotonic()))
+            try:
+                batch = [(0, self._queue.get(timeout=timeout))]
+            except queue.Empty:
+                return self._due(max_items)
+        while len(batch) < max_items:
+            try:
+                batch.append((0, self._queue.get_nowait()))
+            except queue.Empty:
+                break
+        return batch
+
+    def ack(self, batch: List[Tuple[int, Dict]]):
+        pass
+
+    def retry(self, batch: List[Tuple[int, Dict]], error: Optional[str] = None) -> int:
+        """Back off each event, or dead-letter it after max_attempts; returns the number dead-lettered"""
+        dead = 0
+        with self._lock:
+            for failures, event in batch:
+                failures += 1
+                if failures >= self.max_attempts:
+                    self._dead_letters.append({**event, 'failures': failures, 'error': error})
+                    dead += 1
+                    continue
+                due = time.monotonic() + retry_delay(failures, self.retry_base_seconds, self.retry_max_seconds)
+                heapq.heappush(self._delayed, (due, next(self._sequence), failures, event))
+        return dead
+
+    def dead_letters(self) -> List[Dict]:
+        """Events that failed max_attempts times, with their failure count and last error"""
+        with self._lock:
+            return list(self._dead_letters)
+
+
+class SQLiteEventQueue:
+    """
+    Durable event queue in a SQLite file, shared between processes
+
+    Producers append rows; a single consumer reads due rows in event_id order
+    and deletes them once they are processed (at-least-once delivery).
+    """
+
+    def __init__(self, path, poll_interval: float = 0.05, max_attempts: int = MAX_ATTEMPTS,
+                 retry_base_seconds: float = RETRY_BASE_SECONDS, retry_max_seconds: float = RETRY_MAX_SECONDS):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            # WAL lets producers append while the consumer reads
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS attempt_events ("
+                "event_id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+                "failures INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL DEFAULT 0)"
+            )
+            # Queue files created before retries were counted
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(attempt_events)")}
+            if 'failures' not in columns:
+                self._connection.execute(
+                    "ALTER TABLE attempt_events ADD COLUMN failures INTEGER NOT NULL DEFAULT 0")
+                self._connection.execute(
+                    "ALTER TABLE attempt_events ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS attempt_events_dead ("
+                "event_id INTEGER PRIMARY KEY, payload TEXT NOT NULL, failures INTEGER NOT NULL, "
+                "error TEXT, failed_at REAL NOT NULL)"
+            )
+
+    def put(self, event: Dict):
+        payload = json.dumps(validate_event(event))
+        with self._lock, self._connection:
+            self._connection.execute("INSERT INTO attempt_events (payload) VALUES (?)", (payload,))
+
+    def get_batch(self, max_items: int, timeout: float) -> List[Tuple[int, Dict]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT event_id, payload FROM attempt_events WHERE not_before <= ? "
+                    "ORDER BY event_id LIMIT ?", (time.time(), max_items)
+                ).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(event_id, json.loads(payload)) for event_id, payload in rows]
+            time.sleep(self.poll_interval)
+
+    def ack(self, batch: List[Tuple[int, Dict]]):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM attempt_events WHERE event_id = ?", [(event_id,) for event_id, _ in batch]
+            )
+
+    def retry(self, batch: List[Tuple[int, Dict]], error: Optional[str] = None) -> int:
+        """Back off each event, or dead-letter it after max_attempts; returns the number dead-lettered"""
+        now = time.time()
+        dead = 0
+        with self._lock, self._connection:
+            for event_id, _ in batch:
+                row = self._connection.execute(
+                    "SELECT payload, failures FROM attempt_events WHERE event_id = ?", (event_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                payload, failures = row[0], row[1] + 1
+                if failures >= self.max_attempts:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO attempt_events_dead (event_id, payload, failures, error, failed_at) "
+                        "VALUES (?, ?, ?, ?, ?)", (event_id, payload, failures, error, now)
+                    )
+                    self._connection.execute("DELETE FROM attempt_events WHERE event_id = ?", (event_id,))
+                    dead += 1
+                    continue
+                self._connection.execute(
+                    "UPDATE attempt_events SET failures = ?, not_before = ? WHERE event_id = ?",
+                    (failures, now + retry_delay(failures, self.retry_base_seconds, self.retry_max_seconds),
+                     event_id)
+                )
+        return dead
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM attempt_events").fetchone()[0]
+
+    def dead_letters(self) -> List[Dict]:
+        """Events that failed max_attempts times, with their failure count and last error"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT payload, failures, error FROM attempt_events_dead ORDER BY event_id"
+            ).fetchall()
+        return [{**json.loads(payload), 'failures': failures, 'error': error} for payload, failures, error in rows]
@@ -1,11 +1,10 @@
 import numpy as np
 from sklearn.model_selection import RandomizedSearchCV
-import xgboost as xgb
 from sklearn.ensemble import RandomForestClassifier
-import lightgbm as lgb
 import json
 import os
 from datetime import datetime
+from model_registry import BASE_MODELS_REGISTRY_DIR, ModelRegistry
 
 class BaseModels:
     def __init__(self, random_state=42):
@@ -39,8 +38,10 @@ class BaseModels:
         self.best_params = {}
         self.cv_results = {}
 
-    def train_xgboost(self, X_train, y_train, n_iter=20):
+    def train_xgboost(self, X_train, y_train, n_iter=20, sample_weight=None):
         """Train XGBoost model with RandomizedSearchCV"""
+        import xgboost as xgb
+        
         xgb_model = xgb.XGBClassifier(random_state=self.random_state)
         
         search = RandomizedSearchCV(
@@ -53,7 +54,7 @@ class BaseModels:
             n_jobs=-1
         )
         
-        search.fit(X_train, y_train)
+        search.fit(X_train, y_train, sample_weight=sample_weight)
         
         self.best_models['xgboost'] = search.best_estimator_
         self.best_params['xgboost'] = search.best_params_
@@ -64,7 +65,7 @@ class BaseModels:
         
         return search.best_estimator_
 
-    def train_random_forest(self, X_train, y_train, n_iter=20):
+    def train_random_forest(self, X_train, y_train, n_iter=20, sample_weight=None):
         """Train Random Forest model with RandomizedSearchCV"""
         rf_model = RandomForestClassifier(random_state=self.random_state)
         
@@ -78,7 +79,7 @@ class BaseModels:
             n_jobs=-1
         )
         
-        search.fit(X_train, y_train)
+        search.fit(X_train, y_train, sample_weight=sample_weight)
         
         self.best_models['random_forest'] = search.best_estimator_
         self.best_params['random_forest'] = search.best_params_
@@ -89,8 +90,11 @@ class BaseModels:
         
         return search.best_estimator_
 
-    def train_lightgbm(self, X_train, y_train, n_iter=20):
+    def train_lightgbm(self, X_train, y_train, n_iter=20, sample_weight=None):
         """Train LightGBM model with RandomizedSearchCV"""
+        # LightGBM is an optional extra (not in requirements.txt)
+        import lightgbm as lgb
+        
         lgb_model = lgb.LGBMClassifier(random_state=self.random_state)
         
         search = RandomizedSearchCV(
@@ -103,7 +107,7 @@ class BaseModels:
             n_jobs=-1
         )
         
-        search.fit(X_train, y_train)
+        search.fit(X_train, y_train, sample_weight=sample_weight)
         
         self.best_models['lightgbm'] = search.best_estimator_
         self.best_params['lightgbm'] = search.best_params_
@@ -114,16 +118,19 @@ class BaseModels:
         
         return search.best_estimator_
 
-    def train_all_models(self, X_train, y_train, n_iter=20):
-        """Train all three models"""
+    def train_all_models(self, X_train, y_train, n_iter=20, sample_weight=None):
+        """Train all three models (sample_weight is passed to every fit, e.g. class weights)"""
         print("Training XGBoost...")
-        self.train_xgboost(X_train, y_train, n_iter)
+        self.train_xgboost(X_train, y_train, n_iter, sample_weight)
         
         print("Training Random Forest...")
-        self.train_random_forest(X_train, y_train, n_iter)
+        self.train_random_forest(X_train, y_train, n_iter, sample_weight)
         
         print("Training LightGBM...")
-        self.train_lightgbm(X_train, y_train, n_iter)
+        try:
+            self.train_lightgbm(X_train, y_train, n_iter, sample_weight)
+        except ImportError:
+            print("LightGBM is not installed; skipping (pip install lightgbm)")
 
     def save_results(self, dataset_name):
         """Save training results and best parameters"""
@@ -144,6 +151,18 @@ class BaseModels:
         
         print(f"Results saved to {filename}")
 
+    def register_models(self, dataset_name, feature_names, registry=None):
+        """Register each best model as a version of the base models registry (not made current)"""
+        registry = registry or ModelRegistry(BASE_MODELS_REGISTRY_DIR)
+        versions = {}
+        for model_name, model in self.best_models.items():
+            versions[model_name] = registry.register(
+                model, feature_names=list(feature_names),
+                metrics={'dataset': dataset_name, **self.cv_results.get(model_name, {})},
+                name=f'{model_name}_{dataset_name}', make_current=False)
+            print(f"Registered {model_name} as version {versions[model_name]}")
+        return versions
+
     def get_feature_importance(self, feature_names):
         """Get feature importance for all models"""
         importance_dict = {}
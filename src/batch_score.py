@@ -0,0 +1,333 @@
+"""
+Whole-cohort batch scoring with chunked I/O and worker processes
+
+Reads a feature table in fixed-size chunks, either from columnar files
+(Parquet file or directory, or CSV) or from the platform database
+(QuizPreprocessor features). Every chunk runs through the same pipeline as
+the scoring server, WeaknessPredictor.predict_batch:
+
+    scaler.transform -> model.predict_proba -> weak topics -> recommendations
+
+Results are written chunk by chunk:
+
+- file input: one Parquet part per chunk in --output (ids, weakness_level,
+  confidence, weak topics and recommendations as JSON);
+- database input: one bulk upsert of weakness_analysis per chunk (the
+  mapping of score_weakness_analysis.py).
+
+With --bkt-state, each --features row is joined by its first id column with
+the saved knowledge tracer (knowledge_tracing.py): the traced per-topic
+mastery drives weak-topic detection over the tracer's topics, and the
+bkt_* summary features are added to the record for models trained on them
+(NaN for users the tracer has not seen).
+
+Chunks are scored by --workers processes. Each loads the model with
+mmap_mode='r', so their arrays share one copy in the page cache. At most two
+chunks per worker are in flight, so memory stays bounded. Results are
+written in chunk order, and the checkpoint file records the progress; a
+rerun after a crash continues after the chunks already written, and a
+completed run removes it. File input resumes at the next chunk index.
+Database input records the job's feature time (as_of) and resumes after the
+last (user_id, topic_id) written, so the query restarts at that key instead
+of recomputing earlier chunks, and no row is skipped if the population
+changed in the meantime. Parts are named by chunk and upserts are
+idempotent, so a chunk written twice does no harm.
+
+Run from src/:
+    python batch_score.py --features ../data/processed/cohort.parquet --output ../results/cohort_scores
+    python batch_score.py --features ../data/processed/cohort.parquet --output ../results/cohort_scores \
+        --bkt-state ../models/knowledge_tracing.npz
+    python batch_score.py --db-url sqlite:///../data/learnmate.db --workers 4
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from database import bulk_upsert, connect, is_sqlite
+from knowledge_tracing import KnowledgeTracer
+from predict import WeaknessPredictor
+from preprocessor.quiz import TIMESTAMP_FORMAT, QuizPreprocessor
+from profiling import profiled
+from score_weakness_analysis import MODEL_DIR, score_features
+from topic_mastery import TopicMastery
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = '_checkpoint.json'
+RESULTS_DIR = Path(__file__).resolve().parent.parent / 'results' / 'batch_score'
+
+# Set in each worker process by _init_worker
+_predictor: Optional[WeaknessPredictor] = None
+_tracer: Optional[KnowledgeTracer] = None
+
+
+def iter_file_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Fixed-size chunks of a Parquet file/directory or CSV file"""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+
+    # Only needed for Parquet input
+    import pyarrow.parquet as pq
+    files = sorted(path.rglob('*.parquet')) if path.is_dir() else [path]
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    for file in files:
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+            pending.append(batch.to_pandas())
+            pending_rows += batch.num_rows
+            # Batches stop at file and row-group ends; regroup to exactly chunk_size rows
+            while pending_rows >= chunk_size:
+                frame = pd.concat(pending, ignore_index=True)
+                yield frame.iloc[:chunk_size].reset_index(drop=True)
+                pending = [frame.iloc[chunk_size:]]
+                pending_rows -= chunk_size
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def predict_chunk(predictor: WeaknessPredictor, chunk: pd.DataFrame, id_columns: Sequence[str],
+                  tracer: Optional[KnowledgeTracer] = None) -> pd.DataFrame:
+    """
+    One chunk through predict_batch, as a flat frame for the Parquet output
+
+    With a tracer, each record gets the traced mastery of the user in its first id column.
+    """
+    records = chunk.to_dict('records')
+    if tracer is not None:
+        for record, traced in zip(records, tracer.feature_records(chunk[id_columns[0]].tolist())):
+            record.update(traced)
+    results = predictor.predict_batch(records)
+    if results is None:
+        raise RuntimeError("Prediction failed for a chunk; see the log for the cause")
+
+    output = chunk[list(id_columns)].reset_index(drop=True)
+    output['weakness_level'] = [result['weakness_level'] for result in results]
+    output['confidence'] = [result['confidence'] for result in results]
+    output['weak_topics'] = [json.dumps(result['weak_topics']) for result in results]
+    if results and 'weak_topic_ids' in results[0]:
+        output['weak_topic_ids'] = [json.dumps(result['weak_topic_ids']) for result in results]
+    output['recommendations'] = [json.dumps(result['recommendations']) for result in results]
+    return output
+
+
+def _init_worker(model_dir: str, topic_config: Optional[str], bkt_state: Optional[str] = None):
+    global _predictor, _tracer
+    _tracer = KnowledgeTracer.load(Path(bkt_state)) if bkt_state else None
+    topic_mastery = TopicMastery.from_config(topic_config) if topic_config else None
+    if topic_mastery is None and _tracer is not None:
+        # Traced mastery is keyed by topic id, so detect weak topics over the tracer's topics
+        topic_mastery = TopicMastery(_tracer.vocabulary)
+    _predictor = WeaknessPredictor(model_dir, topic_mastery=topic_mastery, mmap_mode='r')
+    if _predictor.model is None:
+        raise RuntimeError(f"Could not load the model from {model_dir}")
+
+
+def _score_chunk(chunk: pd.DataFrame, id_columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    """Worker task: weakness_analysis rows (id_columns None) or the flat prediction frame"""
+    if id_columns is None:
+        return score_features(chunk, _predictor)
+    return predict_chunk(_predictor, chunk, id_columns, _tracer)
+
+
+class BatchScorer:
+    """Runs chunks through worker processes and writes them in order with a checkpoint"""
+
+    def __init__(self, model_dir: Path = MODEL_DIR, workers: int = 1, checkpoint_dir: Path = Path('.'),
+                 topic_config: Optional[Path] = None, bkt_state: Optional[Path] = None):
+        """
+        Args:
+            model_dir: directory with weakness_classifier.pkl and scaler.pkl
+            workers: scoring processes
+            checkpoint_dir: where the checkpoint file is kept
+            topic_config: optional topic vocabulary for weak-topic detection
+            bkt_state: saved KnowledgeTracer whose mastery is joined to file input
+        """
+        self.model_dir = Path(model_dir)
+        self.workers = max(1, workers)
+        self.checkpoint_path = Path(checkpoint_dir) / CHECKPOINT_FILE
+        self.topic_config = topic_config
+        self.bkt_state = bkt_state
+
+    def unfinished_job(self) -> Optional[Dict]:
+        """Job description of the run the checkpoint belongs to, if one was interrupted"""
+        if not self.checkpoint_path.exists():
+            return None
+        with open(self.checkpoint_path) as f:
+            return json.load(f).get('job')
+
+    def _load_checkpoint(self, job: Dict) -> Dict:
+        """Progress of an interrupted run of the same job (from the start otherwise)"""
+        checkpoint = {'next_chunk': 0, 'rows': 0, 'last_key': None}
+        if not self.checkpoint_path.exists():
+            return checkpoint
+        with open(self.checkpoint_path) as f:
+            saved = json.load(f)
+        if saved.get('job') != job:
+            logger.info("Checkpoint is for a different job; starting from the first chunk")
+            return checkpoint
+        logger.info(f"Resuming at chunk {saved['next_chunk']} ({saved['rows']} rows already scored)")
+        return {**checkpoint, **saved}
+
+    def _save_checkpoint(self, job: Dict, next_chunk: int, rows: int, last_key: Optional[List] = None):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'job': job, 'next_chunk': next_chunk, 'rows': rows, 'last_key': last_key}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, chunks: Union[Iterator[pd.DataFrame], Callable[[Optional[List]], Iterator[pd.DataFrame]]],
+            write, job: Dict, id_columns: Optional[Sequence[str]] = None,
+            key_columns: Optional[Sequence[str]] = None) -> int:
+        """
+        Score chunks and pass each result to write(chunk_index, frame), in order
+
+        Args:
+            chunks: feature chunks, in the same order on every run; with
+                key_columns, a function of the last key written (None at the
+                start) returning the chunks after it
+            write: output callback
+            job: description of the input, stored with the checkpoint
+            id_columns: columns copied to the Parquet output (None for weakness_analysis rows)
+            key_columns: columns the chunks are ordered by, for resuming by key
+                instead of by chunk index
+
+        Returns:
+            Rows scored in this run
+        """
+        checkpoint = self._load_checkpoint(job)
+        start_chunk = checkpoint['next_chunk']
+        total_rows = checkpoint['rows']
+        if key_columns is not None:
+            chunks = chunks(checkpoint['last_key'])
+        rows = 0
+        start = time.perf_counter()
+        pending: List[Tuple[int, object]] = []
+
+        def finish(index: int, future) -> None:
+            nonlocal rows
+            result = future.result()
+            write(index, result)
+            rows += len(result)
+            if key_columns is not None and len(result):
+                checkpoint['last_key'] = [int(value) for value in result[list(key_columns)].iloc[-1]]
+            self._save_checkpoint(job, index + 1, total_rows + rows, checkpoint['last_key'])
+            elapsed = time.perf_counter() - start
+            logger.info(f"Chunk {index}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(str(self.model_dir), self.topic_config and str(self.topic_config),
+                                               self.bkt_state and str(self.bkt_state))) as pool:
+                for offset, chunk in enumerate(chunks):
+                    # Keyed chunks already start after the checkpoint; indexed ones are skipped up to it
+                    index = start_chunk + offset if key_columns is not None else offset
+                    if index < start_chunk:
+                        continue
+                    pending.append((index, pool.submit(_score_chunk, chunk, id_columns)))
+                    # Bounded lookahead: write the oldest chunk before reading further
+                    if len(pending) >= 2 * self.workers:
+                        finish(*pending.pop(0))
+                while pending:
+                    finish(*pending.pop(0))
+        finally:
+            # Release the source's cursor now, not when the caller has closed its connection
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+        # Complete: the next run starts from the beginning
+        self.checkpoint_path.unlink(missing_ok=True)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Scored {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+        return rows
+
+
+def write_parquet_part(output_dir: Path):
+    """Writer of chunk results as part-<chunk>.parquet files"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(index: int, frame: pd.DataFrame):
+        path = output_dir / f'part-{index:06d}.parquet'
+        tmp_path = path.with_suffix('.tmp')
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return write
+
+
+@profiled('batch_score')
+def main():
+    parser = argparse.ArgumentParser(description="Score the whole cohort in chunks")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--features', type=Path, help="Parquet file/directory or CSV of student features")
+    source.add_argument('--db-url', help="Score QuizPreprocessor features into weakness_analysis")
+    parser.add_argument('--output', type=Path, help="Output directory for --features (Parquet parts)")
+    parser.add_argument('--id-columns', nargs='+', default=['student_id'],
+                        help="Columns identifying a row in the --features output")
+    parser.add_argument('--model-dir', type=Path, default=MODEL_DIR)
+    parser.add_argument('--topic-config', type=Path, help="Topic vocabulary (see topic_mastery.py)")
+    parser.add_argument('--bkt-state', type=Path,
+                        help="Saved knowledge tracer to join to --features rows (see knowledge_tracing.py)")
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--checkpoint-dir', type=Path,
+                        help="Checkpoint location (default: --output, or results/batch_score for --db-url)")
+    args = parser.parse_args()
+
+    if args.features is not None:
+        if args.output is None:
+            parser.error("--output is required with --features")
+        scorer = BatchScorer(args.model_dir, args.workers, args.checkpoint_dir or args.output, args.topic_config,
+                             args.bkt_state)
+        job = {'features': str(args.features.resolve()), 'chunk_size': args.chunk_size}
+        if args.bkt_state is not None:
+            job['bkt_state'] = str(args.bkt_state.resolve())
+        scorer.run(iter_file_chunks(args.features, args.chunk_size), write_parquet_part(args.output),
+                   job, id_columns=args.id_columns)
+        return
+
+    if args.bkt_state is not None:
+        parser.error("--bkt-state applies to --features input; weakness_analysis rows have no weak topics")
+
+    read_connection = connect(args.db_url)
+    write_connection = read_connection if is_sqlite(read_connection) else connect(args.db_url)
+    try:
+        scorer = BatchScorer(args.model_dir, args.workers, args.checkpoint_dir or RESULTS_DIR, args.topic_config)
+        # The URL may hold a password, so the checkpoint only gets its hash
+        job = {'source': 'database', 'database': hashlib.sha256(args.db_url.encode()).hexdigest()[:16],
+               'chunk_size': args.chunk_size}
+        # A resumed run scores with the interrupted run's feature time
+        unfinished = scorer.unfinished_job() or {}
+        if {key: value for key, value in unfinished.items() if key != 'as_of'} == job:
+            job['as_of'] = unfinished['as_of']
+        else:
+            job['as_of'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+        as_of = datetime.strptime(job['as_of'], TIMESTAMP_FORMAT)
+        preprocessor = QuizPreprocessor(read_connection, chunk_size=args.chunk_size)
+
+        def chunks(last_key: Optional[List]) -> Iterator[pd.DataFrame]:
+            return preprocessor.iter_features(as_of, after=last_key)
+
+        def upsert(index: int, rows: pd.DataFrame):
+            bulk_upsert(write_connection, 'weakness_analysis', rows, key_columns=['user_id', 'topic_id'])
+        scorer.run(chunks, upsert, job, key_columns=['user_id', 'topic_id'])
+    finally:
+        read_connection.close()
+        if write_connection is not read_connection:
+            write_connection.close()
+
+
+if __name__ == "__main__":
+    main()
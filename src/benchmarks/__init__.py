@@ -0,0 +1,3 @@
+"""
+Benchmark harnesses and deterministic synthetic data generators
+"""
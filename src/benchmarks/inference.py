@@ -0,0 +1,251 @@
+"""
+Inference benchmark for the saved weakness models
+
+Usage (from src/):
+    python -m benchmarks.inference                       # every *.pkl in ../models
+    python -m benchmarks.inference --models ../models/model_UCI_clean.pkl \
+        --data ../data/processed/UCI_test.csv --output ../reports/benchmarks/inference.json
+
+For each model this measures load time, single-row predict_proba latency
+(p50/p95/p99), throughput at several batch sizes, thread scaling and peak RSS.
+Each model is benchmarked in its own process so load time is cold and peak RSS
+is not shared between models. A pickled BaseModels instance expands to its
+best_models. Everything runs offline on *_test.csv files or synthetic rows.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / 'models'
+BATCH_SIZES = [1, 16, 256, 4096, 65536]
+NON_MODEL_FILES = {'scaler.pkl'}
+TIMEOUT_SECONDS = 1800
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is not None:
+        # ru_maxrss is KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    # Windows: peak working set from psutil, when it is installed
+    try:
+        import psutil
+    except ImportError:
+        return None
+    peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None if peak is None else peak / (1024 * 1024)
+
+
+def _expand_models(obj, name: str) -> Dict[str, object]:
+    """A saved estimator, or every best model of a pickled BaseModels"""
+    if hasattr(obj, 'best_models'):
+        return {f"{name}:{model_name}": model for model_name, model in obj.best_models.items()}
+    return {name: obj}
+
+
+def _feature_matrix(model, data_path: Optional[Path], rows: int, seed: int = 42) -> np.ndarray:
+    """Rows to score: columns of data_path matching the model, or synthetic standard-normal rows"""
+    n_features = getattr(model, 'n_features_in_', None)
+    feature_names = getattr(model, 'feature_names_in_', None)
+
+    if data_path is not None:
+        df = pd.read_csv(data_path)
+        if feature_names is not None and set(feature_names) <= set(df.columns):
+            X = df[list(feature_names)].to_numpy(dtype=np.float64)
+        else:
+            X = df.drop(columns=['weakness_level'], errors='ignore').select_dtypes('number').to_numpy(dtype=np.float64)
+            X = X[:, :n_features] if n_features else X
+        # Tile the (small) test split up to the largest batch size
+        return np.resize(X, (rows, X.shape[1]))
+
+    if n_features is None:
+        raise ValueError("Model does not expose n_features_in_; pass --data")
+    return np.random.default_rng(seed).standard_normal((rows, n_features))
+
+
+def _set_n_jobs(model, n_jobs: int):
+    """Set every nested n_jobs parameter (RandomForest, XGBoost, VotingClassifier, ...)"""
+    keys = [key for key in model.get_params(deep=True) if key == 'n_jobs' or key.endswith('__n_jobs')]
+    if keys:
+        model.set_params(**{key: n_jobs for key in keys})
+
+
+def _time_batch(model, X: np.ndarray, min_seconds: float, max_repeats: int = 1000) -> float:
+    """Rows per second for predict_proba on X, repeated for at least min_seconds"""
+    model.predict_proba(X)  # warm-up
+    repeats, start = 0, time.perf_counter()
+    while repeats < max_repeats:
+        model.predict_proba(X)
+        repeats += 1
+        if time.perf_counter() - start >= min_seconds:
+            break
+    return repeats * len(X) / (time.perf_counter() - start)
+
+
+def benchmark_model(path: Path, name: str, data_path: Optional[Path], batch_sizes: List[int],
+                    thread_counts: List[int], latency_samples: int, min_seconds: float) -> Dict:
+    """Benchmark one model (run inside a fresh process)"""
+    start = time.perf_counter()
+    model = _expand_models(joblib.load(path), path.stem)[name]
+    load_seconds = time.perf_counter() - start
+    rss_after_load = _peak_rss_mb()
+
+    X = _feature_matrix(model, data_path, max(batch_sizes + [latency_samples]))
+
+    # Single-row latency
+    model.predict_proba(X[:1])
+    latencies = np.empty(latency_samples)
+    for i in range(latency_samples):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        latencies[i] = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+
+    throughput = {
+        batch_size: _time_batch(model, X[:batch_size], min_seconds)
+        for batch_size in batch_sizes
+    }
+
+    scaling_batch = X[:min(4096, len(X))]
+    thread_scaling = {}
+    for threads in thread_counts:
+        _set_n_jobs(model, threads)
+        with threadpool_limits(limits=threads):
+            thread_scaling[threads] = _time_batch(model, scaling_batch, min_seconds)
+
+    return {
+        'model': name,
+        'type': type(model).__name__,
+        'load_seconds': load_seconds,
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': _peak_rss_mb(),
+        'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99},
+        'throughput_rows_per_s': throughput,
+        'thread_scaling_rows_per_s': thread_scaling,
+    }
+
+
+def _worker(args, queue):
+    try:
+        queue.put(benchmark_model(*args))
+    except Exception as e:
+        queue.put({'model': args[1], 'error': str(e)})
+
+
+def run_isolated(*args, timeout: float = TIMEOUT_SECONDS) -> Dict:
+    """
+    Run benchmark_model in a spawned process so load time and RSS are per model
+
+    A child that dies without a result (segfault, OOM kill) or runs past
+    timeout seconds is reported as an error instead of hanging the run.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_worker, args=(args, queue))
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            process.terminate()
+            process.join()
+            return {'model': args[1], 'error': f"timed out after {timeout:.0f}s"}
+        try:
+            # Poll so a dead child is noticed before the deadline
+            result = queue.get(timeout=min(remaining, 1.0))
+        except queue_module.Empty:
+            if not process.is_alive() and queue.empty():
+                process.join()
+                return {'model': args[1], 'error': f"benchmark process exited with code {process.exitcode}"}
+
+    process.join(timeout=10)
+    if process.exitcode is None:
+        process.terminate()
+        process.join()
+    return result
+
+
+def print_table(results: List[Dict], batch_sizes: List[int], thread_counts: List[int]):
+    header = f"{'model':40s} {'load_s':>7s} {'rss_mb':>8s} {'p50_ms':>8s} {'p95_ms':>8s} {'p99_ms':>8s}"
+    header += ''.join(f" {'bs=' + str(b):>10s}" for b in batch_sizes)
+    header += ''.join(f" {'t=' + str(t):>10s}" for t in thread_counts)
+    print(header)
+    print('-' * len(header))
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['model']:40s} ERROR: {result['error']}")
+            continue
+        latency = result['latency_ms']
+        rss = '-' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.0f}"
+        line = (f"{result['model']:40s} {result['load_seconds']:7.2f} {rss:>8s} "
+                f"{latency['p50']:8.2f} {latency['p95']:8.2f} {latency['p99']:8.2f}")
+        line += ''.join(f" {result['throughput_rows_per_s'][b]:10.0f}" for b in batch_sizes)
+        line += ''.join(f" {result['thread_scaling_rows_per_s'][t]:10.0f}" for t in thread_counts)
+        print(line)
+    print("\nThroughput columns (bs=, t=) are rows/second; thread scaling uses batches of 4096 rows.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inference cost of saved models")
+    parser.add_argument('--models', nargs='+', type=Path, default=None,
+                        help="Model .pkl files (default: every model in models/)")
+    parser.add_argument('--data', type=Path, default=None,
+                        help="Test CSV to score (default: synthetic rows)")
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=BATCH_SIZES)
+    parser.add_argument('--max-threads', type=int, default=os.cpu_count())
+    parser.add_argument('--latency-samples', type=int, default=500)
+    parser.add_argument('--min-seconds', type=float, default=0.5,
+                        help="Minimum measuring time per throughput point")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_SECONDS,
+                        help="Seconds before a model's benchmark process is killed")
+    parser.add_argument('--output', type=Path, default=None, help="Also write results as JSON")
+    args = parser.parse_args(argv)
+
+    paths = args.models or sorted(p for p in MODELS_DIR.glob('*.pkl') if p.name not in NON_MODEL_FILES)
+    if not paths:
+        print(f"No models found in {MODELS_DIR}")
+        return 1
+
+    thread_counts = sorted({1, args.max_threads} | {2 ** i for i in range(1, 8) if 2 ** i < args.max_threads})
+
+    results = []
+    for path in paths:
+        for name in _expand_models(joblib.load(path), path.stem):
+            print(f"Benchmarking {name}...")
+            results.append(run_isolated(
+                path, name, args.data, args.batch_sizes, thread_counts,
+                args.latency_samples, args.min_seconds, timeout=args.timeout
+            ))
+
+    print()
+    print_table(results, args.batch_sizes, thread_counts)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
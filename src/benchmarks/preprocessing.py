@@ -0,0 +1,259 @@
+"""
+Preprocessing benchmark: time and memory per pipeline stage on synthetic data
+
+Usage (from src/):
+    python -m benchmarks.preprocessing --scale 1 --pipelines OU UCI AI
+    python -m benchmarks.preprocessing --scale 10 --update-baseline
+
+Every stage method of each preprocessor is wrapped to record wall time, CPU time
+and peak traced memory. Results are compared against a JSON baseline, and the
+exit code is 1 if any stage regressed beyond the tolerance.
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.synthetic import GENERATORS
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = Path(__file__).resolve().parent.parent.parent / 'reports' / 'benchmarks' / 'preprocessing_baseline.json'
+
+# Stage methods timed for each pipeline (missing ones are skipped)
+STAGES = {
+    'OU': [
+        'load_data', '_process_and_merge_data', '_process_assessment_data',
+        '_process_vle_data', '_process_registration_data', 'handle_missing_values',
+        'feature_engineering', 'create_weakness_level', 'save_report'
+    ],
+    'OU_enhanced': [
+        'load_all_data', 'calculate_course_statistics', 'calculate_vle_features',
+        'handle_missing_values_enhanced', 'create_time_features', 'create_behavioral_features',
+        'create_progress_features', 'handle_outliers_robust', 'create_enhanced_weakness_level',
+        'encode_categorical_enhanced', 'select_important_features', 'split_data_stratified',
+        'save_report'
+    ],
+    'UCI': [
+        'load_data', 'handle_missing_values', 'feature_engineering', 'create_weakness_levels',
+        'encode_categorical', 'handle_outliers', 'scale_features', 'save_data', 'save_report'
+    ],
+    'AI': [
+        'load_data', 'handle_missing_values', 'feature_engineering', 'create_weakness_level',
+        'encode_categorical', 'handle_outliers', 'scale_features', 'save_data', 'save_report'
+    ],
+}
+
+# Raw dataset each pipeline reads
+PIPELINE_DATA = {'OU': 'OU', 'OU_enhanced': 'OU', 'UCI': 'UCI', 'AI': 'AI'}
+
+
+def _make_preprocessor(pipeline: str):
+    if pipeline == 'OU':
+        from preprocessor.ou import OUPreprocessor
+        return OUPreprocessor()
+    if pipeline == 'OU_enhanced':
+        from preprocessor.ou_enhanced import OUEnhancedPreprocessor
+        return OUEnhancedPreprocessor()
+    if pipeline == 'UCI':
+        from preprocessor.uci import UCIPreprocessor
+        return UCIPreprocessor()
+    if pipeline == 'AI':
+        from preprocessor.ai import AIPreprocessor
+        return AIPreprocessor()
+    raise ValueError(f"Unknown pipeline: {pipeline}")
+
+
+class _PeakTracker:
+    """
+    Peak traced memory per (possibly nested) stage
+
+    tracemalloc has a single peak counter, so before a nested stage resets it
+    the enclosing stages fold the current peak into their own running maximum.
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def enter(self):
+        if self.frames:
+            self.frames[-1][1] = max(self.frames[-1][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self.frames.append([current, current])
+
+    def exit(self) -> float:
+        """Leave the innermost stage and return its peak above its starting memory, in MB"""
+        start, peak = self.frames.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if self.frames:
+            self.frames[-1][1] = max(self.frames[-1][1], peak)
+        return (peak - start) / 1e6
+
+
+def _instrument(preprocessor, stages: List[str], timings: Dict[str, Dict], tracker: _PeakTracker):
+    """Wrap stage methods on the instance so every call is timed and memory-profiled"""
+    for stage in stages:
+        method = getattr(preprocessor, stage, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            tracker.enter()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+            result = _method(*args, **kwargs)
+
+            entry = timings.setdefault(_stage, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_mb': 0.0})
+            entry['calls'] += 1
+            entry['wall_s'] += time.perf_counter() - wall_start
+            entry['cpu_s'] += time.process_time() - cpu_start
+            entry['peak_mb'] = max(entry['peak_mb'], tracker.exit())
+            return result
+
+        setattr(preprocessor, stage, wraps(method)(timed))
+
+
+def run_pipeline(pipeline: str, scale: float, work_dir: Path, seed: int = 42) -> Dict:
+    """Generate synthetic data for pipeline and benchmark one full preprocess() run"""
+    raw_dir = work_dir / 'raw'
+    dataset = PIPELINE_DATA[pipeline]
+    marker = raw_dir / f'.{dataset}_{scale}_{seed}'
+    if not marker.exists():
+        logger.info(f"Generating synthetic {dataset} data at {scale}x...")
+        GENERATORS[dataset](raw_dir, scale=scale, seed=seed)
+        marker.touch()
+
+    preprocessor = _make_preprocessor(pipeline)
+    preprocessor.raw_dir = raw_dir
+    preprocessor.processed_dir = work_dir / 'processed'
+    preprocessor.reports_dir = work_dir / 'reports'
+    preprocessor.processed_dir.mkdir(parents=True, exist_ok=True)
+    preprocessor.reports_dir.mkdir(parents=True, exist_ok=True)
+    # Plots are not part of the measured pipeline
+    preprocessor.plot_distributions = lambda *args, **kwargs: None
+
+    timings: Dict[str, Dict] = {}
+    tracker = _PeakTracker()
+    _instrument(preprocessor, STAGES[pipeline], timings, tracker)
+
+    tracemalloc.start()
+    tracker.enter()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    train_df, test_df = preprocessor.preprocess()
+    total = {
+        'wall_s': time.perf_counter() - wall_start,
+        'cpu_s': time.process_time() - cpu_start,
+        'peak_mb': tracker.exit(),
+    }
+    tracemalloc.stop()
+
+    return {
+        'scale': scale,
+        'train_shape': list(train_df.shape),
+        'test_shape': list(test_df.shape),
+        'total': total,
+        'stages': timings,
+    }
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float,
+                        min_seconds: float = 0.05) -> List[str]:
+    """Return regression messages for stages slower (or bigger) than baseline by > tolerance"""
+    regressions = []
+    for pipeline, result in results.items():
+        reference = baseline.get(pipeline)
+        if reference is None or reference.get('scale') != result['scale']:
+            continue
+
+        entries = dict(result['stages'], total=result['total'])
+        reference_entries = dict(reference['stages'], total=reference['total'])
+        for stage, entry in entries.items():
+            ref = reference_entries.get(stage)
+            if ref is None:
+                continue
+            wall_limit = ref['wall_s'] * (1 + tolerance)
+            if entry['wall_s'] > wall_limit and entry['wall_s'] - ref['wall_s'] > min_seconds:
+                regressions.append(
+                    f"{pipeline}.{stage}: wall {entry['wall_s']:.3f}s vs baseline {ref['wall_s']:.3f}s"
+                )
+            if entry['peak_mb'] > ref['peak_mb'] * (1 + tolerance) and entry['peak_mb'] - ref['peak_mb'] > 1:
+                regressions.append(
+                    f"{pipeline}.{stage}: peak {entry['peak_mb']:.1f}MB vs baseline {ref['peak_mb']:.1f}MB"
+                )
+    return regressions
+
+
+def print_results(results: Dict):
+    for pipeline, result in results.items():
+        print(f"\n{pipeline} @ {result['scale']}x  train={result['train_shape']} test={result['test_shape']}")
+        print(f"{'stage':40s} {'calls':>5s} {'wall_s':>9s} {'cpu_s':>9s} {'peak_mb':>9s}")
+        for stage, entry in result['stages'].items():
+            print(f"{stage:40s} {entry['calls']:5d} {entry['wall_s']:9.3f} {entry['cpu_s']:9.3f} {entry['peak_mb']:9.1f}")
+        total = result['total']
+        print(f"{'TOTAL':40s} {'':5s} {total['wall_s']:9.3f} {total['cpu_s']:9.3f} {total['peak_mb']:9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing pipelines on synthetic data")
+    parser.add_argument('--pipelines', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--scale', type=float, default=1.0, help="Dataset size relative to the real data")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--work-dir', type=Path, default=None,
+                        help="Where synthetic data is generated (reused across runs); temp dir by default")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = args.work_dir or Path(tmp)
+        results, failures = {}, {}
+        for pipeline in args.pipelines:
+            try:
+                results[pipeline] = run_pipeline(pipeline, args.scale, work_dir, args.seed)
+            except Exception as e:
+                logger.error(f"{pipeline} pipeline failed: {str(e)}")
+                failures[pipeline] = str(e)
+
+    print_results(results)
+    for pipeline, error in failures.items():
+        print(f"\n{pipeline} @ {args.scale}x  FAILED: {error}")
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        if failures:
+            print(f"\nBaseline not written: {', '.join(failures)} failed")
+            return 1
+        baseline.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=4)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for message in regressions:
+            print(f"- {message}")
+        return 1
+
+    print("\nNo regressions against baseline" if baseline else "\nNo baseline found; run with --update-baseline")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
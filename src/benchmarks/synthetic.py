@@ -0,0 +1,249 @@
+"""
+Deterministic synthetic versions of the raw datasets
+
+Each generator writes files with the same names, columns and dtypes the
+preprocessors read from `data/raw`, scaled relative to the real dataset size
+(scale=1.0 is real size, 100.0 is 100x). The same seed and scale always give the
+same files. Large tables are written in chunks, so memory stays bounded at any scale.
+"""
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Row counts of the real datasets at scale 1.0
+OU_BASE_ROWS = {
+    'students': 32593,
+    'assessments': 206,
+    'student_assessments': 173912,
+    'vle_sites': 6364,
+    'vle_interactions': 10655280,
+}
+UCI_BASE_ROWS = {'math': 395, 'portuguese': 649}
+AI_BASE_ROWS = 410
+
+OU_MODULES = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE', 'FFF', 'GGG']
+OU_PRESENTATIONS = ['2013B', '2013J', '2014B', '2014J']
+OU_REGIONS = [
+    'East Anglian Region', 'Scotland', 'North Western Region', 'South East Region',
+    'West Midlands Region', 'Wales', 'North Region', 'South Region', 'Ireland',
+    'South West Region', 'East Midlands Region', 'Yorkshire Region', 'London Region'
+]
+OU_EDUCATION = [
+    'HE Qualification', 'A Level or Equivalent', 'Lower Than A Level',
+    'Post Graduate Qualification', 'No Formal quals'
+]
+OU_ACTIVITIES = [
+    'resource', 'oucontent', 'url', 'homepage', 'subpage', 'forumng', 'quiz',
+    'glossary', 'ouwiki', 'dataplus', 'oucollaborate', 'page', 'questionnaire'
+]
+
+CHUNK_ROWS = 1_000_000
+
+
+def _rows(base: int, scale: float) -> int:
+    return max(1, int(round(base * scale)))
+
+
+def _write_chunked(path: Path, total_rows: int, make_chunk, rng: np.random.Generator):
+    """Write total_rows rows produced by make_chunk(n, rng) in CHUNK_ROWS pieces"""
+    for start in range(0, total_rows, CHUNK_ROWS):
+        chunk = make_chunk(min(CHUNK_ROWS, total_rows - start), rng)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def generate_ou(raw_dir: Path, scale: float = 1.0, seed: int = 42) -> Dict[str, int]:
+    """Write the OU (OULAD) tables to raw_dir/ou_data and return their row counts"""
+    rng = np.random.default_rng(seed)
+    ou_dir = Path(raw_dir) / 'ou_data'
+    ou_dir.mkdir(parents=True, exist_ok=True)
+
+    n_students = _rows(OU_BASE_ROWS['students'], scale)
+    n_assessments = OU_BASE_ROWS['assessments']
+    n_sites = _rows(OU_BASE_ROWS['vle_sites'], min(scale, 1.0))
+
+    courses = pd.DataFrame(
+        [(module, presentation) for module in OU_MODULES for presentation in OU_PRESENTATIONS],
+        columns=['code_module', 'code_presentation']
+    )
+    courses['module_presentation_length'] = rng.integers(234, 270, len(courses))
+    courses.to_csv(ou_dir / 'courses.csv', index=False)
+
+    student_ids = np.sort(rng.choice(np.arange(10_000, 10_000 + n_students * 10), n_students, replace=False))
+    course_idx = rng.integers(len(courses), size=n_students)
+    student_info = pd.DataFrame({
+        'code_module': courses['code_module'].to_numpy()[course_idx],
+        'code_presentation': courses['code_presentation'].to_numpy()[course_idx],
+        'id_student': student_ids,
+        'gender': rng.choice(['M', 'F'], n_students),
+        'region': rng.choice(OU_REGIONS, n_students),
+        'highest_education': rng.choice(OU_EDUCATION, n_students, p=[0.15, 0.43, 0.39, 0.01, 0.02]),
+        'imd_band': rng.choice(['0-10%', '10-20', '20-30%', '30-40%', '40-50%', '50-60%',
+                                '60-70%', '70-80%', '80-90%', '90-100%'], n_students),
+        'age_band': rng.choice(['0-35', '35-55', '55<='], n_students, p=[0.7, 0.29, 0.01]),
+        'num_of_prev_attempts': rng.poisson(0.16, n_students),
+        'studied_credits': rng.choice([30, 60, 90, 120], n_students, p=[0.3, 0.5, 0.1, 0.1]),
+        'disability': rng.choice(['N', 'Y'], n_students, p=[0.9, 0.1]),
+        'final_result': rng.choice(['Pass', 'Withdrawn', 'Fail', 'Distinction'], n_students,
+                                   p=[0.38, 0.31, 0.22, 0.09]),
+    })
+    student_info.to_csv(ou_dir / 'studentInfo.csv', index=False)
+
+    registration = student_info[['code_module', 'code_presentation', 'id_student']].copy()
+    registration['date_registration'] = rng.integers(-300, 100, n_students)
+    unregistered = rng.random(n_students) < 0.3
+    registration['date_unregistration'] = np.where(
+        unregistered, rng.integers(-100, 260, n_students), np.nan
+    )
+    registration.to_csv(ou_dir / 'studentRegistration.csv', index=False)
+
+    assessment_course = rng.integers(len(courses), size=n_assessments)
+    assessments = pd.DataFrame({
+        'code_module': courses['code_module'].to_numpy()[assessment_course],
+        'code_presentation': courses['code_presentation'].to_numpy()[assessment_course],
+        'id_assessment': np.arange(1752, 1752 + n_assessments),
+        'assessment_type': rng.choice(['TMA', 'CMA', 'Exam'], n_assessments, p=[0.52, 0.4, 0.08]),
+        'date': rng.integers(12, 262, n_assessments).astype(float),
+        'weight': rng.choice([0.0, 10.0, 20.0, 100.0], n_assessments, p=[0.4, 0.3, 0.25, 0.05]),
+    })
+    assessments.to_csv(ou_dir / 'assessments.csv', index=False)
+
+    def student_assessment_chunk(n, chunk_rng):
+        return pd.DataFrame({
+            'id_assessment': chunk_rng.choice(assessments['id_assessment'].to_numpy(), n),
+            'id_student': chunk_rng.choice(student_ids, n),
+            'date_submitted': chunk_rng.integers(-10, 270, n),
+            'is_banked': (chunk_rng.random(n) < 0.01).astype(int),
+            'score': np.clip(chunk_rng.normal(75, 18, n), 0, 100).round(),
+        })
+
+    n_student_assessments = _rows(OU_BASE_ROWS['student_assessments'], scale)
+    _write_chunked(ou_dir / 'studentAssessment.csv', n_student_assessments, student_assessment_chunk, rng)
+
+    site_course = rng.integers(len(courses), size=n_sites)
+    vle = pd.DataFrame({
+        'id_site': np.arange(526_000, 526_000 + n_sites),
+        'code_module': courses['code_module'].to_numpy()[site_course],
+        'code_presentation': courses['code_presentation'].to_numpy()[site_course],
+        'activity_type': rng.choice(OU_ACTIVITIES, n_sites),
+        'week_from': np.nan,
+        'week_to': np.nan,
+    })
+    vle.to_csv(ou_dir / 'vle.csv', index=False)
+
+    def student_vle_chunk(n, chunk_rng):
+        sites = chunk_rng.integers(n_sites, size=n)
+        return pd.DataFrame({
+            'code_module': vle['code_module'].to_numpy()[sites],
+            'code_presentation': vle['code_presentation'].to_numpy()[sites],
+            'id_student': chunk_rng.choice(student_ids, n),
+            'id_site': vle['id_site'].to_numpy()[sites],
+            'date': chunk_rng.integers(-25, 270, n),
+            'sum_click': chunk_rng.geometric(0.3, n),
+        })
+
+    n_interactions = _rows(OU_BASE_ROWS['vle_interactions'], scale)
+    _write_chunked(ou_dir / 'studentVle.csv', n_interactions, student_vle_chunk, rng)
+
+    return {
+        'studentInfo': n_students,
+        'studentRegistration': n_students,
+        'assessments': n_assessments,
+        'studentAssessment': n_student_assessments,
+        'vle': n_sites,
+        'studentVle': n_interactions,
+    }
+
+
+def _uci_frame(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    yes_no = lambda p: rng.choice(['yes', 'no'], n, p=[p, 1 - p])
+    jobs = ['teacher', 'health', 'services', 'at_home', 'other']
+    g1 = np.clip(rng.normal(11, 3.3, n), 0, 20).round().astype(int)
+    g2 = np.clip(g1 + rng.normal(0, 1.5, n), 0, 20).round().astype(int)
+    g3 = np.clip(g2 + rng.normal(0, 1.5, n), 0, 20).round().astype(int)
+    return pd.DataFrame({
+        'school': rng.choice(['GP', 'MS'], n, p=[0.7, 0.3]),
+        'sex': rng.choice(['F', 'M'], n),
+        'age': rng.integers(15, 23, n),
+        'address': rng.choice(['U', 'R'], n, p=[0.7, 0.3]),
+        'famsize': rng.choice(['GT3', 'LE3'], n, p=[0.7, 0.3]),
+        'Pstatus': rng.choice(['T', 'A'], n, p=[0.88, 0.12]),
+        'Medu': rng.integers(0, 5, n),
+        'Fedu': rng.integers(0, 5, n),
+        'Mjob': rng.choice(jobs, n),
+        'Fjob': rng.choice(jobs, n),
+        'reason': rng.choice(['course', 'home', 'reputation', 'other'], n),
+        'guardian': rng.choice(['mother', 'father', 'other'], n, p=[0.7, 0.23, 0.07]),
+        'traveltime': rng.integers(1, 5, n),
+        'studytime': rng.integers(1, 5, n),
+        'failures': rng.choice([0, 1, 2, 3], n, p=[0.8, 0.12, 0.05, 0.03]),
+        'schoolsup': yes_no(0.12),
+        'famsup': yes_no(0.6),
+        'paid': yes_no(0.3),
+        'activities': yes_no(0.5),
+        'nursery': yes_no(0.8),
+        'higher': yes_no(0.9),
+        'internet': yes_no(0.8),
+        'romantic': yes_no(0.35),
+        'famrel': rng.integers(1, 6, n),
+        'freetime': rng.integers(1, 6, n),
+        'goout': rng.integers(1, 6, n),
+        'Dalc': rng.integers(1, 6, n),
+        'Walc': rng.integers(1, 6, n),
+        'health': rng.integers(1, 6, n),
+        'absences': rng.poisson(4, n),
+        'G1': g1,
+        'G2': g2,
+        'G3': g3,
+    })
+
+
+def generate_uci(raw_dir: Path, scale: float = 1.0, seed: int = 42) -> Dict[str, int]:
+    """Write student-mat.csv / student-por.csv to raw_dir/uci_data"""
+    rng = np.random.default_rng(seed)
+    uci_dir = Path(raw_dir) / 'uci_data'
+    uci_dir.mkdir(parents=True, exist_ok=True)
+
+    counts = {}
+    for subject, filename in [('math', 'student-mat.csv'), ('portuguese', 'student-por.csv')]:
+        n = _rows(UCI_BASE_ROWS[subject], scale)
+        _uci_frame(n, rng).to_csv(uci_dir / filename, sep=';', index=False)
+        counts[filename] = n
+    return counts
+
+
+def generate_ai(raw_dir: Path, scale: float = 1.0, seed: int = 42) -> Dict[str, int]:
+    """Write Stu_Performance_dataset.csv to raw_dir/ai_course_data"""
+    rng = np.random.default_rng(seed)
+    ai_dir = Path(raw_dir) / 'ai_course_data' / 'Student Performance Dataset in AI course'
+    ai_dir.mkdir(parents=True, exist_ok=True)
+
+    n = _rows(AI_BASE_ROWS, scale)
+    maxima = {
+        'Quiz ': 10, 'Midterm': 15, 'Assignment_1': 5, 'Assignment_2': 5,
+        'Assignment_3': 5, 'Project': 10, 'Presentation': 10, 'Final_Exam': 40
+    }
+    df = pd.DataFrame({'Student Id': np.arange(1, n + 1)})
+    for column, maximum in maxima.items():
+        df[column] = (rng.beta(2.5, 2.0, n) * maximum).round(2)
+    df['Final_Exam'] = df['Final_Exam'].round()
+    df['Total'] = df[list(maxima)].sum(axis=1).round(2)
+    df['Grade'] = pd.cut(
+        df['Total'], bins=[-np.inf, 45, 50, 55, 60, 65, 70, 75, 80, 85, np.inf],
+        labels=['D+', 'C-', 'C', 'C+', 'B-', 'B', 'B+', 'A-', 'A', 'A+']
+    ).astype(str)
+    df['Categories'] = pd.cut(
+        df['Total'], bins=[-np.inf, 50, 65, 75, 85, np.inf],
+        labels=['Fail', 'Pass', 'Distinction', 'Excellent', 'Exceptional']
+    ).astype(str)
+
+    df.to_csv(ai_dir / 'Stu_Performance_dataset.csv', index=False)
+    return {'Stu_Performance_dataset.csv': n}
+
+
+GENERATORS = {
+    'OU': generate_ou,
+    'UCI': generate_uci,
+    'AI': generate_ai,
+}
@@ -0,0 +1,100 @@
+"""
+Import-time budget check for the core preprocessing and scoring modules
+
+Run from src/:
+    python check_import_time.py
+    python check_import_time.py --budget-scale 2     # slower machine / CI runner
+
+Each module is imported in a fresh interpreter with `python -X importtime`.
+The check fails (exit code 1) if the cumulative import time exceeds the
+module's budget, or if the import pulls in a plotting or optional ML library
+that should only be loaded lazily.
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Cumulative import time budgets in milliseconds (best of --repeat runs)
+BUDGETS_MS = {
+    'preprocessor.ou': 3500,
+    'preprocessor.uci': 3500,
+    'preprocessor.ai': 3500,
+    'predict': 1500,
+}
+
+# Libraries that must stay behind function-level imports
+FORBIDDEN_MODULES = ['matplotlib', 'seaborn', 'xgboost', 'lightgbm']
+
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+
+def import_profile(module: str) -> Dict[str, int]:
+    """Cumulative import time (microseconds) of every module loaded by importing module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = '\n'.join(line for line in result.stderr.splitlines() if not line.startswith('import time:'))
+        raise RuntimeError(f"Importing {module} failed:\n{error[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(3)] = int(match.group(2))
+    return cumulative
+
+
+def check_module(module: str, budget_ms: float, repeat: int) -> List[str]:
+    """Failure messages for module (empty if within budget)"""
+    profiles = [import_profile(module) for _ in range(repeat)]
+    best_ms = min(profile[module] for profile in profiles) / 1000
+
+    failures = []
+    loaded = [name for name in FORBIDDEN_MODULES if name in profiles[0]]
+    if loaded:
+        failures.append(f"{module} imports {', '.join(loaded)} at module level")
+    if best_ms > budget_ms:
+        slowest = sorted(profiles[0].items(), key=lambda item: item[1], reverse=True)[1:6]
+        details = ', '.join(f"{name} {us / 1000:.0f}ms" for name, us in slowest)
+        failures.append(f"{module} took {best_ms:.0f}ms (budget {budget_ms:.0f}ms); slowest: {details}")
+
+    status = 'FAIL' if failures else 'ok'
+    print(f"{module:25s} {best_ms:8.0f}ms / {budget_ms:6.0f}ms  {status}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import time of core modules against budgets")
+    parser.add_argument('--modules', nargs='+', default=list(BUDGETS_MS), choices=list(BUDGETS_MS))
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help="Multiply every budget (e.g. 2 on slow CI runners)")
+    parser.add_argument('--repeat', type=int, default=3, help="Imports per module; the fastest counts")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module in args.modules:
+        try:
+            failures.extend(check_module(module, BUDGETS_MS[module] * args.budget_scale, args.repeat))
+        except RuntimeError as e:
+            print(f"{module:25s} {'-':>8s}   / {BUDGETS_MS[module] * args.budget_scale:6.0f}ms  FAIL")
+            failures.append(str(e))
+
+    if failures:
+        print("\nImport-time check failed:")
+        for message in failures:
+            print(f"- {message}")
+        return 1
+
+    print("\nAll modules within their import-time budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
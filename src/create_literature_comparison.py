@@ -2,17 +2,9 @@
 Create literature comparison table and visualizations
 """
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 from pathlib import Path
-
-# Create results directory if it doesn't exist
-results_dir = Path('results')
-results_dir.mkdir(exist_ok=True)
-
-print("\nCreating literature comparison visualizations and analysis...")
-print("="*60)
+from report_renderer import ReportRenderer
 
 # Your results
 your_results = {
@@ -54,59 +46,7 @@ literature = [
     }
 ]
 
-df = pd.DataFrame(literature)
-
-# Create styled table
-fig, ax = plt.subplots(figsize=(16, 6))
-ax.axis('tight')
-ax.axis('off')
-
-table_data = []
-for _, row in df.iterrows():
-    table_data.append([
-        row['Paper'],
-        row['Method'],
-        row['Accuracy'],
-        row['Features'],
-        row['Our_Dataset'],
-        row['Our_Accuracy'],
-        row['Notes']
-    ])
-
-table = ax.table(cellText=table_data,
-                colLabels=['Paper (Year)', 'Method', 'Their Accuracy', 'Features Used', 
-                          'Our Dataset', 'Our Accuracy', 'Notes'],
-                cellLoc='left',
-                loc='center',
-                colWidths=[0.12, 0.15, 0.10, 0.18, 0.10, 0.10, 0.25])
-
-table.auto_set_font_size(False)
-table.set_fontsize(9)
-table.scale(1, 2.5)
-
-# Header styling
-for i in range(7):
-    table[(0, i)].set_facecolor('#4472C4')
-    table[(0, i)].set_text_props(weight='bold', color='white')
-
-# Row colors
-colors = ['#E7E6E6', 'white']
-for i in range(1, len(table_data) + 1):
-    for j in range(7):
-        table[(i, j)].set_facecolor(colors[i % 2])
-
-plt.title('Comparison with Published Research', 
-         fontsize=14, fontweight='bold', pad=20)
-plt.savefig('results/literature_comparison_table.png', 
-           dpi=300, bbox_inches='tight')
-plt.close()
-
-print("✅ Literature comparison table saved to results/literature_comparison_table.png")
-
-# Create comparison chart
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-# Chart 1: Our results vs literature (when comparable)
+# Our results vs literature (when comparable)
 comparison_data = {
     'UCI\n(Behavioral only)': [49.37, None],
     'Yağcı (2022)\n(+ Midterm grades)': [None, 72.5],  # Average of 70-75%
@@ -114,37 +54,7 @@ comparison_data = {
     'Chen & Jin (2024)\n(+ All metrics)': [None, 93.4]
 }
 
-x_pos = range(len(comparison_data))
-ours = [comparison_data[k][0] if comparison_data[k][0] else 0 for k in comparison_data.keys()]
-theirs = [comparison_data[k][1] if comparison_data[k][1] else 0 for k in comparison_data.keys()]
-
-x = range(len(comparison_data))
-width = 0.35
-
-bars1 = ax1.bar([i - width/2 for i in x], ours, width, label='Our Results', color='#2E75B6')
-bars2 = ax1.bar([i + width/2 for i in x], theirs, width, label='Literature', color='#FFC000')
-
-ax1.set_ylabel('Accuracy (%)', fontweight='bold')
-ax1.set_title('Our Results vs Literature', fontweight='bold')
-ax1.set_xticks(x)
-ax1.set_xticklabels(comparison_data.keys(), rotation=15, ha='right')
-ax1.legend()
-ax1.set_ylim([0, 100])
-
-# Add value labels
-for bar in bars1:
-    height = bar.get_height()
-    if height > 0:
-        ax1.text(bar.get_x() + bar.get_width()/2., height + 2,
-                f'{height:.1f}%', ha='center', va='bottom', fontweight='bold')
-
-for bar in bars2:
-    height = bar.get_height()
-    if height > 0:
-        ax1.text(bar.get_x() + bar.get_width()/2., height + 2,
-                f'{height:.1f}%', ha='center', va='bottom', fontweight='bold')
-
-# Chart 2: Feature importance comparison
+# Feature importance comparison
 feature_comparison = {
     'Demographics\nOnly': 49.37,
     '+ Study\nBehavior': 49.37,
@@ -152,23 +62,8 @@ feature_comparison = {
     '+ Exam\nScores': 93.4
 }
 
-ax2.bar(feature_comparison.keys(), feature_comparison.values(), 
-       color=['#C5E0B4', '#A9D08E', '#70AD47', '#548235'])
-ax2.set_ylabel('Accuracy (%)', fontweight='bold')
-ax2.set_title('Impact of Feature Types on Accuracy', fontweight='bold')
-ax2.set_ylim([0, 100])
-
-for i, (k, v) in enumerate(feature_comparison.items()):
-    ax2.text(i, v + 2, f'{v:.1f}%', ha='center', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('results/literature_comparison_charts.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-print("✅ Literature comparison charts saved to results/literature_comparison_charts.png")
-
-# Create key findings summary
-findings = """
+# Key findings summary
+FINDINGS = """
 KEY FINDINGS - LITERATURE COMPARISON
 ====================================
 
@@ -204,8 +99,120 @@ DEFENSIBLE POSITION
   the purpose of early intervention"
 """
 
-with open('results/key_findings.txt', 'w', encoding='utf-8') as f:
-    f.write(findings)
 
-print("✅ Key findings saved to results/key_findings.txt")
-print("\n" + findings)
\ No newline at end of file
+def draw_comparison_table(fig, table_data, col_labels):
+    """Styled literature comparison table"""
+    ax = fig.add_subplot()
+    ax.axis('tight')
+    ax.axis('off')
+    
+    table = ax.table(cellText=table_data,
+                    colLabels=col_labels,
+                    cellLoc='left',
+                    loc='center',
+                    colWidths=[0.12, 0.15, 0.10, 0.18, 0.10, 0.10, 0.25])
+    
+    table.auto_set_font_size(False)
+    table.set_fontsize(9)
+    table.scale(1, 2.5)
+    
+    # Header styling
+    for i in range(len(col_labels)):
+        table[(0, i)].set_facecolor('#4472C4')
+        table[(0, i)].set_text_props(weight='bold', color='white')
+    
+    # Row colors
+    colors = ['#E7E6E6', 'white']
+    for i in range(1, len(table_data) + 1):
+        for j in range(len(col_labels)):
+            table[(i, j)].set_facecolor(colors[i % 2])
+    
+    ax.set_title('Comparison with Published Research', 
+                 fontsize=14, fontweight='bold', pad=20)
+
+
+def draw_comparison_charts(fig, comparison_data, feature_comparison):
+    """Our results vs literature, and accuracy by feature types"""
+    ax1, ax2 = fig.subplots(1, 2)
+    
+    # Chart 1: Our results vs literature (when comparable)
+    ours = [comparison_data[k][0] if comparison_data[k][0] else 0 for k in comparison_data.keys()]
+    theirs = [comparison_data[k][1] if comparison_data[k][1] else 0 for k in comparison_data.keys()]
+    
+    x = range(len(comparison_data))
+    width = 0.35
+    
+    bars1 = ax1.bar([i - width/2 for i in x], ours, width, label='Our Results', color='#2E75B6')
+    bars2 = ax1.bar([i + width/2 for i in x], theirs, width, label='Literature', color='#FFC000')
+    
+    ax1.set_ylabel('Accuracy (%)', fontweight='bold')
+    ax1.set_title('Our Results vs Literature', fontweight='bold')
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(comparison_data.keys(), rotation=15, ha='right')
+    ax1.legend()
+    ax1.set_ylim([0, 100])
+    
+    # Add value labels
+    for bar in list(bars1) + list(bars2):
+        height = bar.get_height()
+        if height > 0:
+            ax1.text(bar.get_x() + bar.get_width()/2., height + 2,
+                    f'{height:.1f}%', ha='center', va='bottom', fontweight='bold')
+    
+    # Chart 2: Feature importance comparison
+    ax2.bar(list(feature_comparison.keys()), list(feature_comparison.values()), 
+           color=['#C5E0B4', '#A9D08E', '#70AD47', '#548235'])
+    ax2.set_ylabel('Accuracy (%)', fontweight='bold')
+    ax2.set_title('Impact of Feature Types on Accuracy', fontweight='bold')
+    ax2.set_ylim([0, 100])
+    
+    for i, (k, v) in enumerate(feature_comparison.items()):
+        ax2.text(i, v + 2, f'{v:.1f}%', ha='center', fontweight='bold')
+    
+    fig.tight_layout()
+
+
+def main():
+    # Create results directory if it doesn't exist
+    results_dir = Path('results')
+    results_dir.mkdir(exist_ok=True)
+    
+    print("\nCreating literature comparison visualizations and analysis...")
+    print("="*60)
+    
+    df = pd.DataFrame(literature)
+    table_data = [
+        [row['Paper'], row['Method'], row['Accuracy'], row['Features'],
+         row['Our_Dataset'], row['Our_Accuracy'], row['Notes']]
+        for _, row in df.iterrows()
+    ]
+    
+    renderer = ReportRenderer()
+    renderer.add(
+        draw_comparison_table,
+        results_dir / 'literature_comparison_table.png',
+        figsize=(16, 6),
+        savefig_kwargs={'dpi': 300, 'bbox_inches': 'tight'},
+        table_data=table_data,
+        col_labels=['Paper (Year)', 'Method', 'Their Accuracy', 'Features Used',
+                    'Our Dataset', 'Our Accuracy', 'Notes']
+    )
+    renderer.add(
+        draw_comparison_charts,
+        results_dir / 'literature_comparison_charts.png',
+        figsize=(14, 6),
+        savefig_kwargs={'dpi': 300, 'bbox_inches': 'tight'},
+        comparison_data=comparison_data,
+        feature_comparison=feature_comparison
+    )
+    
+    with open(results_dir / 'key_findings.txt', 'w', encoding='utf-8') as f:
+        f.write(FINDINGS)
+    
+    for path in renderer.render():
+        print(f"✅ Literature comparison figure saved to {path}")
+    print("✅ Key findings saved to results/key_findings.txt")
+    print("\n" + FINDINGS)
+
+if __name__ == "__main__":
+    main()
@@ -7,23 +7,99 @@ import pandas as pd
 import numpy as np
 from sklearn.naive_bayes import GaussianNB
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support
-from sklearn.metrics import confusion_matrix, roc_curve, auc
-import matplotlib.pyplot as plt
-import seaborn as sns
+from sklearn.kernel_approximation import Nystroem
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import make_pipeline
+from sklearn.base import clone
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import tempfile
+import time
 import joblib
 import json
 from pathlib import Path
 import logging
+from profiling import profiled
+from report_renderer import ReportRenderer
+from evaluation_kernel import EvaluationResult, evaluate_probabilities
+from bootstrap_metrics import bootstrap_intervals_from_confusion, format_interval
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds a single baseline fit may take before its worker is terminated
+BASELINE_TIMEOUT_S = 600
+
+# Above this many samples the exact RBF SVC (cubic in n, plus 5-fold Platt
+# calibration) is replaced by Nystroem features + LinearSVC
+EXACT_SVM_MAX_SAMPLES = 10000
+
+
+def approximate_svm(n_samples: int, random_state: int = 42):
+    """Calibrated linear SVM on a Nystroem approximation of the RBF kernel"""
+    return CalibratedClassifierCV(
+        make_pipeline(
+            Nystroem(kernel='rbf', n_components=min(500, n_samples), random_state=random_state),
+            LinearSVC(random_state=random_state)
+        ),
+        method='sigmoid',
+        cv=3
+    )
+
+
+def _fit_baseline(conn, model, X_path, y_path):
+    """Worker: fit one baseline on the saved dataset and send back (classes_, predict_proba(X))"""
+    try:
+        X = np.load(X_path, mmap_mode='r')
+        y = np.load(y_path, allow_pickle=True)
+        model.fit(X, y)
+        conn.send(('ok', (model.classes_, model.predict_proba(X))))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def draw_roc_curve(fig, curves, title):
+    """ROC figure from precomputed (label, fpr, tpr, auc) curves"""
+    ax = fig.add_subplot()
+    for label, fpr, tpr, roc_auc in curves:
+        ax.plot(fpr, tpr, label=f'{label} (AUC = {roc_auc:.2f})')
+    
+    ax.plot([0, 1], [0, 1], 'k--')
+    ax.set_xlim([0.0, 1.0])
+    ax.set_ylim([0.0, 1.05])
+    ax.set_xlabel('False Positive Rate')
+    ax.set_ylabel('True Positive Rate')
+    ax.set_title(title)
+    ax.legend(loc="lower right")
+
+
+def draw_model_comparison(fig, model_names, scores, title):
+    """Grouped bar chart of {metric: [score per model]}"""
+    ax = fig.add_subplot()
+    x = np.arange(len(model_names))
+    width = 0.2
+    
+    for i, (metric, values) in enumerate(scores.items()):
+        ax.bar(x + i*width, values, width, label=metric)
+    
+    ax.set_xlabel('Models')
+    ax.set_ylabel('Score')
+    ax.set_title(title)
+    ax.set_xticks(x + width*1.5)
+    ax.set_xticklabels(model_names, rotation=45)
+    ax.legend()
+    fig.tight_layout()
+
+
 class ModelEvaluator:
-    def __init__(self, base_path=None):
+    def __init__(self, base_path=None, max_workers=None, baseline_timeout=BASELINE_TIMEOUT_S,
+                 exact_svm_max_samples=EXACT_SVM_MAX_SAMPLES):
         """Initialize evaluator with base path"""
         if base_path is None:
             base_path = Path.cwd()
@@ -41,6 +117,14 @@ class ModelEvaluator:
         self.scaler = None
         self.baseline_models = {}
         self.metrics = {}
+        # (dataset, model) -> EvaluationResult; reports and plots read from here
+        self.results = {}
+        self.renderer = ReportRenderer()
+        
+        # Baselines are fitted in up to max_workers processes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.baseline_timeout = baseline_timeout
+        self.exact_svm_max_samples = exact_svm_max_samples
         
         logger.info(f"Using data path: {self.data_path}")
         logger.info(f"Using models path: {self.models_path}")
@@ -99,6 +183,8 @@ class ModelEvaluator:
         """Evaluate ensemble model and all baseline models"""
         logger.info("Evaluating all models...")
         
+        baseline_tasks = []
+        baseline_data = {}
         for dataset_name, dataset in self.test_sets.items():
             logger.info(f"Evaluating on {dataset_name} dataset...")
             
@@ -133,95 +219,176 @@ class ModelEvaluator:
                 dataset_name
             )
             
-            # Train and evaluate baseline models
+            # Queue baseline models; they are fitted in parallel below
             unique_classes = len(np.unique(y))
             if unique_classes < 2:
                 logger.warning(f"Dataset {dataset_name} has only {unique_classes} class(es). Skipping baseline models.")
             else:
+                baseline_data[dataset_name] = (X_scaled, y)
                 for name, model in self.baseline_models.items():
-                    model.fit(X_scaled, y)
-                    self._evaluate_model(model, X_scaled, y, name, dataset_name)
+                    baseline_tasks.append((dataset_name, name, self._baseline_for(name, model, len(y))))
+        
+        fitted = self._fit_baselines(baseline_tasks, baseline_data)
+        for dataset_name, name, _ in baseline_tasks:
+            if (dataset_name, name) in fitted:
+                classes, y_prob = fitted[(dataset_name, name)]
+                self._record_result(baseline_data[dataset_name][1], y_prob, classes, name, dataset_name)
                 
         return self.metrics
     
+    def _baseline_for(self, name, model, n_samples):
+        """Fresh copy of a baseline, with the scalable SVM on large datasets"""
+        if name == 'svm' and n_samples > self.exact_svm_max_samples:
+            logger.info(f"{n_samples} samples > {self.exact_svm_max_samples}: using Nystroem + LinearSVC for svm")
+            return approximate_svm(n_samples)
+        return clone(model)
+    
+    def _fit_baselines(self, tasks, datasets):
+        """
+        Fit (dataset, name, model) tasks in spawned worker processes
+        
+        At most max_workers run at once. A task still running after
+        baseline_timeout seconds is terminated and left out of the results.
+        
+        Args:
+            tasks: (dataset name, baseline name, unfitted model) tuples
+            datasets: dataset name -> (X, y); each is saved once to a temporary
+                .npy file that the workers memory-map, rather than pickled per task
+        
+        Returns:
+            (dataset, name) -> (classes, probability matrix)
+        """
+        if not tasks:
+            return {}
+        with tempfile.TemporaryDirectory(prefix='baselines_') as tmp_dir:
+            paths = {}
+            for dataset_name in {task[0] for task in tasks}:
+                X, y = datasets[dataset_name]
+                paths[dataset_name] = (os.path.join(tmp_dir, f'{dataset_name}_X.npy'),
+                                       os.path.join(tmp_dir, f'{dataset_name}_y.npy'))
+                np.save(paths[dataset_name][0], np.ascontiguousarray(X))
+                np.save(paths[dataset_name][1], np.asarray(y))
+            return self._run_baseline_workers(tasks, paths)
+    
+    def _run_baseline_workers(self, tasks, paths):
+        logger.info(f"Fitting {len(tasks)} baseline model(s) with {min(self.max_workers, len(tasks))} worker(s)...")
+        
+        # Spawned, not forked: forking after BLAS/loky threads have started can deadlock the child
+        context = multiprocessing.get_context('spawn')
+        pending = list(tasks)
+        running = {}  # result pipe -> (process, (dataset, name), start time)
+        fitted = {}
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                dataset_name, name, model = pending.pop(0)
+                reader, writer = context.Pipe(duplex=False)
+                process = context.Process(target=_fit_baseline, args=(writer, model, *paths[dataset_name]),
+                                          daemon=True)
+                process.start()
+                writer.close()
+                running[reader] = (process, (dataset_name, name), time.monotonic())
+            
+            timeout = None
+            if self.baseline_timeout is not None:
+                first_deadline = min(started for _, _, started in running.values()) + self.baseline_timeout
+                timeout = max(0.0, first_deadline - time.monotonic())
+            
+            for reader in wait(list(running), timeout=timeout):
+                process, key, started = running.pop(reader)
+                try:
+                    status, payload = reader.recv()
+                except EOFError:
+                    status, payload = 'error', f"worker exited with code {process.exitcode}"
+                reader.close()
+                process.join()
+                
+                if status == 'ok':
+                    fitted[key] = payload
+                    logger.info(f"Fitted {key[1]} on {key[0]} in {time.monotonic() - started:.1f}s")
+                else:
+                    logger.error(f"Error fitting {key[1]} on {key[0]}: {payload}")
+            
+            if self.baseline_timeout is not None:
+                now = time.monotonic()
+                for reader, (process, key, started) in list(running.items()):
+                    if now - started > self.baseline_timeout:
+                        process.terminate()
+                        process.join()
+                        reader.close()
+                        del running[reader]
+                        logger.warning(f"Timed out fitting {key[1]} on {key[0]} after {self.baseline_timeout}s; skipping it")
+        
+        return fitted
+    
     def _evaluate_model(self, model, X, y, model_name, dataset_name):
         """Evaluate a single model and store metrics"""
-        # Make predictions
-        y_pred = model.predict(X)
-        y_prob = model.predict_proba(X)
-        
-        # Calculate metrics
-        accuracy = accuracy_score(y, y_pred)
-        precision, recall, f1, _ = precision_recall_fscore_support(
-            y, y_pred, average='weighted'
-        )
+        # One predict_proba call; labels, metrics and curves are all derived from it
+        self._record_result(y, model.predict_proba(X), model.classes_, model_name, dataset_name)
+    
+    def _record_result(self, y, y_prob, classes, model_name, dataset_name):
+        """Derive and store metrics from a probability matrix"""
+        result = evaluate_probabilities(y, y_prob, classes)
+        self.results[(dataset_name, model_name)] = result
         
         # Store metrics
         if dataset_name not in self.metrics:
             self.metrics[dataset_name] = {}
             
-        self.metrics[dataset_name][model_name] = {
-            'accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1': f1
-        }
+        self.metrics[dataset_name][model_name] = result.metrics
         
         # Generate ROC curve
-        self._plot_roc_curve(y, y_prob, model_name, dataset_name)
+        self._plot_roc_curve(y, result, model_name, dataset_name)
+    
+    def get_result(self, model_name, dataset_name) -> EvaluationResult:
+        """Cached evaluation of a model on a dataset (no inference)"""
+        return self.results[(dataset_name, model_name)]
         
-    def _plot_roc_curve(self, y_true, y_prob, model_name, dataset_name):
-        """Plot ROC curve for multi-class classification"""
+    def _plot_roc_curve(self, y_true, result, model_name, dataset_name):
+        """Queue the ROC figure for multi-class classification"""
         n_classes = len(np.unique(y_true))
         if n_classes < 2:
             logger.warning(f"Cannot create ROC curve for {dataset_name} - only {n_classes} class(es) present")
             return
-            
-        plt.figure(figsize=(8, 6))
         
-        # Calculate ROC curve for each class
-        for i in range(n_classes):
-            fpr, tpr, _ = roc_curve((y_true == i).astype(int), y_prob[:, i])
-            roc_auc = auc(fpr, tpr)
-            plt.plot(fpr, tpr, label=f'Class {i} (AUC = {roc_auc:.2f})')
+        # One-vs-rest curves were computed with the metrics; only the points go to the renderer
+        curves = [
+            (f'Class {label}', fpr, tpr, roc_auc)
+            for label, (fpr, tpr, roc_auc) in result.roc.items()
+            if not np.isnan(roc_auc)
+        ]
         
-        plt.plot([0, 1], [0, 1], 'k--')
-        plt.xlim([0.0, 1.0])
-        plt.ylim([0.0, 1.05])
-        plt.xlabel('False Positive Rate')
-        plt.ylabel('True Positive Rate')
-        plt.title(f'ROC Curve - {model_name} ({dataset_name})')
-        plt.legend(loc="lower right")
-        plt.savefig(self.reports_path / f'roc_{model_name}_{dataset_name.lower()}.png')
-        plt.close()
+        self.renderer.add(
+            draw_roc_curve,
+            self.reports_path / f'roc_{model_name}_{dataset_name.lower()}.png',
+            curves=curves,
+            title=f'ROC Curve - {model_name} ({dataset_name})'
+        )
         
     def create_comparison_visualizations(self):
-        """Create visualizations comparing all models"""
+        """Queue visualizations comparing all models"""
         logger.info("Creating comparison visualizations...")
         
         for dataset_name in self.metrics:
             # Prepare data for plotting
             model_names = list(self.metrics[dataset_name].keys())
             metrics_names = ['accuracy', 'precision', 'recall', 'f1']
+            scores = {
+                metric: [self.metrics[dataset_name][model][metric] for model in model_names]
+                for metric in metrics_names
+            }
             
-            # Create comparison bar plot
-            plt.figure(figsize=(12, 6))
-            x = np.arange(len(model_names))
-            width = 0.2
-            
-            for i, metric in enumerate(metrics_names):
-                values = [self.metrics[dataset_name][model][metric] 
-                         for model in model_names]
-                plt.bar(x + i*width, values, width, label=metric)
-            
-            plt.xlabel('Models')
-            plt.ylabel('Score')
-            plt.title(f'Model Comparison - {dataset_name} Dataset')
-            plt.xticks(x + width*1.5, model_names, rotation=45)
-            plt.legend()
-            plt.tight_layout()
-            plt.savefig(self.reports_path / f'model_comparison_{dataset_name.lower()}.png')
-            plt.close()
+            self.renderer.add(
+                draw_model_comparison,
+                self.reports_path / f'model_comparison_{dataset_name.lower()}.png',
+                figsize=(12, 6),
+                model_names=model_names,
+                scores=scores,
+                title=f'Model Comparison - {dataset_name} Dataset'
+            )
+    
+    def render_figures(self):
+        """Render every queued figure (after the metrics are final)"""
+        return self.renderer.render()
     
     def generate_report(self):
         """Generate comprehensive evaluation report"""
@@ -229,6 +396,27 @@ class ModelEvaluator:
         
         report = {
             'metrics': self.metrics,
+            'per_class': {
+                dataset_name: {
+                    model_name: {
+                        'classes': result.classes.tolist(),
+                        'roc_auc': [None if np.isnan(value) else value for value in result.auc.values()],
+                        'average_precision': [None if np.isnan(ap) else ap for _, _, ap in result.pr.values()],
+                        'confusion_matrix': result.confusion.tolist()
+                    }
+                    for (result_dataset, model_name), result in self.results.items()
+                    if result_dataset == dataset_name
+                }
+                for dataset_name in self.metrics
+            },
+            'confidence_intervals': {
+                dataset_name: {
+                    model_name: bootstrap_intervals_from_confusion(result.confusion)
+                    for (result_dataset, model_name), result in self.results.items()
+                    if result_dataset == dataset_name
+                }
+                for dataset_name in self.metrics
+            },
             'summary': {
                 'best_model': {},
                 'improvement_over_baseline': {}
@@ -265,6 +453,7 @@ class ModelEvaluator:
             
         return report
 
+@profiled('evaluate_model')
 def main():
     """Main execution function"""
     # Create evaluator instance
@@ -281,6 +470,7 @@ def main():
     # Generate visualizations and report
     evaluator.create_comparison_visualizations()
     report = evaluator.generate_report()
+    evaluator.render_figures()
     
     # Print detailed summary
     print("\nDetailed Evaluation Summary:")
@@ -294,20 +484,20 @@ def main():
         n_samples = len(test_data)
         n_classes = len(np.unique(test_data['weakness_level']))
         
-        print(f"Dataset Info:")
+        print("Dataset Info:")
         print(f"- Samples: {n_samples}")
         print(f"- Features used: {n_features} out of {len(evaluator.scaler.feature_names_in_)}")
         print(f"- Unique classes: {n_classes}")
         print()
         
         # Model performance
-        print("Model Performance:")
-        for model_name, metrics in evaluator.metrics[dataset].items():
+        print("Model Performance (95% bootstrap CI):")
+        for model_name, intervals in report['confidence_intervals'][dataset].items():
             print(f"\n{model_name.title()}:")
-            print(f"- Accuracy:  {metrics['accuracy']:.4f}")
-            print(f"- Precision: {metrics['precision']:.4f}")
-            print(f"- Recall:    {metrics['recall']:.4f}")
-            print(f"- F1 Score:  {metrics['f1']:.4f}")
+            print(f"- Accuracy:  {format_interval(intervals['accuracy'])}")
+            print(f"- Precision: {format_interval(intervals['precision'])}")
+            print(f"- Recall:    {format_interval(intervals['recall'])}")
+            print(f"- F1 Score:  {format_interval(intervals['f1'])}")
         
         # Best model and improvement
         best_model = report['summary']['best_model'][dataset]['model']
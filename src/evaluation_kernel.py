@@ -0,0 +1,121 @@
+"""
+Single-pass classification metrics from one predict_proba matrix
+
+`evaluate_probabilities` derives everything ModelEvaluator reports from a
+model's probability matrix: labels come from the row-wise argmax, the
+confusion matrix from one bincount, weighted precision/recall/F1 from the
+confusion matrix, and every one-vs-rest ROC and precision-recall curve from a
+single argsort of each class column. Nothing calls the model a second time.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class EvaluationResult:
+    """Metrics and curves for one (model, dataset) pair"""
+
+    def __init__(self, classes: np.ndarray, y_pred: np.ndarray, confusion: np.ndarray,
+                 roc: Dict, pr: Dict):
+        self.classes = classes
+        self.y_pred = y_pred
+        self.confusion = confusion
+        self.roc = roc  # class -> (fpr, tpr, auc)
+        self.pr = pr    # class -> (precision, recall, average_precision)
+
+        tp = np.diag(confusion).astype(float)
+        support = confusion.sum(axis=1)
+        predicted = confusion.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.class_precision = np.where(predicted > 0, tp / predicted, 0.0)
+            self.class_recall = np.where(support > 0, tp / support, 0.0)
+            denominator = self.class_precision + self.class_recall
+            self.class_f1 = np.where(denominator > 0, 2 * self.class_precision * self.class_recall / denominator, 0.0)
+        self.support = support
+
+        total = support.sum()
+        self.accuracy = float(tp.sum() / total) if total else 0.0
+        weights = support / total if total else np.zeros_like(tp)
+        self.precision = float(weights @ self.class_precision)
+        self.recall = float(weights @ self.class_recall)
+        self.f1 = float(weights @ self.class_f1)
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """The weighted summary stored in ModelEvaluator.metrics"""
+        return {
+            'accuracy': self.accuracy,
+            'precision': self.precision,
+            'recall': self.recall,
+            'f1': self.f1
+        }
+
+    @property
+    def auc(self) -> Dict:
+        return {label: roc_auc for label, (_, _, roc_auc) in self.roc.items()}
+
+
+def _binary_curves(scores: np.ndarray, positives: np.ndarray) -> Tuple[Tuple, Tuple]:
+    """ROC and PR curves of one class column from a single descending sort"""
+    order = np.argsort(-scores, kind='mergesort')
+    sorted_scores = scores[order]
+    sorted_positives = positives[order]
+
+    # Last index of each distinct score: one curve point per threshold
+    threshold_idx = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    tps = np.cumsum(sorted_positives)[threshold_idx].astype(float)
+    fps = (threshold_idx + 1) - tps
+
+    n_pos, n_neg = tps[-1], fps[-1]
+    if n_pos == 0 or n_neg == 0:
+        # One-vs-rest curves are undefined without both positives and negatives
+        roc = (np.array([0.0, 1.0]), np.array([0.0, 1.0]), float('nan'))
+    else:
+        fpr = np.r_[0.0, fps / n_neg]
+        tpr = np.r_[0.0, tps / n_pos]
+        # Trapezoidal area under the curve
+        roc = (fpr, tpr, float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)))
+
+    if n_pos == 0:
+        pr = (np.array([1.0]), np.array([0.0]), float('nan'))
+    else:
+        precision = tps / (tps + fps)
+        recall = tps / n_pos
+        # Step-wise average precision, as in sklearn.metrics.average_precision_score
+        average_precision = float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+        pr = (np.r_[1.0, precision], np.r_[0.0, recall], average_precision)
+
+    return roc, pr
+
+
+def evaluate_probabilities(y_true: Sequence, y_prob: np.ndarray, classes: Sequence) -> EvaluationResult:
+    """
+    All evaluation outputs from one probability matrix
+
+    Args:
+        y_true: true labels
+        y_prob: (n_samples, n_classes) output of predict_proba
+        classes: label of each probability column (the model's classes_)
+    """
+    classes = np.asarray(classes)
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob, dtype=float)
+    n_classes = len(classes)
+
+    # Column index of each true label (-1 for labels the model never saw)
+    sorter = np.argsort(classes)
+    positions = np.searchsorted(classes, y_true, sorter=sorter)
+    positions = np.minimum(positions, n_classes - 1)
+    true_idx = np.where(classes[sorter[positions]] == y_true, sorter[positions], -1)
+
+    pred_idx = y_prob.argmax(axis=1)
+    known = true_idx >= 0
+    confusion = np.bincount(
+        true_idx[known] * n_classes + pred_idx[known], minlength=n_classes * n_classes
+    ).reshape(n_classes, n_classes)
+
+    roc, pr = {}, {}
+    for i, label in enumerate(classes):
+        roc[label.item()], pr[label.item()] = _binary_curves(y_prob[:, i], true_idx == i)
+
+    return EvaluationResult(classes, classes[pred_idx], confusion, roc, pr)
@@ -0,0 +1,245 @@
+"""
+Incremental Parquet snapshots of the platform tables for training
+
+Each table in SNAPSHOT_TABLES is read page by page with keyset pagination on
+its primary key (WHERE pk > last ORDER BY pk LIMIT n). Page cost stays the
+same however deep the export is, unlike OFFSET. Only rows whose timestamp
+column falls in [watermark, upper_bound) are exported, so every run picks up
+where the previous one stopped:
+
+    data/snapshots/<table>/date=YYYY-MM-DD/part-<window end>-<first pk>.parquet
+
+The checkpoint file records, per table, the watermark of the last completed
+run and the window and last primary key of the run in progress. An
+interrupted export resumes at the next page. Pages are named by their run's
+window end and first key: a resumed run re-writes its own pages instead of
+duplicating rows, and a later run (say, re-scored weakness_analysis rows
+with the same keys on the same day) never replaces an earlier run's files.
+
+Run from src/:
+    python export_snapshots.py --db-url sqlite:///../data/learnmate.db
+    python export_snapshots.py --db-url mysql://... --tables quiz_attempts quiz_responses
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from database import ConnectionPool, placeholder
+from profiling import profiled
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / 'data' / 'snapshots'
+CHECKPOINT_FILE = '_checkpoint.json'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Start of the first (full) export
+EPOCH = '1970-01-01 00:00:00'
+
+# table -> (primary key, timestamp the snapshot is incremental and partitioned on)
+SNAPSHOT_TABLES = {
+    'topics': ('topic_id', 'created_at'),
+    'questions': ('question_id', 'created_at'),
+    'quiz_attempts': ('attempt_id', 'created_at'),
+    'quiz_responses': ('response_id', 'answered_at'),
+    # Re-scored rows get a new analyzed_at and are exported again
+    'weakness_analysis': ('analysis_id', 'analyzed_at'),
+    'recommendations': ('recommendation_id', 'recommended_at')
+}
+
+
+def load_checkpoint(output_dir: Path) -> Dict:
+    path = output_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(output_dir: Path, checkpoint: Dict):
+    """Write the checkpoint atomically so a crash never leaves it half-written"""
+    path = output_dir / CHECKPOINT_FILE
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _normalize(page: pd.DataFrame, timestamp_column: str) -> pd.DataFrame:
+    """Column types that stay the same from page to page and driver to driver"""
+    for column in page.columns:
+        if column == timestamp_column or column.endswith(('_at', '_date')):
+            page[column] = pd.to_datetime(page[column])
+        elif page[column].dtype == object and page[column].map(lambda value: isinstance(value, Decimal)).any():
+            # MySQL DECIMAL columns arrive as Decimal objects
+            page[column] = page[column].astype(float)
+    return page
+
+
+def write_partitions(page: pd.DataFrame, table_dir: Path, timestamp_column: str, first_pk: int,
+                     run_token: str) -> int:
+    """Write one page as one Parquet file per day; returns the number of files"""
+    # Only needed for exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    days = page[timestamp_column].dt.strftime('%Y-%m-%d')
+    for day, rows in page.groupby(days, sort=True):
+        partition = table_dir / f'date={day}'
+        partition.mkdir(parents=True, exist_ok=True)
+        path = partition / f'part-{run_token}-{first_pk:012d}.parquet'
+        tmp_path = path.with_suffix('.tmp')
+        pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+    return days.nunique()
+
+
+class SnapshotExporter:
+    """Exports SNAPSHOT_TABLES from a connection pool into partitioned Parquet"""
+
+    def __init__(self, pool: ConnectionPool, output_dir: Path = SNAPSHOT_DIR,
+                 page_size: int = 50000, settle_seconds: int = 60):
+        """
+        Args:
+            pool: connections to the platform database
+            output_dir: snapshot root (one directory per table)
+            page_size: rows per keyset page
+            settle_seconds: the export window ends this far before now, so rows
+                of transactions still in flight are left for the next run
+        """
+        self.pool = pool
+        self.output_dir = Path(output_dir)
+        self.page_size = page_size
+        self.settle_seconds = settle_seconds
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint = load_checkpoint(self.output_dir)
+        self._checkpoint_lock = threading.Lock()
+
+    def _save_state(self, table: str, state: Dict):
+        with self._checkpoint_lock:
+            self.checkpoint[table] = state
+            save_checkpoint(self.output_dir, self.checkpoint)
+
+    def _state(self, table: str) -> Dict:
+        """Window and position of the table's export, resuming an unfinished run"""
+        state = dict(self.checkpoint.get(table, {'watermark': EPOCH}))
+        if state.get('upper_bound') is None:
+            upper_bound = datetime.now() - timedelta(seconds=self.settle_seconds)
+            state.update(upper_bound=upper_bound.strftime(TIMESTAMP_FORMAT), last_pk=0)
+        else:
+            logger.info(f"Resuming {table} export after key {state['last_pk']}")
+        return state
+
+    def export_table(self, table: str) -> int:
+        """Export the table's rows newer than its watermark; returns rows written"""
+        primary_key, timestamp_column = SNAPSHOT_TABLES[table]
+        state = self._state(table)
+        table_dir = self.output_dir / table
+        # Identifies the run in file names; the same when the run is resumed
+        run_token = datetime.strptime(state['upper_bound'], TIMESTAMP_FORMAT).strftime('%Y%m%d%H%M%S')
+
+        start = time.perf_counter()
+        rows = 0
+        with self.pool.connection() as connection:
+            marker = placeholder(connection)
+            query = (f"SELECT * FROM {table} "
+                     f"WHERE {primary_key} > {marker} "
+                     f"AND {timestamp_column} >= {marker} AND {timestamp_column} < {marker} "
+                     f"ORDER BY {primary_key} LIMIT {int(self.page_size)}")
+            cursor = connection.cursor()
+            try:
+                while True:
+                    cursor.execute(query, (state['last_pk'], state['watermark'], state['upper_bound']))
+                    columns = [description[0] for description in cursor.description]
+                    records = cursor.fetchall()
+                    if not records:
+                        break
+
+                    page = _normalize(pd.DataFrame.from_records(records, columns=columns), timestamp_column)
+                    write_partitions(page, table_dir, timestamp_column, int(page[primary_key].iloc[0]), run_token)
+                    rows += len(page)
+
+                    state['last_pk'] = int(page[primary_key].iloc[-1])
+                    self._save_state(table, dict(state))
+                    if len(records) < self.page_size:
+                        break
+            finally:
+                cursor.close()
+
+        # Run complete: the next one starts at this window's end
+        self._save_state(table, {'watermark': state['upper_bound'], 'upper_bound': None, 'last_pk': 0})
+
+        elapsed = time.perf_counter() - start
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Exported {rows} {table} rows up to {state['upper_bound']} "
+                    f"in {elapsed:.1f}s ({rate:.0f} rows/s)")
+        return rows
+
+    def export(self, tables: Sequence[str] = tuple(SNAPSHOT_TABLES), workers: int = 1) -> Dict[str, int]:
+        """Export several tables, up to `workers` at a time"""
+        unknown = [table for table in tables if table not in SNAPSHOT_TABLES]
+        if unknown:
+            raise ValueError(f"Unknown snapshot tables: {unknown}")
+
+        if workers <= 1:
+            return {table: self.export_table(table) for table in tables}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(self.export_table, tables))
+        return dict(zip(tables, counts))
+
+
+def read_snapshot(table: str, snapshot_dir: Path = SNAPSHOT_DIR,
+                  start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load an exported table, optionally only the day partitions in [start_date, end_date]
+
+    Tables exported on a changing timestamp (weakness_analysis) can contain a
+    row more than once; the latest version of each key is kept.
+    """
+    primary_key, timestamp_column = SNAPSHOT_TABLES[table]
+    files: List[Path] = []
+    for partition in sorted((Path(snapshot_dir) / table).glob('date=*')):
+        day = partition.name[len('date='):]
+        if (start_date is None or day >= start_date) and (end_date is None or day <= end_date):
+            files.extend(sorted(partition.glob('*.parquet')))
+    if not files:
+        return pd.DataFrame()
+
+    df = pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+    return (df.sort_values(timestamp_column, kind='stable')
+              .drop_duplicates(primary_key, keep='last')
+              .sort_values(primary_key)
+              .reset_index(drop=True))
+
+
+@profiled('export_snapshots')
+def main():
+    parser = argparse.ArgumentParser(description="Export platform tables to incremental Parquet snapshots")
+    parser.add_argument('--db-url', help="Database URL (default: LEARNMATE_DB_URL)")
+    parser.add_argument('--output', type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument('--tables', nargs='+', default=list(SNAPSHOT_TABLES), choices=list(SNAPSHOT_TABLES))
+    parser.add_argument('--page-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=2, help="Tables exported concurrently")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db_url, size=args.workers)
+    try:
+        exporter = SnapshotExporter(pool, args.output, page_size=args.page_size)
+        counts = exporter.export(args.tables, workers=args.workers)
+    finally:
+        pool.close()
+    logger.info(f"Snapshot complete: {counts}")
+
+
+if __name__ == "__main__":
+    main()
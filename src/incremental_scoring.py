@@ -0,0 +1,361 @@
+"""
+Event-driven re-scoring of weakness_analysis
+
+When a quiz attempt is saved, the submitting service publishes an "attempt
+completed" event to a queue (see attempt_events.py). IncrementalScorer
+consumes the queue in small batches and:
+
+1. keeps running per-(user, topic) aggregates (attempt count, Welford mean and
+   variance of the score, time and answer totals, first/last attempt), each
+   updated in O(1) per event and bootstrapped from quiz_attempts the first
+   time a user is seen;
+2. re-scores only the pairs touched by the batch with one
+   score_weakness_analysis.score_features call (WeaknessPredictor or the
+   stored-procedure bands);
+3. upserts those weakness_analysis rows in one statement.
+
+Work is proportional to the number of submissions, not the number of users,
+and a row is fresh within one batch wait (max_wait, 1s by default).
+
+Events are idempotent: an aggregate remembers the highest attempt_id the
+bootstrap query covered and the ids of the events it applied since, so
+redelivered events and attempts already included by the bootstrap are
+skipped. An event older than the bootstrap that was not applied (it may or
+may not have been committed when the database was read) reloads the pair
+from the database instead of being guessed at.
+
+Run the worker from src/:
+    python incremental_scoring.py --db-url sqlite:///../data/learnmate.db --queue ../data/attempt_events.db
+"""
+import argparse
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from attempt_events import SQLiteEventQueue
+from database import bulk_upsert, connect, is_sqlite
+from metrics import REGISTRY
+from predict import WeaknessPredictor
+from preprocessor.quiz import AGGREGATE_COLUMNS, QuizPreprocessor, engineer_features
+from score_weakness_analysis import MODEL_DIR, score_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVENTS = REGISTRY.counter(
+    'learnmate_incremental_events', 'Attempt events consumed by the incremental scorer', ['outcome'])
+RESCORED_ROWS = REGISTRY.counter(
+    'learnmate_incremental_rescored_rows', 'weakness_analysis rows re-scored incrementally')
+FRESHNESS = REGISTRY.histogram(
+    'learnmate_incremental_freshness_seconds', 'Time from event enqueue to weakness_analysis upsert',
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300))
+
+
+class RunningAggregate:
+    """O(1)-updatable statistics of one user's attempts on one topic"""
+
+    __slots__ = ('attempts', 'mean_score', 'm2_score', 'min_score', 'max_score', 'last_score',
+                 'questions', 'correct', 'total_time', 'responses', 'correct_responses',
+                 'response_seconds', 'response_attempts', 'first_attempt', 'last_attempt',
+                 'last_attempt_id', 'bootstrap_attempt_id', 'attempt_ids')
+
+    def __init__(self):
+        self.attempts = 0
+        self.mean_score = 0.0
+        self.m2_score = 0.0
+        self.min_score = None
+        self.max_score = None
+        self.last_score = None
+        self.questions = 0
+        self.correct = 0
+        self.total_time = 0
+        self.responses = 0
+        self.correct_responses = 0
+        self.response_seconds = 0.0  # sum of per-attempt average response times
+        self.response_attempts = 0
+        self.first_attempt = None
+        self.last_attempt = None
+        self.last_attempt_id = 0
+        # Highest attempt_id covered by the database read, and events applied since
+        self.bootstrap_attempt_id = 0
+        self.attempt_ids = set()
+
+    @classmethod
+    def from_row(cls, row) -> 'RunningAggregate':
+        """Aggregate state from one FEATURE_QUERY row"""
+        aggregate = cls()
+        aggregate.attempts = int(row.total_attempts)
+        aggregate.mean_score = float(row.avg_score)
+        aggregate.m2_score = max(float(row.mean_squared_score) - aggregate.mean_score ** 2, 0.0) * aggregate.attempts
+        aggregate.min_score = float(row.min_score)
+        aggregate.max_score = float(row.max_score)
+        aggregate.last_score = float(row.last_score)
+        aggregate.questions = int(row.questions_answered)
+        aggregate.correct = int(row.correct_answers)
+        aggregate.total_time = int(row.total_time_seconds)
+        if pd.notna(row.responses):
+            aggregate.responses = int(row.responses)
+            aggregate.correct_responses = int(row.correct_responses)
+            # AVG over the attempts with responses, weighted by their count
+            aggregate.response_attempts = int(row.response_attempts)
+            aggregate.response_seconds = float(row.avg_response_seconds) * aggregate.response_attempts
+        aggregate.first_attempt = pd.Timestamp(row.first_attempt_date)
+        aggregate.last_attempt = pd.Timestamp(row.last_attempt_date)
+        aggregate.last_attempt_id = int(row.last_attempt_id)
+        aggregate.bootstrap_attempt_id = aggregate.last_attempt_id
+        return aggregate
+
+    def is_uncertain(self, attempt_id: int) -> bool:
+        """Whether an attempt may or may not be in the bootstrapped totals (older, not applied)"""
+        return attempt_id <= self.bootstrap_attempt_id and attempt_id not in self.attempt_ids
+
+    def update(self, event: Dict) -> bool:
+        """Add one attempt; returns False if it was already counted"""
+        attempt_id = int(event['attempt_id'])
+        if attempt_id in self.attempt_ids:
+            return False
+
+        score = float(event['score_percentage'])
+        completed_at = pd.Timestamp(event['completed_at'])
+
+        # Welford's update of mean and sum of squared deviations
+        self.attempts += 1
+        delta = score - self.mean_score
+        self.mean_score += delta / self.attempts
+        self.m2_score += delta * (score - self.mean_score)
+
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        self.questions += int(event['total_questions'])
+        self.correct += int(event['correct_answers'])
+        self.total_time += int(event['time_taken_seconds'])
+
+        if event.get('responses'):
+            self.responses += int(event['responses'])
+            self.correct_responses += int(event.get('correct_responses') or 0)
+            if event.get('avg_response_seconds') is not None:
+                self.response_seconds += float(event['avg_response_seconds'])
+                self.response_attempts += 1
+
+        if self.first_attempt is None or completed_at < self.first_attempt:
+            self.first_attempt = completed_at
+        if self.last_attempt is None or completed_at >= self.last_attempt:
+            self.last_attempt = completed_at
+            self.last_score = score
+        self.last_attempt_id = max(self.last_attempt_id, attempt_id)
+        self.attempt_ids.add(attempt_id)
+        return True
+
+    def to_row(self) -> Dict:
+        """The aggregate columns of FEATURE_QUERY (without ids and topic fields)"""
+        return {
+            'total_attempts': self.attempts,
+            'avg_score': self.mean_score,
+            'mean_squared_score': self.m2_score / self.attempts + self.mean_score ** 2,
+            'min_score': self.min_score,
+            'max_score': self.max_score,
+            'last_score': self.last_score,
+            'questions_answered': self.questions,
+            'correct_answers': self.correct,
+            'total_time_seconds': self.total_time,
+            'responses': self.responses or None,
+            'correct_responses': self.correct_responses if self.responses else None,
+            'avg_response_seconds': self.response_seconds / self.response_attempts if self.response_attempts else None,
+            'response_attempts': self.response_attempts,
+            'first_attempt_date': self.first_attempt,
+            'last_attempt_date': self.last_attempt,
+            'last_attempt_id': self.last_attempt_id
+        }
+
+
+class IncrementalScorer:
+    """Consumes attempt events and keeps weakness_analysis current"""
+
+    def __init__(self, connection, event_queue, predictor: Optional[WeaknessPredictor] = None,
+                 write_connection=None, max_cached_pairs: int = 1000000):
+        """
+        Args:
+            connection: DB-API connection used to bootstrap aggregates
+            event_queue: InProcessEventQueue or SQLiteEventQueue (attempt_events.py)
+            predictor: model for re-scoring (score bands if None or not a quiz model)
+            write_connection: connection for the upserts (defaults to connection)
+            max_cached_pairs: aggregates kept in memory; least recently updated
+                pairs are dropped and re-read from the database when needed
+        """
+        self.connection = connection
+        self.write_connection = write_connection or connection
+        self.queue = event_queue
+        self.predictor = predictor
+        self.max_cached_pairs = max_cached_pairs
+        self.preprocessor = QuizPreprocessor(connection)
+        self.aggregates: 'OrderedDict[Tuple[int, int], RunningAggregate]' = OrderedDict()
+        self.topics: Dict[int, Tuple[int, str]] = {}
+        # Pairs updated but not yet written; survives a failed upsert
+        self.dirty = set()
+
+    def _load_topics(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT topic_id, subject_id, difficulty_level FROM topics")
+            self.topics = {int(topic_id): (int(subject_id), difficulty)
+                           for topic_id, subject_id, difficulty in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def _bootstrap(self, events: List[Dict]) -> set:
+        """
+        Read the stored aggregates of pairs that are not cached yet, or that
+        got an out-of-order event; returns the pairs loaded
+        """
+        wanted = set()
+        for event in events:
+            key = (int(event['user_id']), int(event['topic_id']))
+            aggregate = self.aggregates.get(key)
+            if aggregate is None or aggregate.is_uncertain(int(event['attempt_id'])):
+                wanted.add(key)
+        if not wanted:
+            return set()
+        loaded = set()
+        stored = self.preprocessor.read_aggregates(sorted({user_id for user_id, _ in wanted}))
+        for row in stored.itertuples(index=False):
+            key = (int(row.user_id), int(row.topic_id))
+            if key in wanted:
+                # The saved attempts are all committed, so the database totals supersede the cache
+                self.aggregates[key] = RunningAggregate.from_row(row)
+                loaded.add(key)
+        return loaded
+
+    def _evict(self):
+        while len(self.aggregates) > self.max_cached_pairs:
+            key = next(iter(self.aggregates))
+            if key in self.dirty:
+                break
+            self.aggregates.popitem(last=False)
+
+    def _feature_frame(self, keys) -> pd.DataFrame:
+        if any(topic_id not in self.topics for _, topic_id in keys):
+            self._load_topics()
+        rows = []
+        for user_id, topic_id in keys:
+            subject_id, difficulty = self.topics.get(topic_id, (None, None))
+            rows.append({'user_id': user_id, 'topic_id': topic_id, 'subject_id': subject_id,
+                         'topic_difficulty': difficulty, **self.aggregates[(user_id, topic_id)].to_row()})
+        return engineer_features(pd.DataFrame(rows, columns=AGGREGATE_COLUMNS), datetime.now())
+
+    def process(self, events: List[Dict]) -> int:
+        """Apply a batch of events and upsert the affected rows; returns rows written"""
+        loaded = self._bootstrap(events)
+
+        applied = 0
+        for event in events:
+            key = (int(event['user_id']), int(event['topic_id']))
+            aggregate = self.aggregates.get(key)
+            if aggregate is None:
+                aggregate = self.aggregates[key] = RunningAggregate()
+            attempt_id = int(event['attempt_id'])
+            if key in loaded and attempt_id <= aggregate.bootstrap_attempt_id:
+                # The bootstrap query already counted this attempt, but the
+                # stored weakness_analysis row predates it
+                aggregate.attempt_ids.add(attempt_id)
+                self.dirty.add(key)
+            elif aggregate.update(event):
+                applied += 1
+                self.dirty.add(key)
+            self.aggregates.move_to_end(key)
+        EVENTS.labels(outcome='applied').inc(applied)
+        EVENTS.labels(outcome='duplicate').inc(len(events) - applied)
+
+        written = 0
+        if self.dirty:
+            keys = sorted(self.dirty)
+            rows = score_features(self._feature_frame(keys), self.predictor)
+            written = bulk_upsert(self.write_connection, 'weakness_analysis', rows,
+                                  key_columns=['user_id', 'topic_id'])
+            self.dirty.clear()
+            RESCORED_ROWS.inc(written)
+
+        self._evict()
+        return written
+
+    def run_once(self, max_batch: int = 500, max_wait: float = 1.0) -> int:
+        """
+        Consume at most one batch; returns the number of events handled
+
+        If the batch fails, its events are processed one at a time (processing
+        is idempotent), so only the events that fail on their own are handed to
+        queue.retry for backoff or dead-lettering.
+        """
+        batch = self.queue.get_batch(max_batch, max_wait)
+        if not batch:
+            return 0
+        try:
+            self.process([event for _, event in batch])
+            done = batch
+        except Exception as e:
+            logger.error(f"Error re-scoring {len(batch)} attempt event(s): {str(e)}")
+            done = []
+            if len(batch) == 1:
+                self._retry(batch, e)
+            else:
+                for item in batch:
+                    try:
+                        self.process([item[1]])
+                        done.append(item)
+                    except Exception as item_error:
+                        self._retry([item], item_error)
+
+        self.queue.ack(done)
+        now = time.time()
+        for _, event in done:
+            FRESHNESS.observe(now - event['enqueued_at'])
+        return len(done)
+
+    def _retry(self, batch: List[Tuple], error: Exception):
+        EVENTS.labels(outcome='error').inc(len(batch))
+        dead = self.queue.retry(batch, str(error))
+        if dead:
+            EVENTS.labels(outcome='dead_letter').inc(dead)
+            logger.error(f"Dead-lettered {dead} attempt event(s) after repeated failures: {str(error)}")
+
+    def run(self, stop: Optional[threading.Event] = None, max_batch: int = 500, max_wait: float = 1.0):
+        """Consume events until stop is set"""
+        stop = stop or threading.Event()
+        logger.info("Incremental scorer started")
+        while not stop.is_set():
+            handled = self.run_once(max_batch, max_wait)
+            if handled:
+                logger.info(f"Re-scored after {handled} attempt event(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score weakness_analysis as quiz attempts arrive")
+    parser.add_argument('--db-url', help="Database URL (default: LEARNMATE_DB_URL)")
+    parser.add_argument('--queue', type=Path, required=True, help="SQLite event queue file")
+    parser.add_argument('--model-dir', type=Path, default=MODEL_DIR)
+    parser.add_argument('--rules-only', action='store_true', help="Skip the model and use the score bands")
+    parser.add_argument('--max-batch', type=int, default=500)
+    parser.add_argument('--max-wait', type=float, default=1.0, help="Seconds to wait for a batch")
+    args = parser.parse_args()
+
+    predictor = None if args.rules_only else WeaknessPredictor(args.model_dir)
+    connection = connect(args.db_url)
+    write_connection = connection if is_sqlite(connection) else connect(args.db_url)
+    scorer = IncrementalScorer(connection, SQLiteEventQueue(args.queue), predictor, write_connection)
+    try:
+        scorer.run(max_batch=args.max_batch, max_wait=args.max_wait)
+    except KeyboardInterrupt:
+        logger.info("Incremental scorer stopped")
+    finally:
+        connection.close()
+        if write_connection is not connection:
+            write_connection.close()
+
+
+if __name__ == "__main__":
+    main()
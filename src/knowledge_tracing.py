@@ -0,0 +1,365 @@
+"""
+Bayesian Knowledge Tracing of per-topic mastery from quiz_responses
+
+Each (user, topic) holds P(mastered) in one float32 cell of a
+(users x topics) array. Topics are the columns of a TopicVocabulary. Each
+answer applies the standard BKT update with the topic's parameters:
+
+    posterior = P(L)(1-S) / (P(L)(1-S) + (1-P(L))G)       if correct
+              = P(L)S / (P(L)S + (1-P(L))(1-G))           if wrong
+    P(L)'     = posterior + (1 - posterior)T
+
+where S is slip, G is guess and T is transit (learning). Applying it is O(1)
+per answer.
+
+Batches of answers (ordered by answered_at) are applied in "waves": the
+k-th answer of every (user, topic) in the batch is updated together, so a
+batch costs one vectorized update per wave instead of one Python step per
+answer. fit() chooses each topic's (L0, T, S, G) from a grid by the
+log-likelihood of the historical answers, evaluating every grid point in
+the same waves.
+
+feature_records() gives WeaknessPredictor the traced mastery as the
+'topic_mastery' mapping keyed by topic id, plus bkt_* summary features per
+student. Ids only resolve against a vocabulary that has them, so the
+predictor needs TopicMastery(tracer.vocabulary) (or a topic config with
+ids) rather than the default one derived from the model's topic_* features;
+`batch_score.py --bkt-state` sets this up.
+
+Run from src/:
+    python knowledge_tracing.py --db-url sqlite:///../data/learnmate.db --fit
+"""
+import argparse
+import itertools
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database import connect, placeholder, read_chunks
+from profiling import profiled
+from topic_mastery import MASTERY_KEY, TopicVocabulary
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / 'models' / 'knowledge_tracing.npz'
+
+# Answers in time order, with the user and topic of each
+RESPONSE_QUERY = """
+SELECT qr.response_id, qa.user_id, q.topic_id, qr.is_correct
+FROM quiz_responses qr
+JOIN quiz_attempts qa ON qa.attempt_id = qr.attempt_id
+JOIN questions q ON q.question_id = qr.question_id
+WHERE qr.response_id > {marker}
+ORDER BY qr.answered_at, qr.response_id
+"""
+
+DEFAULT_PARAMS = {'p_init': 0.3, 'p_transit': 0.1, 'p_slip': 0.1, 'p_guess': 0.2}
+
+# Candidate (L0, T, S, G) for fit(); slip and guess stay below 0.5 so a
+# correct answer always raises mastery
+PARAM_GRID = {
+    'p_init': (0.1, 0.3, 0.5, 0.7),
+    'p_transit': (0.02, 0.05, 0.1, 0.2, 0.3),
+    'p_slip': (0.05, 0.1, 0.2, 0.3),
+    'p_guess': (0.1, 0.2, 0.3)
+}
+
+# P(mastered) above which a topic counts as mastered in the summary features
+MASTERED = 0.95
+
+
+def bkt_update(mastery: np.ndarray, correct: np.ndarray, p_transit: np.ndarray,
+               p_slip: np.ndarray, p_guess: np.ndarray) -> np.ndarray:
+    """P(mastered) after one answer, element-wise"""
+    right = mastery * (1 - p_slip)
+    wrong = (1 - mastery) * p_guess
+    posterior = np.where(correct, right / (right + wrong),
+                         mastery * p_slip / (mastery * p_slip + (1 - mastery) * (1 - p_guess)))
+    return posterior + (1 - posterior) * p_transit
+
+
+def waves(keys: np.ndarray) -> Iterator[np.ndarray]:
+    """
+    Positions of a time-ordered batch grouped so each key occurs once per group
+
+    The k-th group holds the k-th occurrence of every key, so groups can be
+    applied one after another with vectorized updates.
+    """
+    if not len(keys):
+        return
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    positions = np.arange(len(keys))
+    occurrence = np.empty(len(keys), dtype=np.int64)
+    occurrence[order] = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+
+    by_wave = np.argsort(occurrence, kind='stable')
+    bounds = np.cumsum(np.bincount(occurrence))
+    yield from np.split(by_wave, bounds[:-1])
+
+
+class KnowledgeTracer:
+    """Per-(user, topic) BKT mastery over a fixed topic vocabulary"""
+
+    def __init__(self, vocabulary: TopicVocabulary, capacity: int = 1024, **params):
+        """
+        Args:
+            vocabulary: topics (must have topic ids)
+            capacity: initial number of user rows; grows as users appear
+            params: p_init, p_transit, p_slip, p_guess (scalars for every
+                topic, or arrays with one value per topic)
+        """
+        if vocabulary.topic_ids is None:
+            raise ValueError("Knowledge tracing needs a vocabulary with topic ids")
+        self.vocabulary = vocabulary
+        n_topics = len(vocabulary)
+        for name, default in DEFAULT_PARAMS.items():
+            value = np.broadcast_to(np.asarray(params.get(name, default), dtype=np.float32), (n_topics,))
+            setattr(self, name, value.copy())
+
+        self.user_ids = np.zeros(0, dtype=np.int64)
+        self._user_rows: Dict[int, int] = {}
+        self.mastery = np.empty((capacity, n_topics), dtype=np.float32)
+        self.responses = np.zeros((capacity, n_topics), dtype=np.uint32)
+        self.last_response_id = 0
+
+        # topic_id -> column, -1 for topics outside the vocabulary
+        self._columns = np.full(int(vocabulary.topic_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        self._columns[vocabulary.topic_ids] = np.arange(n_topics)
+
+    def _grow(self, n_users: int):
+        capacity = len(self.mastery)
+        if n_users <= capacity:
+            return
+        capacity = max(n_users, 2 * capacity)
+        for name in ('mastery', 'responses'):
+            old = getattr(self, name)
+            new = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def rows(self, user_ids: np.ndarray) -> np.ndarray:
+        """Rows of the given users, adding rows (at P(L0)) for new users"""
+        unique_users, inverse = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+        new_users = [user_id for user_id in unique_users.tolist() if user_id not in self._user_rows]
+        if new_users:
+            first = len(self.user_ids)
+            self._grow(first + len(new_users))
+            self.mastery[first:first + len(new_users)] = self.p_init
+            self.responses[first:first + len(new_users)] = 0
+            self._user_rows.update(zip(new_users, range(first, first + len(new_users))))
+            self.user_ids = np.concatenate([self.user_ids, np.asarray(new_users, dtype=np.int64)])
+        unique_rows = np.fromiter((self._user_rows[user_id] for user_id in unique_users.tolist()),
+                                  dtype=np.int64, count=len(unique_users))
+        return unique_rows[inverse]
+
+    def columns(self, topic_ids: np.ndarray) -> np.ndarray:
+        """Vocabulary columns of topic ids, -1 for unknown topics"""
+        topic_ids = np.asarray(topic_ids, dtype=np.int64)
+        known = (topic_ids >= 0) & (topic_ids < len(self._columns))
+        return np.where(known, self._columns[np.where(known, topic_ids, 0)], -1)
+
+    def update(self, user_id: int, topic_id: int, correct: bool) -> Optional[float]:
+        """Apply one answer; returns the new P(mastered), or None for an unknown topic"""
+        column = int(self.columns(np.array([topic_id]))[0])
+        if column < 0:
+            return None
+        row = int(self.rows(np.array([user_id]))[0])
+        self.mastery[row, column] = bkt_update(
+            self.mastery[row, column], bool(correct),
+            self.p_transit[column], self.p_slip[column], self.p_guess[column])
+        self.responses[row, column] += 1
+        return float(self.mastery[row, column])
+
+    def update_batch(self, user_ids: np.ndarray, topic_ids: np.ndarray, correct: np.ndarray) -> int:
+        """Apply a batch of answers given in time order; returns the number applied"""
+        columns = self.columns(topic_ids)
+        known = columns >= 0
+        if not known.all():
+            logger.warning(f"Skipping {int((~known).sum())} answers on topics outside the vocabulary")
+        rows = self.rows(np.asarray(user_ids)[known])
+        columns = columns[known]
+        correct = np.asarray(correct, dtype=bool)[known]
+
+        keys = rows * len(self.vocabulary) + columns
+        for wave in waves(keys):
+            r, c = rows[wave], columns[wave]
+            self.mastery[r, c] = bkt_update(self.mastery[r, c], correct[wave],
+                                            self.p_transit[c], self.p_slip[c], self.p_guess[c])
+        np.add.at(self.responses, (rows, columns), 1)
+        return len(rows)
+
+    def replay(self, connection, chunk_size: int = 100000) -> int:
+        """Apply every answer after last_response_id from the database"""
+        query = RESPONSE_QUERY.format(marker=placeholder(connection))
+        applied = 0
+        start = time.perf_counter()
+        for chunk in read_chunks(connection, query, (self.last_response_id,), chunk_size):
+            applied += self.update_batch(chunk['user_id'].to_numpy(), chunk['topic_id'].to_numpy(),
+                                         chunk['is_correct'].astype(bool).to_numpy())
+            self.last_response_id = max(self.last_response_id, int(chunk['response_id'].max()))
+        logger.info(f"Traced {applied} answers in {time.perf_counter() - start:.1f}s")
+        return applied
+
+    def fit(self, user_ids: np.ndarray, topic_ids: np.ndarray, correct: np.ndarray,
+            grid: Dict[str, Sequence[float]] = PARAM_GRID, min_responses: int = 200) -> pd.DataFrame:
+        """
+        Choose each topic's parameters by log-likelihood over historical answers
+
+        Topics with fewer than min_responses answers keep their current
+        parameters. Traced state is not changed; replay afterwards.
+
+        Returns:
+            One row per topic with the chosen parameters, log-likelihood and answer count
+        """
+        candidates = np.array(list(itertools.product(*(grid[name] for name in DEFAULT_PARAMS))),
+                              dtype=np.float64)
+        p_init, p_transit, p_slip, p_guess = (candidates[:, i:i + 1] for i in range(4))
+
+        columns = self.columns(topic_ids)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        correct = np.asarray(correct, dtype=bool)
+        summary = []
+        for column in range(len(self.vocabulary)):
+            in_topic = columns == column
+            n = int(in_topic.sum())
+            if n < min_responses:
+                continue
+            users, pair = np.unique(user_ids[in_topic], return_inverse=True)
+            answers = correct[in_topic]
+
+            # One row per candidate, one column per user of this topic
+            mastery = np.repeat(p_init, len(users), axis=1)
+            log_likelihood = np.zeros(len(candidates))
+            for wave in waves(pair):
+                state = mastery[:, pair[wave]]
+                p_correct = state * (1 - p_slip) + (1 - state) * p_guess
+                log_likelihood += np.log(np.where(answers[wave], p_correct, 1 - p_correct)).sum(axis=1)
+                mastery[:, pair[wave]] = bkt_update(state, answers[wave], p_transit, p_slip, p_guess)
+
+            best = int(np.argmax(log_likelihood))
+            for name, value in zip(DEFAULT_PARAMS, candidates[best]):
+                getattr(self, name)[column] = value
+            summary.append({'topic_id': int(self.vocabulary.topic_ids[column]), 'responses': n,
+                            'log_likelihood': float(log_likelihood[best]),
+                            **dict(zip(DEFAULT_PARAMS, candidates[best].tolist()))})
+
+        logger.info(f"Fitted BKT parameters for {len(summary)} of {len(self.vocabulary)} topics")
+        return pd.DataFrame(summary)
+
+    def mastery_matrix(self, user_ids: Sequence[int]) -> np.ndarray:
+        """(users, topics) float32 P(mastered), NaN where a user has not answered the topic"""
+        rows = [self._user_rows.get(int(user_id), -1) for user_id in user_ids]
+        rows = np.asarray(rows, dtype=np.int64)
+        matrix = np.full((len(rows), len(self.vocabulary)), np.nan, dtype=np.float32)
+        seen = rows >= 0
+        traced = self.mastery[rows[seen]]
+        matrix[seen] = np.where(self.responses[rows[seen]] > 0, traced, np.nan)
+        return matrix
+
+    def feature_records(self, user_ids: Sequence[int]) -> List[Dict]:
+        """
+        WeaknessPredictor inputs per user: the 'topic_mastery' mapping by topic
+        id plus summary features of the traced topics
+        """
+        matrix = self.mastery_matrix(user_ids)
+        traced = ~np.isnan(matrix)
+        counts = traced.sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            mean = np.where(counts > 0, np.nansum(matrix, axis=1) / np.maximum(counts, 1), np.nan)
+        minimum = np.where(counts > 0, np.nanmin(np.where(traced, matrix, np.inf), axis=1), np.nan)
+        mastered = (np.nan_to_num(matrix) >= MASTERED).sum(axis=1)
+
+        topic_ids = self.vocabulary.topic_ids.tolist()
+        records = []
+        for i, row in enumerate(matrix.tolist()):
+            records.append({
+                MASTERY_KEY: {topic_id: value for topic_id, value in zip(topic_ids, row) if value == value},
+                'bkt_mean_mastery': float(mean[i]),
+                'bkt_min_mastery': float(minimum[i]),
+                'bkt_topics_traced': int(counts[i]),
+                'bkt_topics_mastered': int(mastered[i])
+            })
+        return records
+
+    def mastery_frame(self) -> pd.DataFrame:
+        """Long-format (user_id, topic_id, bkt_mastery, bkt_responses) of every traced pair"""
+        n_users = len(self.user_ids)
+        rows, columns = np.nonzero(self.responses[:n_users])
+        return pd.DataFrame({
+            'user_id': self.user_ids[rows],
+            'topic_id': self.vocabulary.topic_ids[columns],
+            'bkt_mastery': self.mastery[rows, columns],
+            'bkt_responses': self.responses[rows, columns]
+        })
+
+    def save(self, path: Path = MODEL_PATH):
+        n_users = len(self.user_ids)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            topic_ids=self.vocabulary.topic_ids,
+            topic_names=np.asarray(self.vocabulary.topic_names),
+            subject_ids=self.vocabulary.subject_ids,
+            user_ids=self.user_ids,
+            mastery=self.mastery[:n_users],
+            responses=self.responses[:n_users],
+            last_response_id=self.last_response_id,
+            **{name: getattr(self, name) for name in DEFAULT_PARAMS}
+        )
+        logger.info(f"Saved knowledge tracing state for {n_users} users to {path}")
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> 'KnowledgeTracer':
+        with np.load(path) as saved:
+            vocabulary = TopicVocabulary(saved['topic_names'].tolist(), saved['topic_ids'], saved['subject_ids'])
+            tracer = cls(vocabulary, capacity=max(len(saved['user_ids']), 1),
+                         **{name: saved[name] for name in DEFAULT_PARAMS})
+            tracer.user_ids = saved['user_ids'].copy()
+            tracer._user_rows = {user_id: row for row, user_id in enumerate(tracer.user_ids.tolist())}
+            tracer.mastery[:len(tracer.user_ids)] = saved['mastery']
+            tracer.responses[:len(tracer.user_ids)] = saved['responses']
+            tracer.last_response_id = int(saved['last_response_id'])
+        return tracer
+
+
+def read_responses(connection, chunk_size: int = 100000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All answers in time order as (user_ids, topic_ids, correct) arrays"""
+    chunks = list(read_chunks(connection, RESPONSE_QUERY.format(marker=placeholder(connection)), (0,), chunk_size))
+    if not chunks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    responses = pd.concat(chunks, ignore_index=True)
+    return (responses['user_id'].to_numpy(dtype=np.int64), responses['topic_id'].to_numpy(dtype=np.int64),
+            responses['is_correct'].astype(bool).to_numpy())
+
+
+@profiled('knowledge_tracing')
+def main():
+    parser = argparse.ArgumentParser(description="Trace per-topic mastery from quiz_responses")
+    parser.add_argument('--db-url', help="Database URL (default: LEARNMATE_DB_URL)")
+    parser.add_argument('--state', type=Path, default=MODEL_PATH, help="Saved tracer to continue from and update")
+    parser.add_argument('--fit', action='store_true', help="Fit per-topic parameters and replay from scratch")
+    args = parser.parse_args()
+
+    connection = connect(args.db_url)
+    try:
+        if args.fit or not args.state.exists():
+            tracer = KnowledgeTracer(TopicVocabulary.from_database(connection))
+            if args.fit:
+                print(tracer.fit(*read_responses(connection)).to_string(index=False))
+        else:
+            tracer = KnowledgeTracer.load(args.state)
+        tracer.replay(connection)
+        tracer.save(args.state)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+In-process metrics registry with Prometheus text exposition
+
+A small, dependency-free subset of the prometheus_client API: counters, gauges
+and histograms with optional labels, collected in a `MetricsRegistry`.
+`REGISTRY.render()` produces the text format served on /metrics by the
+scoring server, and `REGISTRY.get_sample_value()` reads a single sample back
+in-process (for tests and scripts).
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    """Base for labelled metrics: one child per label-value combination"""
+
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Child metric for the given label values (created on first use)"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            if key not in self._children:
+                self._children[key] = self._new_child()
+            return self._children[key]
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; call .labels() first")
+        return self.labels()
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """(sample name, labels, value) for every child"""
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            yield from child.samples(self.name, dict(zip(self.labelnames, key)))
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield f"{name}_total", labels, self.value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (exposed as <name>_total)"""
+
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_to_current_time(self):
+        self.set(time.time())
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    metric_type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabelled().dec(amount)
+
+    def set_to_current_time(self):
+        self._unlabelled().set_to_current_time()
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+        yield f"{name}_count", labels, self.count
+        yield f"{name}_sum", labels, self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, plus _count and _sum"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        buckets = tuple(sorted(float(bound) for bound in buckets))
+        self.buckets = buckets if buckets[-1] == math.inf else buckets + (math.inf,)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+
+class MetricsRegistry:
+    """Collection of metrics that can be rendered or queried together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def get_sample_value(self, sample_name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        """Current value of one sample (e.g. 'x_total' or 'x_bucket' with le), or None"""
+        labels = {key: str(value) for key, value in (labels or {}).items()}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if not sample_name.startswith(metric.name):
+                continue
+            for name, sample_labels, value in metric.samples():
+                if name == sample_name and sample_labels == labels:
+                    return value
+        return None
+
+
+# Process-wide registry used by the scoring path
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,173 @@
+"""
+File-backed model registry
+
+    models/registry/
+        CURRENT                          name of the serving version
+        versions/<version>/
+            weakness_classifier.pkl      model
+            scaler.pkl                   fitted transform (optional)
+            metrics.json
+            manifest.json                features, feature schema hash, artifact checksums
+
+A version directory is written under a temporary name and renamed into
+place, so readers never see a partial version; its files are then made
+read-only. CURRENT is replaced atomically with os.replace, so promoting or
+rolling back is a single pointer change. WeaknessPredictor(registry=...)
+follows CURRENT and swaps in new versions without a restart, so only
+versions with a scaler can become CURRENT. Scaler-less base models from
+train_base_models.py go to their own registry (BASE_MODELS_REGISTRY_DIR).
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import stat
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = Path(__file__).resolve().parent.parent / 'models' / 'registry'
+BASE_MODELS_REGISTRY_DIR = REGISTRY_DIR.parent / 'base_models_registry'
+MODEL_FILE = 'weakness_classifier.pkl'
+SCALER_FILE = 'scaler.pkl'
+CURRENT_FILE = 'CURRENT'
+
+# Breaks ties between versions registered by this process in the same clock tick
+_REGISTRATION_SEQUENCE = itertools.count()
+
+
+def feature_schema_hash(feature_names: Sequence[str]) -> str:
+    """Hash of the ordered feature names a model expects"""
+    return hashlib.sha256(json.dumps([str(name) for name in feature_names]).encode()).hexdigest()[:16]
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Immutable model versions plus a CURRENT pointer"""
+
+    def __init__(self, root: Path = REGISTRY_DIR):
+        self.root = Path(root)
+        self.versions_path = self.root / 'versions'
+
+    def version_dir(self, version: str) -> Path:
+        return self.versions_path / version
+
+    def list_versions(self) -> List[str]:
+        """Registered versions, oldest first (by registration time, not by name)"""
+        if not self.versions_path.exists():
+            return []
+        versions = [path.name for path in self.versions_path.iterdir()
+                    if path.is_dir() and not path.name.startswith('.')]
+        return sorted(versions, key=self._registration_order)
+
+    def _registration_order(self, version: str):
+        manifest = self.manifest(version)
+        if 'created_ns' in manifest:
+            return manifest['created_ns'], manifest['sequence'], version
+        # Versions registered before created_ns was recorded: second resolution only
+        created_at = datetime.strptime(manifest['created_at'], '%Y-%m-%d %H:%M:%S')
+        return int(created_at.timestamp()) * 10**9, -1, version
+
+    def manifest(self, version: str) -> Dict:
+        with open(self.version_dir(version) / 'manifest.json') as f:
+            return json.load(f)
+
+    def current_version(self) -> Optional[str]:
+        try:
+            return (self.root / CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def register(self, model, scaler=None, feature_names: Optional[Sequence[str]] = None,
+                 metrics: Optional[Dict] = None, name: str = 'weakness_classifier',
+                 make_current: bool = True) -> str:
+        """
+        Store a new version
+
+        Args:
+            model: fitted estimator
+            scaler: fitted transform applied before the model
+            feature_names: input features, in order (default: the scaler's or
+                model's feature_names_in_)
+            metrics: evaluation results to keep with the version
+            name: what the version is (several model kinds can share a registry)
+            make_current: point CURRENT at the new version (needs a scaler)
+
+        Returns:
+            The version id
+        """
+        if make_current and scaler is None:
+            raise ValueError("A version without a scaler cannot be made current")
+        if feature_names is None:
+            fitted = scaler if scaler is not None else model
+            feature_names = list(getattr(fitted, 'feature_names_in_', []))
+        feature_names = [str(feature) for feature in feature_names]
+
+        created_ns = time.time_ns()
+        created_at = datetime.fromtimestamp(created_ns / 1e9)
+        version = f"{created_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.versions_path.mkdir(parents=True, exist_ok=True)
+        staging = self.versions_path / f'.{version}.tmp'
+        staging.mkdir()
+
+        joblib.dump(model, staging / MODEL_FILE)
+        if scaler is not None:
+            joblib.dump(scaler, staging / SCALER_FILE)
+        with open(staging / 'metrics.json', 'w') as f:
+            json.dump(metrics or {}, f, indent=4, default=str)
+
+        artifacts = {path.name: _file_sha256(path) for path in sorted(staging.iterdir())}
+        manifest = {
+            'version': version,
+            'name': name,
+            'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_ns': created_ns,
+            'sequence': next(_REGISTRATION_SEQUENCE),
+            'model_class': type(model).__name__,
+            'features': feature_names,
+            'feature_schema_hash': feature_schema_hash(feature_names),
+            'artifacts': artifacts
+        }
+        with open(staging / 'manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=4)
+        for path in staging.iterdir():
+            path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        # Publish the complete directory in one rename
+        os.replace(staging, self.version_dir(version))
+        logger.info(f"Registered {name} version {version} ({len(feature_names)} features)")
+
+        if make_current:
+            self.promote(version)
+        return version
+
+    def promote(self, version: str):
+        """Atomically point CURRENT at a registered version (also used to roll back)"""
+        if not (self.version_dir(version) / 'manifest.json').exists():
+            raise ValueError(f"Unknown model version: {version}")
+        if not (self.version_dir(version) / SCALER_FILE).exists():
+            raise ValueError(f"Model version {version} has no {SCALER_FILE} and cannot be served")
+        tmp_path = self.root / f'.{CURRENT_FILE}.{uuid.uuid4().hex[:6]}.tmp'
+        tmp_path.write_text(version + '\n')
+        os.replace(tmp_path, self.root / CURRENT_FILE)
+        logger.info(f"CURRENT model version is now {version}")
+
+    def verify(self, version: str) -> bool:
+        """Whether the version's artifacts still match the checksums in its manifest"""
+        manifest = self.manifest(version)
+        return all(_file_sha256(self.version_dir(version) / artifact) == checksum
+                   for artifact, checksum in manifest['artifacts'].items())
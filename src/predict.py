@@ -6,51 +6,213 @@ Includes functions for loading model and making predictions with recommendations
 import joblib
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 import logging
+import threading
+import time
 from pathlib import Path
+from metrics import REGISTRY
+from model_registry import MODEL_FILE, SCALER_FILE, ModelRegistry, feature_schema_hash
+from recommendation_index import strength_code
+from topic_mastery import TopicMastery, TopicVocabulary
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Prediction-path metrics (served on /metrics by scoring_server.py)
+PREDICTIONS = REGISTRY.counter(
+    'learnmate_predictions', 'Predicted records by outcome', ['outcome'])
+STAGE_SECONDS = REGISTRY.histogram(
+    'learnmate_prediction_stage_seconds', 'Time per prediction call spent in each stage', ['stage'])
+BATCH_SIZE = REGISTRY.histogram(
+    'learnmate_prediction_batch_size', 'Records per prediction call',
+    buckets=(1, 4, 16, 64, 256, 1024, 4096, 16384, 65536))
+PREDICTED_CLASSES = REGISTRY.counter(
+    'learnmate_predicted_class', 'Predictions by weakness level', ['weakness_level'])
+CONFIDENCE = REGISTRY.histogram(
+    'learnmate_prediction_confidence', 'Top-class probability of each prediction',
+    buckets=(0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0))
+MODEL_LOADED = REGISTRY.gauge(
+    'learnmate_model_loaded_timestamp_seconds', 'Unix time the model and scaler were last loaded')
+MODEL_LOAD_FAILURES = REGISTRY.counter(
+    'learnmate_model_load_failures', 'Failed attempts to load the model or scaler')
+MODEL_SWAPS = REGISTRY.counter(
+    'learnmate_model_swaps', 'Registry versions swapped into a running predictor')
+
+
+class LoadedModel:
+    """Model, scaler and topic vocabulary that are served together"""
+    __slots__ = ('model', 'scaler', 'topic_mastery', 'version')
+
+    def __init__(self, model=None, scaler=None, topic_mastery: Optional[TopicMastery] = None,
+                 version: Optional[str] = None):
+        self.model = model
+        self.scaler = scaler
+        self.topic_mastery = topic_mastery
+        self.version = version
+
+
 class WeaknessPredictor:
-    def __init__(self, model_path="../models"):
-        """Initialize the predictor with model path"""
+    def __init__(self, model_path="../models", recommendation_index=None, resources_per_topic: int = 3,
+                 topic_mastery: Optional[TopicMastery] = None, mmap_mode: Optional[str] = None,
+                 registry: Optional[ModelRegistry] = None, shadow=None):
+        """
+        Initialize the predictor with model path
+        
+        Args:
+            model_path: directory with weakness_classifier.pkl and scaler.pkl
+            recommendation_index: RecommendationIndex used to attach learning
+                resources to each weak topic (generic advice only if None)
+            resources_per_topic: resources recommended per weak topic
+            topic_mastery: topic vocabulary and thresholds for weak-topic
+                detection (default: the topic_* features of the model)
+            mmap_mode: joblib mmap mode ('r' lets worker processes share the
+                model's arrays through the page cache instead of copying them)
+            registry: serve the registry's CURRENT version instead of
+                model_path (model_path until a version is promoted), and
+                follow it with reload_if_changed/watch_registry
+            shadow: ShadowScorer that scores every batch with a candidate model
+                in the background, for comparison only (see shadow_scoring.py)
+        """
         self.model_path = Path(model_path)
-        self.model = None
-        self.scaler = None
+        self.recommendation_index = recommendation_index
+        self.resources_per_topic = resources_per_topic
+        self._derived_topic_mastery = topic_mastery is None
+        self.mmap_mode = mmap_mode
+        self.registry = registry
+        self.shadow = shadow
+        # Replaced as a whole, so a prediction never mixes two versions
+        self._active = LoadedModel(topic_mastery=topic_mastery)
+        self._reload_lock = threading.Lock()
+        # CURRENT version that failed to load; not retried until CURRENT changes
+        self._failed_version = None
+        self._stop_watching = threading.Event()
         self.load_model()
-        
-    def load_model(self) -> bool:
-        """Load the trained model and scaler"""
+
+    @property
+    def model(self):
+        return self._active.model
+
+    @property
+    def scaler(self):
+        return self._active.scaler
+
+    @property
+    def topic_mastery(self) -> Optional[TopicMastery]:
+        return self._active.topic_mastery
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """Registry version being served (None when loaded from model_path)"""
+        return self._active.version
+
+    def load_model(self, version: Optional[str] = None) -> bool:
+        """
+        Load the trained model and scaler, then swap them in
+
+        With a registry, loads the given version (default: CURRENT, or
+        model_path while there is none) and checks its features against the
+        manifest's schema hash. The new model is warmed
+        up before the swap; predictions already running finish on the old one.
+        On failure the current model keeps serving.
+        """
         try:
-            self.model = joblib.load(self.model_path / 'weakness_classifier.pkl')
-            self.scaler = joblib.load(self.model_path / 'scaler.pkl')
-            logger.info("Model and scaler loaded successfully")
+            model_dir = self.model_path
+            if self.registry is not None:
+                version = version or self.registry.current_version()
+                if version is None:
+                    logger.info(f"No current model version in {self.registry.root}; "
+                                f"serving {self.model_path} until one is promoted")
+                else:
+                    model_dir = self.registry.version_dir(version)
+            model = joblib.load(model_dir / MODEL_FILE, mmap_mode=self.mmap_mode)
+            scaler = joblib.load(model_dir / SCALER_FILE, mmap_mode=self.mmap_mode)
+            if version is not None:
+                expected = self.registry.manifest(version)['feature_schema_hash']
+                if feature_schema_hash(scaler.feature_names_in_) != expected:
+                    raise ValueError(f"Features of version {version} do not match its schema hash")
+            
+            topic_mastery = self._active.topic_mastery
+            if self._derived_topic_mastery:
+                topic_mastery = TopicMastery(TopicVocabulary.from_feature_names(scaler.feature_names_in_))
+            
+            # First call through a fresh model pays for lazy setup; do it before serving
+            warm_up = pd.DataFrame(np.zeros((1, len(scaler.feature_names_in_))), columns=scaler.feature_names_in_)
+            model.predict_proba(scaler.transform(warm_up))
+            
+            self._active = LoadedModel(model, scaler, topic_mastery, version)
+            MODEL_LOADED.set_to_current_time()
+            logger.info(f"Model and scaler loaded successfully{f' (version {version})' if version else ''}")
             return True
         except Exception as e:
+            MODEL_LOAD_FAILURES.inc()
             logger.error(f"Error loading model: {str(e)}")
             return False
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the registry's CURRENT version if it changed; returns whether it did"""
+        if self.registry is None:
+            return False
+        with self._reload_lock:
+            version = self.registry.current_version()
+            if version is None or version in (self.model_version, self._failed_version):
+                return False
+            previous = self.model_version
+            if not self.load_model(version):
+                self._failed_version = version
+                logger.error(f"Keeping model version {previous}; not retrying {version} until CURRENT changes")
+                return False
+            self._failed_version = None
+        MODEL_SWAPS.inc()
+        logger.info(f"Swapped model version {previous} -> {version}")
+        return True
+
+    def watch_registry(self, interval: float = 30) -> threading.Thread:
+        """Check the registry for a new CURRENT version every interval seconds in a daemon thread"""
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    logger.error(f"Error checking model registry: {str(e)}")
+        
+        self._stop_watching.clear()
+        thread = threading.Thread(target=watch, name='model-registry-watch', daemon=True)
+        thread.start()
+        return thread
+
+    def stop_watching(self):
+        self._stop_watching.set()
     
-    def get_recommendations(self, weakness_level: str, weak_topics: List[str]) -> List[str]:
-        """Generate personalized recommendations based on weakness level and topics"""
-        # This is a placeholder - implement your recommendation logic here
+    def get_recommendations(self, weakness_level: Union[str, int], weak_topics: List[str],
+                            topic_resources: Optional[Dict[str, List[Dict]]] = None) -> List[str]:
+        """
+        Generate personalized recommendations based on weakness level and topics
+        
+        weakness_level is a model class (0/1/2) or a strength name ('weak',
+        'MODERATE', ...), normalised like RecommendationIndex does.
+        """
         recommendations = []
+        try:
+            level = strength_code(weakness_level)
+        except ValueError:
+            logger.warning(f"No generic advice for unknown weakness level {weakness_level!r}")
+            level = None
         
-        if weakness_level == "weak":
+        if level == 0:
             recommendations.extend([
                 "Focus on fundamental concepts",
                 "Schedule regular practice sessions",
                 "Consider one-on-one tutoring"
             ])
-        elif weakness_level == "moderate":
+        elif level == 1:
             recommendations.extend([
                 "Review specific weak topics",
                 "Practice with additional exercises",
                 "Join study groups"
             ])
-        else:  # strong
+        elif level == 2:
             recommendations.extend([
                 "Challenge yourself with advanced problems",
                 "Help peers with studying",
@@ -59,9 +221,26 @@ class WeaknessPredictor:
             
         # Add topic-specific recommendations
         for topic in weak_topics:
-            recommendations.append(f"Review resources for: {topic}")
+            resources = (topic_resources or {}).get(topic)
+            if not resources:
+                recommendations.append(f"Review resources for: {topic}")
+            for resource in resources or []:
+                recommendations.append(f"{str(resource['resource_type']).title()} on {topic}: "
+                                       f"{resource['title']} ({resource['url']})")
             
         return recommendations
+    
+    def topic_resources_batch(self, weakness_levels: List, weak_topics: List[List[str]],
+                              weak_topic_ids: Optional[List[List[int]]] = None) -> List[Dict[str, List[Dict]]]:
+        """Learning resources per weak topic for a whole batch, with one index lookup"""
+        if self.recommendation_index is None:
+            return [{} for _ in weak_topics]
+        
+        # Topic ids when the vocabulary has them, names otherwise
+        keys = weak_topic_ids if weak_topic_ids is not None else weak_topics
+        requests = [(key, level) for level, topic_keys in zip(weakness_levels, keys) for key in topic_keys]
+        found = iter(self.recommendation_index.recommend_batch(requests, self.resources_per_topic))
+        return [{topic: next(found) for topic in topics} for topics in weak_topics]
 
     def predict_weakness(self, student_data: Dict[str, Union[float, int, str]]) -> Dict:
         """
@@ -75,45 +254,93 @@ class WeaknessPredictor:
             Dictionary containing:
                 - weakness_level: predicted level
                 - confidence: prediction probability
-                - weak_topics: list of identified weak topics
+                - weak_topics: list of identified weak topics, weakest first
+                - weak_topic_ids: their topic ids (when the topic vocabulary has ids)
                 - recommendations: list of personalized recommendations
         """
+        results = self.predict_batch([student_data])
+        return results[0] if results else None
+    
+    def predict_batch(self, records: List[Dict[str, Union[float, int, str]]]) -> List[Dict]:
+        """
+        Predict weakness levels for many students with one scaler and model call
+        
+        Returns one result dictionary per record (see predict_weakness), or None
+        if the batch could not be scored.
+        """
+        BATCH_SIZE.observe(len(records))
+        # One version for the whole call, even if a new one is swapped in meanwhile
+        active = self._active
+        if active.model is None or active.scaler is None:
+            PREDICTIONS.labels(outcome='model_unavailable').inc(len(records))
+            logger.error("Error making prediction: model is not loaded")
+            return None
+        
         try:
-            # Convert input dictionary to DataFrame
-            input_df = pd.DataFrame([student_data])
-            
-            # Ensure all required features are present
-            required_features = self.scaler.feature_names_in_
-            missing_features = set(required_features) - set(input_df.columns)
-            if missing_features:
-                raise ValueError(f"Missing required features: {missing_features}")
-            
-            # Scale features
-            X_scaled = self.scaler.transform(input_df[required_features])
+            with STAGE_SECONDS.labels(stage='validation').time():
+                # Convert input records to DataFrame
+                input_df = pd.DataFrame(records)
+                
+                # Ensure all required features are present
+                required_features = active.scaler.feature_names_in_
+                missing_features = set(required_features) - set(input_df.columns)
+                if missing_features:
+                    raise ValueError(f"Missing required features: {missing_features}")
             
-            # Make prediction
-            weakness_level = self.model.predict(X_scaled)[0]
-            confidence = np.max(self.model.predict_proba(X_scaled)[0])
+            model_start = time.perf_counter()
+            with STAGE_SECONDS.labels(stage='scaling').time():
+                X_scaled = active.scaler.transform(input_df[required_features])
             
-            # Identify weak topics (example logic - customize based on your needs)
-            weak_topics = [
-                feature for feature, value in student_data.items()
-                if 'topic' in feature.lower() and value < 0.6
-            ]
+            with STAGE_SECONDS.labels(stage='model').time():
+                # One predict_proba call gives both the class and its confidence
+                probabilities = active.model.predict_proba(X_scaled)
+                best = probabilities.argmax(axis=1)
+                weakness_levels = active.model.classes_[best].tolist()
+                confidences = probabilities[np.arange(len(best)), best]
             
-            # Get recommendations
-            recommendations = self.get_recommendations(weakness_level, weak_topics)
+            if self.shadow is not None:
+                with STAGE_SECONDS.labels(stage='shadow').time():
+                    self.shadow.submit(input_df, active.model.classes_, probabilities,
+                                       time.perf_counter() - model_start)
             
-            return {
-                'weakness_level': weakness_level,
-                'confidence': float(confidence),
-                'weak_topics': weak_topics,
-                'recommendations': recommendations
-            }
+            with STAGE_SECONDS.labels(stage='recommendation').time():
+                # Threshold the (students x topics) mastery matrix of the whole batch
+                topic_mastery = active.topic_mastery
+                weak_columns = topic_mastery.weak_topics(records)
+                batch_weak_topics = [topic_mastery.topic_names(columns) for columns in weak_columns]
+                batch_weak_topic_ids = (None if topic_mastery.vocabulary.topic_ids is None
+                                        else [topic_mastery.topic_ids(columns) for columns in weak_columns])
+                batch_resources = self.topic_resources_batch(weakness_levels, batch_weak_topics, batch_weak_topic_ids)
+                results = []
+                for i, (weakness_level, confidence, weak_topics, topic_resources) in enumerate(zip(
+                        weakness_levels, confidences, batch_weak_topics, batch_resources)):
+                    result = {
+                        'weakness_level': weakness_level,
+                        'confidence': float(confidence),
+                        'weak_topics': weak_topics,
+                        'recommendations': self.get_recommendations(weakness_level, weak_topics, topic_resources)
+                    }
+                    if batch_weak_topic_ids is not None:
+                        result['weak_topic_ids'] = batch_weak_topic_ids[i]
+                    if self.recommendation_index is not None:
+                        result['resources'] = topic_resources
+                    results.append(result)
             
+        except ValueError as e:
+            PREDICTIONS.labels(outcome='invalid_input').inc(len(records))
+            logger.error(f"Error making prediction: {str(e)}")
+            return None
         except Exception as e:
+            PREDICTIONS.labels(outcome='error').inc(len(records))
             logger.error(f"Error making prediction: {str(e)}")
             return None
+        
+        PREDICTIONS.labels(outcome='success').inc(len(results))
+        for weakness_level, confidence in zip(weakness_levels, confidences):
+            PREDICTED_CLASSES.labels(weakness_level=weakness_level).inc()
+            CONFIDENCE.observe(float(confidence))
+        
+        return results
 
 # Example usage
 def example_usage():
@@ -3,5 +3,6 @@ Preprocessor module initialization
 """
 from .base import BasePreprocessor
 from .ou_enhanced import OUEnhancedPreprocessor
+from .splitting import StudentGroupSplitter
 
-__all__ = ['BasePreprocessor', 'OUEnhancedPreprocessor']
+__all__ = ['BasePreprocessor', 'OUEnhancedPreprocessor', 'StudentGroupSplitter']
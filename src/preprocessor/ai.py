@@ -1,19 +1,61 @@
-<<<<<<< HEAD
 """
 Fixed AI Preprocessor - Prevents temporal data leakage
 Only uses information available BEFORE the prediction point
 """
 
-=======
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
 from .base import BasePreprocessor
+from .instrumentation import stage
+from .features import FeatureRegistry, feature
 import pandas as pd
 import numpy as np
 from typing import Tuple
 from sklearn.model_selection import train_test_split
 
+
+# Features that depend on cohort statistics (fitted once, reused at scoring time)
+@feature('performance_risk', inputs=['current_avg_score'],
+         statistics={'median_score': ('current_avg_score', 'median')})
+def performance_risk(current_avg_score, stats):
+    # Below median
+    return (current_avg_score < stats['median_score']).astype(int)
+
+
+@feature('consistency_risk', inputs=['score_volatility'],
+         statistics={'median_volatility': ('score_volatility', 'median')})
+def consistency_risk(score_volatility, stats):
+    # High volatility
+    return (score_volatility > stats['median_volatility']).astype(int)
+
+
+@feature('high_performer', inputs=['current_avg_score'],
+         statistics={'top_25_threshold': ('current_avg_score', 0.75)})
+def high_performer(current_avg_score, stats):
+    # Top 25th percentile
+    return (current_avg_score >= stats['top_25_threshold']).astype(int)
+
+
+@feature('consistent_performer', inputs=['score_volatility'],
+         statistics={'low_volatility_threshold': ('score_volatility', 0.25)})
+def consistent_performer(score_volatility, stats):
+    # Low volatility
+    return (score_volatility <= stats['low_volatility_threshold']).astype(int)
+
+
+@feature('performance_zscore', inputs=['current_avg_score'],
+         statistics={'mean_score': ('current_avg_score', 'mean'),
+                     'std_score': ('current_avg_score', 'std')})
+def performance_zscore(current_avg_score, stats):
+    # How far from mean; epsilon avoids division by zero
+    return (current_avg_score - stats['mean_score']) / (stats['std_score'] + 1e-10)
+
+
+AI_FEATURES = [
+    performance_risk, consistency_risk, high_performer,
+    consistent_performer, performance_zscore
+]
+
+
 class AIPreprocessor(BasePreprocessor):
-<<<<<<< HEAD
     def __init__(self, prediction_point='midterm'):
         """
         Initialize AI preprocessor
@@ -26,11 +68,8 @@ class AIPreprocessor(BasePreprocessor):
         """
         super().__init__("AI")
         self.prediction_point = prediction_point
+        self.feature_registry = FeatureRegistry(AI_FEATURES)
         self.logger.info(f"Initialized AI preprocessor with prediction point: {prediction_point}")
-=======
-    def __init__(self):
-        super().__init__("AI")
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
     
     def load_data(self):
         """Load AI Course Performance Dataset"""
@@ -42,15 +81,12 @@ class AIPreprocessor(BasePreprocessor):
         self.raw_data = pd.read_csv(ai_file)
         self.report['original_shape'] = self.raw_data.shape
         self.report['features_before'] = self.raw_data.columns.tolist()
-<<<<<<< HEAD
         self.report['prediction_point'] = self.prediction_point
-=======
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         return self.raw_data
     
+    @stage
     def feature_engineering(self, df: pd.DataFrame) -> pd.DataFrame:
-<<<<<<< HEAD
         """
         Create features using ONLY assessments before prediction point
         CRITICAL: No future data leakage
@@ -186,9 +222,9 @@ class AIPreprocessor(BasePreprocessor):
             df[available_assessments].min(axis=1)
         )
         
-        # Relative performance (percentile within class)
+        # Relative performance (percentile within class, via saved sketch)
         for assessment in available_assessments:
-            df[f'{assessment}_percentile'] = df[assessment].rank(pct=True)
+            df[f'{assessment}_percentile'] = self.percentile_rank(df[assessment], assessment)
         
         # Average percentile rank
         percentile_cols = [f'{a}_percentile' for a in available_assessments]
@@ -230,13 +266,8 @@ class AIPreprocessor(BasePreprocessor):
         # 6. RISK INDICATORS (Based on current performance)
         # ============================================================
         
-        # Performance risk (below median)
-        median_score = df['current_avg_score'].median()
-        df['performance_risk'] = (df['current_avg_score'] < median_score).astype(int)
-        
-        # Consistency risk (high volatility)
-        median_volatility = df['score_volatility'].median()
-        df['consistency_risk'] = (df['score_volatility'] > median_volatility).astype(int)
+        # Performance risk (below median) and consistency risk (high volatility)
+        df = self.feature_registry.apply(df, ['performance_risk', 'consistency_risk'])
         
         # Progression risk (negative trend)
         if 'score_progression' in df.columns:
@@ -255,13 +286,8 @@ class AIPreprocessor(BasePreprocessor):
         # 7. STRENGTH INDICATORS
         # ============================================================
         
-        # High performer (top 25th percentile)
-        top_25_threshold = df['current_avg_score'].quantile(0.75)
-        df['high_performer'] = (df['current_avg_score'] >= top_25_threshold).astype(int)
-        
-        # Consistent performer (low volatility)
-        low_volatility_threshold = df['score_volatility'].quantile(0.25)
-        df['consistent_performer'] = (df['score_volatility'] <= low_volatility_threshold).astype(int)
+        # High performer (top 25th percentile) and consistent performer (low volatility)
+        df = self.feature_registry.apply(df, ['high_performer', 'consistent_performer'])
         
         # Improving student (positive trend)
         if 'score_progression' in df.columns:
@@ -274,10 +300,7 @@ class AIPreprocessor(BasePreprocessor):
         # ============================================================
         
         # Z-scores for current performance (how far from mean)
-        df['performance_zscore'] = (
-            (df['current_avg_score'] - df['current_avg_score'].mean()) / 
-            (df['current_avg_score'].std() + 1e-10)  # Avoid division by zero
-        )
+        df = self.feature_registry.apply(df, ['performance_zscore'])
         
         # Distance from passing threshold (assuming 60 is passing)
         df['distance_from_passing'] = (df['current_avg_score'] - 60) / 100.0
@@ -306,43 +329,11 @@ class AIPreprocessor(BasePreprocessor):
         
         self.logger.info(f"Feature engineering complete. Total features: {df.shape[1]}")
         self.logger.info(f"Available assessments used: {available_assessments}")
-=======
-        """Create new features for AI Course dataset"""
-        self.logger.info("Performing feature engineering...")
-        
-        # Calculate average score across all assessments
-        assessment_columns = ['Quiz ', 'Midterm', 'Assignment_1', 'Assignment_2', 'Assignment_3', 
-                            'Project', 'Presentation', 'Final_Exam']
-        
-        df['avg_score'] = df[assessment_columns].mean(axis=1)
-        
-        # Score trend (difference between final exam and early assessments)
-        early_assessments = ['Quiz ', 'Midterm', 'Assignment_1']
-        df['early_score'] = df[early_assessments].mean(axis=1)
-        df['score_trend'] = (df['Final_Exam'] - df['early_score']) / len(assessment_columns)
-        
-        # Performance consistency
-        df['performance_consistency'] = df[assessment_columns].std(axis=1)
-        
-        # At risk flag
-        df['at_risk_flag'] = (df['avg_score'] < 50).astype(int)
-        
-        # Count of assignments submitted (assuming NaN means not submitted)
-        df['attempts_per_topic'] = df[assessment_columns].notna().sum(axis=1)
-        
-        # Time efficiency (not available in this dataset, but we'll create a proxy)
-        max_scores = df[assessment_columns].max()
-        df['time_efficiency'] = df[assessment_columns].sum(axis=1) / (max_scores.sum())
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         return df
     
     def preprocess(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
-<<<<<<< HEAD
         """Preprocess AI dataset with temporal validation"""
-=======
-        """Preprocess AI Course dataset following the defined steps"""
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         # Step 1: Load data
         df = self.load_data()
@@ -350,7 +341,6 @@ class AIPreprocessor(BasePreprocessor):
         # Step 2: Handle missing values
         df = self.handle_missing_values(df)
         
-<<<<<<< HEAD
         # Step 3: Feature engineering (temporal-aware)
         df = self.feature_engineering(df)
         
@@ -369,22 +359,6 @@ class AIPreprocessor(BasePreprocessor):
         df = self.handle_outliers(df, numeric_columns)
         
         # Step 7: Train-test split (stratified)
-=======
-        # Step 3: Feature engineering
-        df = self.feature_engineering(df)
-        
-        # Step 4: Handle outliers
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
-        df = self.handle_outliers(df, numeric_columns)
-        
-        # Step 5: Create target variable
-        df = self.create_weakness_level(df, 'avg_score')
-        
-        # Step 6: Encode categorical variables
-        df = self.encode_categorical(df)
-        
-        # Step 7: Train-test split
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         train_df, test_df = train_test_split(
             df,
             test_size=0.2,
@@ -392,26 +366,17 @@ class AIPreprocessor(BasePreprocessor):
             stratify=df['weakness_level']
         )
         
-<<<<<<< HEAD
         self.logger.info(f"Train set: {len(train_df)} samples")
         self.logger.info(f"Test set: {len(test_df)} samples")
         
         # Step 8: Scale features
         numeric_columns = train_df.select_dtypes(include=['float64', 'int64']).columns
         numeric_columns = [col for col in numeric_columns if col != 'weakness_level']
-=======
-        # Step 8: Scale features
-        numeric_columns = train_df.select_dtypes(include=['float64', 'int64']).columns
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         train_df, test_df = self.scale_features(train_df, test_df, numeric_columns)
         
         # Update report
         self.report['final_shape'] = df.shape
-<<<<<<< HEAD
         self.report['features_after'] = [col for col in df.columns if col != 'weakness_level']
-=======
-        self.report['features_after'] = df.columns.tolist()
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         # Class distribution
         self.report['class_distribution'] = {
@@ -423,17 +388,6 @@ class AIPreprocessor(BasePreprocessor):
         self.save_data(train_df, test_df)
         self.save_report()
         
-<<<<<<< HEAD
         self.logger.info("✅ AI preprocessing complete with temporal validation")
-=======
-        # Plot distributions
-        plot_columns = ['avg_score', 'score_trend', 'performance_consistency']
-        self.plot_distributions(
-            self.raw_data,
-            train_df,
-            plot_columns,
-            self.reports_dir / f"{self.dataset_name}_distributions.png"
-        )
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         return train_df, test_df
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Class balancing for large training frames
+
+`MinorityOversampler` is a SMOTE-style oversampler that works on float32 copies
+of the minority classes only, finds neighbours in fixed-size chunks (optionally
+within a random candidate pool for approximate search) and returns just the
+synthetic rows. Peak memory stays proportional to the minority class size
+instead of the whole training matrix. `balanced_class_weights` is the
+zero-copy alternative for estimators that accept class or sample weights.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class MinorityOversampler:
+    """Generate synthetic minority rows by interpolating towards nearest neighbours"""
+
+    def __init__(self, k_neighbors: int = 5, chunk_size: int = 256,
+                 max_candidates: Optional[int] = 50000, random_state: int = 42):
+        self.k_neighbors = k_neighbors
+        self.chunk_size = chunk_size
+        self.max_candidates = max_candidates
+        self.rng = np.random.default_rng(random_state)
+
+    def _nearest_neighbors(self, X: np.ndarray) -> np.ndarray:
+        """k nearest neighbours of every row, computed chunk by chunk"""
+        n_rows = len(X)
+        k = min(self.k_neighbors, n_rows - 1)
+
+        # Approximate search: compare against a random candidate pool only
+        candidates = np.arange(n_rows)
+        if self.max_candidates is not None and n_rows > self.max_candidates:
+            candidates = np.sort(self.rng.choice(n_rows, self.max_candidates, replace=False))
+        pool = X[candidates]
+        pool_norms = np.einsum('ij,ij->i', pool, pool)
+
+        neighbors = np.empty((n_rows, k), dtype=np.int64)
+        for start in range(0, n_rows, self.chunk_size):
+            chunk = X[start:start + self.chunk_size]
+            # Squared distances built in place to avoid chunk x pool temporaries
+            distances = chunk @ pool.T
+            distances *= -2
+            distances += pool_norms[None, :]
+            distances += np.einsum('ij,ij->i', chunk, chunk)[:, None]
+            # A row is never its own neighbour
+            row_ids = np.arange(start, start + len(chunk))
+            positions = np.minimum(np.searchsorted(candidates, row_ids), len(candidates) - 1)
+            in_pool = candidates[positions] == row_ids
+            distances[np.flatnonzero(in_pool), positions[in_pool]] = np.inf
+
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            neighbors[start:start + len(chunk)] = candidates[nearest]
+
+        return neighbors
+
+    def _synthesize(self, X: np.ndarray, n_new: int) -> np.ndarray:
+        neighbors = self._nearest_neighbors(X)
+        synthetic = np.empty((n_new, X.shape[1]), dtype=np.float32)
+
+        for start in range(0, n_new, self.chunk_size):
+            size = min(self.chunk_size, n_new - start)
+            base = self.rng.integers(len(X), size=size)
+            partner = neighbors[base, self.rng.integers(neighbors.shape[1], size=size)]
+            gap = self.rng.random((size, 1), dtype=np.float32)
+            synthetic[start:start + size] = X[base] + gap * (X[partner] - X[base])
+
+        return synthetic
+
+    def synthetic_samples(self, X, y) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Synthetic rows that bring every class up to the majority count
+
+        Only the new rows are returned (float32); append them to the original
+        training data. Classes with fewer than two rows are left as they are.
+        """
+        y = np.asarray(y)
+        classes, counts = np.unique(y, return_counts=True)
+        target = counts.max()
+
+        X_parts, y_parts = [], []
+        for label, count in zip(classes, counts):
+            if count == target or count < 2:
+                continue
+            X_class = np.asarray(X[y == label], dtype=np.float32)
+            X_parts.append(self._synthesize(X_class, target - count))
+            y_parts.append(np.full(target - count, label, dtype=y.dtype))
+
+        if not X_parts:
+            return np.empty((0, X.shape[1]), dtype=np.float32), np.empty(0, dtype=y.dtype)
+        return np.concatenate(X_parts), np.concatenate(y_parts)
+
+
+def balanced_class_weights(y) -> Dict:
+    """'balanced' class weights (n_samples / (n_classes * count)) without resampling"""
+    classes, counts = np.unique(np.asarray(y), return_counts=True)
+    weights = len(y) / (len(classes) * counts)
+    return {label.item(): float(weight) for label, weight in zip(classes, weights)}
@@ -3,13 +3,14 @@ import numpy as np
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 import json
-import matplotlib.pyplot as plt
-import seaborn as sns
+import os
 from pathlib import Path
 import logging
 import json
 from typing import Tuple, Dict, List, Any
 from sklearn.model_selection import train_test_split
+from .sketch import QuantileSketch, save_sketches
+from .instrumentation import stage, stage_summary, save_trace, trace_enabled
 
 class BasePreprocessor:
     """Base class for all dataset preprocessors"""
@@ -22,15 +23,16 @@ class BasePreprocessor:
         self.test_data = None
         self.scalers = {}
         self.encoders = {}
-<<<<<<< HEAD
+        self.onehot_vocabulary = {}
+        self.feature_registry = None
+        self.sketches = {}
+        self.trace_events = []
         
         # Define common weakness thresholds
         self.weakness_thresholds = {
             'strong': 0.75,  # Above 75th percentile
             'moderate': 0.25  # Below 25th percentile is weak
         }
-=======
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         self.report = {
             'dataset_name': dataset_name,
             'original_shape': None,
@@ -60,13 +62,13 @@ class BasePreprocessor:
         self.processed_dir.mkdir(parents=True, exist_ok=True)
         self.reports_dir.mkdir(parents=True, exist_ok=True)
     
-<<<<<<< HEAD
+    @stage
     def create_weakness_levels(self, df: pd.DataFrame, score_column: str) -> pd.DataFrame:
         """Create weakness levels based on performance scores"""
         self.logger.info("Creating weakness level target...")
         
         # Calculate percentile ranks
-        ranks = df[score_column].rank(pct=True)
+        ranks = self.percentile_rank(df[score_column], score_column)
         
         # Create weakness levels (0: Weak, 1: Moderate, 2: Strong)
         conditions = [
@@ -85,8 +87,23 @@ class BasePreprocessor:
         
         return df
     
-=======
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
+    def percentile_rank(self, values: pd.Series, column: str) -> pd.Series:
+        """
+        Percentile rank of values within the cohort for column
+        
+        The first call is the fit: it returns the exact rank(pct=True) of the
+        cohort, so training labels and features match the un-sketched pipeline,
+        and builds a sketch of the same values that is saved with the processed
+        data. Later calls rank new rows against that sketch without re-sorting
+        the cohort.
+        """
+        if column not in self.sketches:
+            self.sketches[column] = QuantileSketch().update(values.to_numpy(dtype=float))
+            return values.rank(pct=True)
+        
+        return pd.Series(self.sketches[column].rank(values.to_numpy(dtype=float)), index=values.index)
+    
+    @stage
     def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         """Handle missing values using median for numerical and mode for categorical"""
         self.logger.info("Handling missing values...")
@@ -118,16 +135,30 @@ class BasePreprocessor:
         
         return df
     
+    @stage
     def encode_categorical(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Encode categorical variables using Label and One-Hot encoding"""
+        """
+        Encode categorical variables using Label and One-Hot encoding
+        
+        Multi-class columns are one-hot encoded together in a single pass against
+        the vocabulary fitted on the first call, so inference frames get exactly
+        the training dummy columns (unseen categories encode as all zeros).
+        The vocabulary is saved with the processed data by save_data() and can be
+        restored with load_onehot_vocabulary() before encoding new rows.
+        """
         self.logger.info("Encoding categorical variables...")
         
         # Identify categorical columns
         categorical_columns = df.select_dtypes(include=['object']).columns
+        onehot_columns = []
         
         for column in categorical_columns:
+            # Already fitted as a multi-class column
+            if column in self.onehot_vocabulary:
+                onehot_columns.append(column)
+            
             # Binary categories (2 unique values)
-            if df[column].nunique() == 2:
+            elif column in self.encoders or df[column].nunique() == 2:
                 if column not in self.encoders:
                     self.encoders[column] = LabelEncoder()
                     df[column] = self.encoders[column].fit_transform(df[column])
@@ -144,17 +175,47 @@ class BasePreprocessor:
             
             # Multi-class categories
             else:
-                dummies = pd.get_dummies(df[column], prefix=column, drop_first=True)
-                df = pd.concat([df, dummies], axis=1)
-                df = df.drop(columns=[column])
-                
-                self.report['encoding_mappings'][column] = {
-                    'type': 'one-hot',
-                    'generated_columns': dummies.columns.tolist()
-                }
+                self.onehot_vocabulary[column] = sorted(df[column].dropna().unique().tolist())
+                onehot_columns.append(column)
+        
+        if onehot_columns:
+            dummies = self._one_hot_encode(df, onehot_columns)
+            df = pd.concat([df.drop(columns=onehot_columns), dummies], axis=1)
         
         return df
     
+    def _one_hot_encode(self, df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Write all dummy columns into one preallocated uint8 array (drop_first semantics)"""
+        names = []
+        for column in columns:
+            generated = [f"{column}_{category}" for category in self.onehot_vocabulary[column][1:]]
+            names.extend(generated)
+            self.report['encoding_mappings'][column] = {
+                'type': 'one-hot',
+                'reference_category': self.onehot_vocabulary[column][0],
+                'generated_columns': generated
+            }
+        
+        matrix = np.zeros((len(df), len(names)), dtype=np.uint8)
+        offset = 0
+        for column in columns:
+            categories = self.onehot_vocabulary[column]
+            codes = pd.Categorical(df[column], categories=categories).codes
+            
+            # First category is the reference level; -1 marks missing/unseen values
+            hit = np.flatnonzero(codes > 0)
+            matrix[hit, offset + codes[hit] - 1] = 1
+            offset += len(categories) - 1
+        
+        return pd.DataFrame(matrix, index=df.index, columns=names)
+    
+    def load_onehot_vocabulary(self, path: Path) -> Dict[str, List]:
+        """Restore the one-hot vocabulary saved by save_data()"""
+        with open(path) as f:
+            self.onehot_vocabulary = json.load(f)
+        return self.onehot_vocabulary
+    
+    @stage
     def handle_outliers(self, df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
         """Cap outliers using IQR method"""
         self.logger.info("Handling outliers...")
@@ -174,6 +235,7 @@ class BasePreprocessor:
         
         return df
     
+    @stage
     def scale_features(self, train_df: pd.DataFrame, test_df: pd.DataFrame, 
                       columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Scale numerical features using StandardScaler"""
@@ -190,24 +252,34 @@ class BasePreprocessor:
                     test_df[column] = self.scalers[column].transform(test_df[[column]])
                 
                 self.report['scaling_params'][column] = {
-                    'mean': float(self.scalers[column].mean_),
-                    'scale': float(self.scalers[column].scale_)
+                    'mean': float(self.scalers[column].mean_[0]),
+                    'scale': float(self.scalers[column].scale_[0])
                 }
         
         return train_df, test_df
     
-    def create_weakness_level(self, df: pd.DataFrame, score_column: str) -> pd.DataFrame:
-        """Create 3-class target variable"""
+    @stage
+    def create_weakness_level(self, df: pd.DataFrame, score_column: str,
+                              right: bool = True) -> pd.DataFrame:
+        """
+        Create 3-class target variable
+        
+        Bands are closed on the right by default (60 is weak, 80 is moderate), which
+        the saved AI and OU models were trained with. right=False gives the half-open
+        bands of UpdateWeaknessAnalysis (60 is moderate, 80 is strong).
+        """
         self.logger.info("Creating weakness level target...")
         
         df['weakness_level'] = pd.cut(
             df[score_column],
             bins=[-np.inf, 60, 80, np.inf],
+            right=right,
             labels=[0, 1, 2]
         )
         
         return df
     
+    @stage
     def save_data(self, train_df: pd.DataFrame, test_df: pd.DataFrame):
         """Save processed train and test data"""
         train_path = self.processed_dir / f"{self.dataset_name}_train.csv"
@@ -217,6 +289,24 @@ class BasePreprocessor:
         test_df.to_csv(test_path, index=False)
         
         self.logger.info(f"Saved processed data to {train_path} and {test_path}")
+        
+        # Fitted feature statistics are needed to score new students consistently
+        if self.feature_registry is not None and self.feature_registry.fitted_stats:
+            stats_path = self.processed_dir / f"{self.dataset_name}_feature_stats.json"
+            self.feature_registry.save(stats_path)
+            self.logger.info(f"Saved feature statistics to {stats_path}")
+        
+        if self.sketches:
+            sketches_path = self.processed_dir / f"{self.dataset_name}_sketches.json"
+            save_sketches(self.sketches, sketches_path)
+            self.logger.info(f"Saved percentile sketches to {sketches_path}")
+        
+        # Reference category first, so inference rebuilds the same dummy columns
+        if self.onehot_vocabulary:
+            vocabulary_path = self.processed_dir / f"{self.dataset_name}_onehot_vocabulary.json"
+            with open(vocabulary_path, 'w') as f:
+                json.dump(self.onehot_vocabulary, f, indent=4)
+            self.logger.info(f"Saved one-hot vocabulary to {vocabulary_path}")
     
     def save_report(self):
         """Save preprocessing report"""
@@ -233,6 +323,13 @@ class BasePreprocessor:
             else:
                 return obj
         
+        if self.report.get('stage_timings'):
+            self.report['stage_summary'] = stage_summary(self.report['stage_timings'])
+            if trace_enabled():
+                trace_path = self.reports_dir / f"{self.dataset_name}_trace.json"
+                save_trace(self.trace_events, trace_path)
+                self.logger.info(f"Saved stage trace to {trace_path}")
+        
         json_report = convert_to_serializable(self.report)
         
         with open(report_path, 'w') as f:
@@ -243,26 +340,37 @@ class BasePreprocessor:
     def plot_distributions(self, original_df: pd.DataFrame, processed_df: pd.DataFrame, 
                          columns: List[str], save_path: Path):
         """Plot before/after distributions for specified columns"""
+        # Same switch as report_renderer.py: figures are optional in CI and retrains
+        if os.environ.get('LEARNMATE_SKIP_FIGURES', '').lower() not in ('', '0', 'false', 'no'):
+            self.logger.info("Skipping distribution plots (LEARNMATE_SKIP_FIGURES is set)")
+            return
+        
+        # Plotting libraries are only needed here; importing them lazily keeps
+        # preprocessing and scoring workers light. A standalone Figure renders
+        # headlessly without touching pyplot state.
+        import seaborn as sns
+        from matplotlib.figure import Figure
+        
         self.logger.info("Plotting distributions...")
         
         n_cols = len(columns)
-        fig, axes = plt.subplots(n_cols, 2, figsize=(15, 5*n_cols))
+        fig = Figure(figsize=(15, 5*n_cols))
+        axes = fig.subplots(n_cols, 2, squeeze=False)
         fig.suptitle('Feature Distributions: Before vs After Preprocessing')
         
         for i, column in enumerate(columns):
             if column in original_df.columns:
                 # Before preprocessing
-                sns.histplot(data=original_df, x=column, ax=axes[i, 0])
+                sns.histplot(x=original_df[column].to_numpy(), ax=axes[i, 0])
                 axes[i, 0].set_title(f'{column} - Before')
                 
             if column in processed_df.columns:
                 # After preprocessing
-                sns.histplot(data=processed_df, x=column, ax=axes[i, 1])
+                sns.histplot(x=processed_df[column].to_numpy(), ax=axes[i, 1])
                 axes[i, 1].set_title(f'{column} - After')
         
-        plt.tight_layout()
-        plt.savefig(save_path)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(save_path)
         
         self.logger.info(f"Saved distribution plots to {save_path}")
     
@@ -0,0 +1,119 @@
+"""
+Feature-definition registry shared by training and serving
+
+Features that depend on cohort-wide statistics (max, median, quantiles, mean/std)
+are declared once with their inputs and the statistics they need. The statistics
+are captured the first time the registry sees a frame (at preprocessing time) and
+saved next to the processed data, so a single student can later be scored with
+exactly the same feature values without recomputing the cohort.
+"""
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# (input column, aggregation) - aggregation is 'max', 'min', 'mean', 'std',
+# 'median' or a float in [0, 1] for a quantile
+StatisticSpec = Tuple[str, Union[str, float]]
+
+
+class FeatureDefinition:
+    """A derived feature: its input columns, fitted statistics and vectorized compute function"""
+
+    def __init__(self, name: str, inputs: List[str], compute: Callable[..., np.ndarray],
+                 statistics: Optional[Dict[str, StatisticSpec]] = None):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+        self.statistics = statistics or {}
+
+    def fit(self, df: pd.DataFrame) -> Dict[str, float]:
+        """Capture the cohort statistics this feature needs"""
+        return {
+            stat_name: _aggregate(df[column], how)
+            for stat_name, (column, how) in self.statistics.items()
+        }
+
+    def transform(self, df: pd.DataFrame, stats: Dict[str, float]) -> np.ndarray:
+        """Compute the feature for every row from its inputs and fitted statistics"""
+        arrays = [df[column].to_numpy(dtype=np.float64) for column in self.inputs]
+        return self.compute(*arrays, stats)
+
+
+def feature(name: str, inputs: List[str],
+            statistics: Optional[Dict[str, StatisticSpec]] = None):
+    """Decorator turning a `compute(*input_arrays, stats)` function into a FeatureDefinition"""
+    def decorator(compute):
+        return FeatureDefinition(name, inputs, compute, statistics)
+    return decorator
+
+
+def _aggregate(series: pd.Series, how: Union[str, float]) -> float:
+    if isinstance(how, float):
+        return float(series.quantile(how))
+    return float(getattr(series, how)())
+
+
+class FeatureRegistry:
+    """Ordered set of feature definitions plus the statistics fitted for them"""
+
+    def __init__(self, definitions: List[FeatureDefinition]):
+        self.definitions = {definition.name: definition for definition in definitions}
+        self.fitted_stats: Dict[str, Dict[str, float]] = {}
+
+    def is_fitted(self, name: str) -> bool:
+        return name in self.fitted_stats
+
+    def fit(self, df: pd.DataFrame, names: Optional[List[str]] = None) -> 'FeatureRegistry':
+        """Capture statistics for the given features (all by default)"""
+        for name in names or list(self.definitions):
+            self.fitted_stats[name] = self.definitions[name].fit(df)
+        return self
+
+    def transform(self, df: pd.DataFrame, names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Add the given features to df using the stored statistics"""
+        for name in names or list(self.definitions):
+            if name not in self.fitted_stats:
+                raise ValueError(f"Feature '{name}' has no fitted statistics")
+            df[name] = self.definitions[name].transform(df, self.fitted_stats[name])
+        return df
+
+    def apply(self, df: pd.DataFrame, names: List[str]) -> pd.DataFrame:
+        """
+        Fit any features not fitted yet on df, then transform
+
+        During preprocessing this captures statistics on the cohort; once the
+        registry is loaded from disk it only transforms.
+        """
+        unfitted = [name for name in names if name not in self.fitted_stats]
+        if unfitted:
+            self.fit(df, unfitted)
+        return self.transform(df, names)
+
+    def transform_record(self, record: Dict[str, float],
+                         names: Optional[List[str]] = None) -> Dict[str, float]:
+        """Compute features for a single student without a cohort"""
+        row = self.transform(pd.DataFrame([record]), names)
+        return {name: float(row[name].iloc[0]) for name in names or list(self.definitions)}
+
+    def save(self, path: Path):
+        """Save fitted statistics as JSON"""
+        payload = {
+            name: {'inputs': self.definitions[name].inputs, 'statistics': stats}
+            for name, stats in self.fitted_stats.items()
+        }
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=4)
+
+    def load(self, path: Path) -> 'FeatureRegistry':
+        """Load fitted statistics saved by save()"""
+        with open(path) as f:
+            payload = json.load(f)
+
+        for name, entry in payload.items():
+            if name not in self.definitions:
+                raise ValueError(f"Unknown feature '{name}' in {path}")
+            self.fitted_stats[name] = entry['statistics']
+        return self
@@ -0,0 +1,124 @@
+"""
+Per-stage timing and memory instrumentation for preprocessors
+
+Decorate a preprocessor method with `@stage` and every call appends an entry to
+`self.report['stage_timings']` with wall time, CPU time, growth of the process
+peak RSS and the row/column counts of the DataFrames going in and out. Peak RSS
+comes from `resource` on Linux/macOS and from psutil's peak working set on
+Windows; without either it is recorded as None. The same calls are kept as
+Chrome trace events; `save_trace` writes them to a JSON file that opens in
+chrome://tracing or Perfetto, with nested stages shown inside their callers.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Set to a truthy value to write a Chrome trace next to the preprocessing report
+TRACE_ENV_VAR = 'PREPROCESS_TRACE'
+
+_TRACE_ORIGIN = time.perf_counter()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB (None if it cannot be read)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KB on Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    # Windows: peak working set from psutil, when it is installed
+    try:
+        import psutil
+    except ImportError:
+        return None
+    peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None if peak is None else peak / (1024 * 1024)
+
+
+def _frame_shape(values) -> Optional[List[int]]:
+    """[rows, columns] summed over the DataFrames in values (a frame, tuple or list)"""
+    if isinstance(values, pd.DataFrame):
+        return [len(values), values.shape[1]]
+    if isinstance(values, (tuple, list)):
+        shapes = [_frame_shape(value) for value in values if isinstance(value, pd.DataFrame)]
+        if shapes:
+            return [sum(rows for rows, _ in shapes), max(cols for _, cols in shapes)]
+    return None
+
+
+def stage(method=None, *, name: Optional[str] = None):
+    """Record timing, memory and shapes of every call to a preprocessor method"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            shape_in = _frame_shape(list(args) + list(kwargs.values()))
+            rss_start = peak_rss_mb()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+            result = func(self, *args, **kwargs)
+
+            wall_end = time.perf_counter()
+            rss_end = peak_rss_mb()
+            entry = {
+                'stage': stage_name,
+                'wall_s': wall_end - wall_start,
+                'cpu_s': time.process_time() - cpu_start,
+                'peak_rss_delta_mb': None if rss_start is None or rss_end is None else rss_end - rss_start,
+                'shape_in': shape_in,
+                'shape_out': _frame_shape(result),
+            }
+            self.report.setdefault('stage_timings', []).append(entry)
+            self.logger.debug(f"Stage {stage_name} took {entry['wall_s']:.3f}s")
+
+            self.trace_events.append({
+                'name': stage_name,
+                'cat': self.report.get('dataset_name', 'preprocess'),
+                'ph': 'X',
+                'ts': (wall_start - _TRACE_ORIGIN) * 1e6,
+                'dur': (wall_end - wall_start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {key: value for key, value in entry.items() if key != 'stage'},
+            })
+            return result
+
+        return wrapper
+
+    return decorator(method) if method is not None else decorator
+
+
+def stage_summary(stage_timings: List[Dict]) -> Dict[str, Dict]:
+    """Totals per stage name, slowest first"""
+    summary: Dict[str, Dict] = {}
+    for entry in stage_timings:
+        total = summary.setdefault(entry['stage'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                    'peak_rss_delta_mb': None})
+        total['calls'] += 1
+        total['wall_s'] += entry['wall_s']
+        total['cpu_s'] += entry['cpu_s']
+        if entry['peak_rss_delta_mb'] is not None:
+            total['peak_rss_delta_mb'] = (total['peak_rss_delta_mb'] or 0.0) + entry['peak_rss_delta_mb']
+    return dict(sorted(summary.items(), key=lambda item: item[1]['wall_s'], reverse=True))
+
+
+def save_trace(trace_events: List[Dict], path: Path):
+    """Write trace events in the Chrome trace-event JSON format"""
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+def trace_enabled() -> bool:
+    return os.environ.get(TRACE_ENV_VAR, '').lower() not in ('', '0', 'false', 'no')
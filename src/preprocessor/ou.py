@@ -1,10 +1,10 @@
 from .base import BasePreprocessor
+from .instrumentation import stage
+from .splitting import StudentGroupSplitter
 import pandas as pd
 import numpy as np
-<<<<<<< HEAD
 from typing import Tuple, Dict
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
 import logging
 
 class OUPreprocessor(BasePreprocessor):
@@ -105,6 +105,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return self.raw_data
     
+    @stage
     def _process_and_merge_data(
         self, 
         student_info: pd.DataFrame,
@@ -153,6 +154,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return final_data
     
+    @stage
     def _process_assessment_data(
         self,
         assessments: pd.DataFrame,
@@ -250,6 +252,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return base_metrics
     
+    @stage
     def _process_vle_data(
         self,
         vle_data: pd.DataFrame,
@@ -351,6 +354,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return base_features
     
+    @stage
     def _process_registration_data(
         self,
         student_registration: pd.DataFrame
@@ -372,6 +376,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return registration_features
     
+    @stage
     def feature_engineering(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Create additional engineered features from EARLY data only
@@ -406,6 +411,7 @@ class OUPreprocessor(BasePreprocessor):
         
         return df
     
+    @stage
     def create_weakness_level(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Create target variable from ACTUAL OUTCOMES (final_result)
@@ -443,93 +449,18 @@ class OUPreprocessor(BasePreprocessor):
         
         # ✅ NOW drop final_result - it was only needed for target creation
         df = df.drop(columns=['final_result'])
-=======
-from typing import Tuple
-from sklearn.model_selection import train_test_split
-
-class OUPreprocessor(BasePreprocessor):
-    def __init__(self):
-        super().__init__("OU")
-    
-    def load_data(self):
-        """Load OU Analyse Dataset"""
-        self.logger.info("Loading OU dataset...")
-        
-        ou_dir = self.raw_dir / 'ou_data'
-        
-        # Load essential columns only
-        student_info = pd.read_csv(
-            ou_dir / 'studentInfo.csv',
-            usecols=['id_student', 'gender', 'region', 'highest_education']
-        )
-        
-        assessments = pd.read_csv(
-            ou_dir / 'studentAssessment.csv',
-            usecols=['id_student', 'id_assessment', 'score']
-        )
-        
-        vle_data = pd.read_csv(
-            ou_dir / 'studentVle.csv',
-            usecols=['id_student', 'sum_click']
-        ).groupby('id_student')['sum_click'].sum().reset_index()
-        
-        # Merge datasets
-        self.raw_data = student_info.merge(assessments, on='id_student', how='left')
-        self.raw_data = self.raw_data.merge(vle_data, on='id_student', how='left')
-        
-        self.report['original_shape'] = self.raw_data.shape
-        self.report['features_before'] = self.raw_data.columns.tolist()
-        
-        return self.raw_data
-    
-    def feature_engineering(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create new features for OU dataset"""
-        self.logger.info("Performing feature engineering...")
-        
-        # Average score per student
-        score_stats = df.groupby('id_student')['score'].agg(['mean', 'std', 'count']).reset_index()
-        score_stats.columns = ['id_student', 'avg_score', 'performance_consistency', 'attempts_per_topic']
-        
-        # Merge score statistics back
-        df = df.merge(score_stats, on='id_student', how='left')
-        
-        # Score trend based on assessment order
-        student_scores = df.groupby('id_student')['score']
-        first_scores = student_scores.first()
-        last_scores = student_scores.last()
-        attempts = student_scores.count()
-        
-        score_trends = (last_scores - first_scores) / attempts
-        score_trends = score_trends.reset_index()
-        score_trends.columns = ['id_student', 'score_trend']
-        
-        df = df.merge(score_trends, on='id_student', how='left')
-        
-        # Time efficiency (score per VLE interaction)
-        df['time_efficiency'] = df['score'] / df.groupby('id_student')['sum_click'].transform('sum')
-        
-        # At risk flag
-        df['at_risk_flag'] = (df['avg_score'] < 50).astype(int)
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         return df
     
     def preprocess(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
-<<<<<<< HEAD
         """Main preprocessing pipeline with proper leakage prevention"""
         
         # Step 1: Load and merge data (with temporal filtering)
-=======
-        """Preprocess OU dataset following the defined steps"""
-        
-        # Step 1: Load data
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         df = self.load_data()
         
         # Step 2: Handle missing values
         df = self.handle_missing_values(df)
         
-<<<<<<< HEAD
         # Step 3: Feature engineering (SAFE - uses early data only)
         df = self.feature_engineering(df)
         
@@ -574,17 +505,13 @@ class OUPreprocessor(BasePreprocessor):
         # Step 8: STUDENT-LEVEL train-test split (not random row split!)
         # This ensures no student appears in both train and test
         
-        unique_students = df['id_student'].unique()
-        
-        train_students, test_students = train_test_split(
-            unique_students,
-            test_size=0.2,
-            random_state=42,
-            stratify=df.groupby('id_student')['weakness_level'].first()[unique_students]
-        )
+        splitter = StudentGroupSplitter(df['id_student'], df['weakness_level'])
+        train_idx, test_idx = splitter.train_test_split(test_size=0.2, random_state=42)
         
-        train_df = df[df['id_student'].isin(train_students)].copy()
-        test_df = df[df['id_student'].isin(test_students)].copy()
+        train_df = df.iloc[train_idx]
+        test_df = df.iloc[test_idx]
+        train_students = train_df['id_student'].unique()
+        test_students = test_df['id_student'].unique()
         
         self.logger.info(f"Student-level split: {len(train_students)} train, {len(test_students)} test")
         
@@ -628,54 +555,5 @@ class OUPreprocessor(BasePreprocessor):
         self.logger.info(f"✅ Preprocessing complete: {train_df.shape[1]-1} features, {train_df.shape[0]} train samples")
         self.logger.info(f"✅ Target distribution - Train: {train_df['weakness_level'].value_counts().to_dict()}")
         self.logger.info(f"✅ Target distribution - Test: {test_df['weakness_level'].value_counts().to_dict()}")
-=======
-        # Step 3: Feature engineering
-        df = self.feature_engineering(df)
-        
-        # Step 4: Handle outliers
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
-        df = self.handle_outliers(df, numeric_columns)
-        
-        # Step 5: Create target variable
-        df = self.create_weakness_level(df, 'avg_score')
-        
-        # Step 6: Encode categorical variables
-        df = self.encode_categorical(df)
-        
-        # Step 7: Train-test split
-        train_df, test_df = train_test_split(
-            df,
-            test_size=0.2,
-            random_state=42,
-            stratify=df['weakness_level']
-        )
-        
-        # Step 8: Scale features
-        numeric_columns = train_df.select_dtypes(include=['float64', 'int64']).columns
-        train_df, test_df = self.scale_features(train_df, test_df, numeric_columns)
-        
-        # Update report
-        self.report['final_shape'] = df.shape
-        self.report['features_after'] = df.columns.tolist()
-        
-        # Class distribution
-        self.report['class_distribution'] = {
-            'train': train_df['weakness_level'].value_counts().to_dict(),
-            'test': test_df['weakness_level'].value_counts().to_dict()
-        }
-        
-        # Save processed data and report
-        self.save_data(train_df, test_df)
-        self.save_report()
-        
-        # Plot distributions
-        plot_columns = ['avg_score', 'score_trend', 'performance_consistency']
-        self.plot_distributions(
-            self.raw_data,
-            train_df,
-            plot_columns,
-            self.reports_dir / f"{self.dataset_name}_distributions.png"
-        )
->>>>>>> 431bf9542c2f2ee979b73168008154307fdc1749
         
         return train_df, test_df
\ No newline at end of file
@@ -1,17 +1,28 @@
 from .base import BasePreprocessor
+from .splitting import StudentGroupSplitter
+from .balancing import MinorityOversampler, balanced_class_weights
 import pandas as pd
 import numpy as np
 from typing import Tuple, Dict
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from imblearn.over_sampling import SMOTE
 import logging
 
 class OUEnhancedPreprocessor(BasePreprocessor):
-    def __init__(self):
+    def __init__(self, balance_strategy='smote'):
+        """
+        Args:
+            balance_strategy: How to handle class imbalance in the training split
+                            - 'smote': append synthetic minority rows
+                            - 'class_weight': keep rows, record balanced class weights;
+                              train_base_models passes sample_weights(y_train) to the fits
+                              (train_base_models.py --ou-balance class_weight)
+                            - None: no balancing
+        """
         super().__init__("OU")
         self.scaler = StandardScaler()
         self.label_encoders = {}
+        self.balance_strategy = balance_strategy
+        self.class_weights = None
     
     def load_all_data(self):
         """Load and merge all relevant OU dataset files"""
@@ -338,8 +349,10 @@ class OUEnhancedPreprocessor(BasePreprocessor):
         """Select important features based on correlation with target"""
         self.logger.info("Selecting important features...")
         
-        # Calculate correlations with target
-        correlations = df.corr()['weakness_level'].abs()
+        # Calculate correlations with target (categorical from qcut); unencoded
+        # columns such as code_module are left out, the models cannot take them
+        numeric = df.select_dtypes(include='number').assign(weakness_level=df['weakness_level'].astype(float))
+        correlations = numeric.corr()['weakness_level'].abs()
         
         # Select features with correlation above threshold
         important_features = correlations[correlations > 0.05].index.tolist()
@@ -360,24 +373,42 @@ class OUEnhancedPreprocessor(BasePreprocessor):
         X = df.drop(['weakness_level', 'id_student'], axis=1)
         y = df['weakness_level']
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        
-        # Apply SMOTE to training data
-        smote = SMOTE(random_state=42)
-        X_train_balanced, y_train_balanced = smote.fit_resample(X_train, y_train)
+        # Split by student so no student's rows end up on both sides
+        splitter = StudentGroupSplitter(df['id_student'], y)
+        train_idx, test_idx = splitter.train_test_split(test_size=0.2, random_state=42)
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
         
-        # Reconstruct DataFrames
-        train_df = pd.DataFrame(X_train_balanced, columns=X.columns)
-        train_df['weakness_level'] = y_train_balanced
+        train_df = X_train.copy()
+        train_df['weakness_level'] = y_train
         
-        test_df = pd.DataFrame(X_test, columns=X.columns)
+        if self.balance_strategy == 'smote':
+            # Only the synthetic rows are generated (float32) and appended
+            X_synthetic, y_synthetic = MinorityOversampler(random_state=42).synthetic_samples(
+                X_train, y_train.to_numpy()
+            )
+            synthetic_df = pd.DataFrame(X_synthetic, columns=X.columns)
+            synthetic_df['weakness_level'] = y_synthetic
+            train_df = pd.concat([train_df, synthetic_df], ignore_index=True)
+            self.report['synthetic_rows'] = len(synthetic_df)
+        
+        elif self.balance_strategy == 'class_weight':
+            # Zero-copy alternative: the rows stay as they are and sample_weights()
+            # turns these into per-row weights for the estimator fit
+            self.class_weights = balanced_class_weights(y_train)
+            self.report['class_weights'] = self.class_weights
+        
+        test_df = X_test.copy()
         test_df['weakness_level'] = y_test
         
         return train_df, test_df
     
+    def sample_weights(self, y: pd.Series) -> np.ndarray:
+        """Per-row fit weights from the class weights of the 'class_weight' strategy"""
+        if self.class_weights is None:
+            raise ValueError("class weights are only computed with balance_strategy='class_weight'")
+        return y.map(self.class_weights).to_numpy(dtype=float)
+    
     def preprocess(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Main preprocessing pipeline"""
         self.logger.info("Starting enhanced preprocessing pipeline...")
@@ -0,0 +1,281 @@
+"""
+Per-(user, topic) features from the platform's own quiz tables
+
+Unlike the dataset preprocessors this one reads the production schema
+(`database/schema.sql`): quiz_attempts, quiz_responses and topics. All
+aggregation happens in the database with one set-based query, and results are
+read in chunks, so the Python side never sees raw responses. The same query
+works on MySQL 8 and on the SQLite stand-in built by `database.create_sqlite_database`.
+
+Training rows are temporal: features use attempts completed before a cutoff
+and the target is the average score of the attempts after it, so the label is
+never computed from the feature window.
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database import placeholder, read_chunks
+
+from .base import BasePreprocessor
+from .instrumentation import stage
+from .splitting import StudentGroupSplitter
+
+FEATURE_QUERY = """
+WITH response_stats AS (
+    SELECT attempt_id,
+           COUNT(*) AS responses,
+           SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct_responses,
+           AVG(time_taken_seconds) AS avg_response_seconds
+    FROM quiz_responses
+    GROUP BY attempt_id
+),
+ranked_attempts AS (
+    SELECT qa.*,
+           ROW_NUMBER() OVER (
+               PARTITION BY qa.user_id, qa.topic_id
+               ORDER BY qa.completed_at DESC, qa.attempt_id DESC
+           ) AS recency
+    FROM quiz_attempts qa
+    WHERE {filters}
+)
+SELECT a.user_id,
+       a.topic_id,
+       t.subject_id,
+       t.difficulty_level AS topic_difficulty,
+       COUNT(*) AS total_attempts,
+       AVG(a.score_percentage) AS avg_score,
+       AVG(a.score_percentage * a.score_percentage) AS mean_squared_score,
+       MIN(a.score_percentage) AS min_score,
+       MAX(a.score_percentage) AS max_score,
+       MAX(CASE WHEN a.recency = 1 THEN a.score_percentage END) AS last_score,
+       SUM(a.total_questions) AS questions_answered,
+       SUM(a.correct_answers) AS correct_answers,
+       SUM(a.time_taken_seconds) AS total_time_seconds,
+       SUM(r.responses) AS responses,
+       SUM(r.correct_responses) AS correct_responses,
+       AVG(r.avg_response_seconds) AS avg_response_seconds,
+       COUNT(r.attempt_id) AS response_attempts,
+       MIN(a.completed_at) AS first_attempt_date,
+       MAX(a.completed_at) AS last_attempt_date,
+       MAX(a.attempt_id) AS last_attempt_id
+FROM ranked_attempts a
+JOIN topics t ON t.topic_id = a.topic_id
+LEFT JOIN response_stats r ON r.attempt_id = a.attempt_id
+GROUP BY a.user_id, a.topic_id, t.subject_id, t.difficulty_level
+ORDER BY a.user_id, a.topic_id
+"""
+
+LABEL_QUERY = """
+SELECT user_id,
+       topic_id,
+       AVG(score_percentage) AS future_avg_score,
+       COUNT(*) AS future_attempts
+FROM quiz_attempts
+WHERE completed_at >= {marker} AND completed_at < {marker}
+GROUP BY user_id, topic_id
+"""
+
+# Columns returned by FEATURE_QUERY
+AGGREGATE_COLUMNS = [
+    'user_id', 'topic_id', 'subject_id', 'topic_difficulty', 'total_attempts',
+    'avg_score', 'mean_squared_score', 'min_score', 'max_score', 'last_score',
+    'questions_answered', 'correct_answers', 'total_time_seconds', 'responses',
+    'correct_responses', 'avg_response_seconds', 'response_attempts',
+    'first_attempt_date', 'last_attempt_date', 'last_attempt_id'
+]
+
+# Model inputs produced by feature_engineering
+QUIZ_FEATURES = [
+    'total_attempts', 'avg_score', 'score_std', 'min_score', 'max_score',
+    'last_score', 'score_trend', 'accuracy', 'response_accuracy',
+    'seconds_per_question', 'avg_response_seconds', 'days_since_last_attempt',
+    'attempts_per_week', 'topic_difficulty'
+]
+
+DIFFICULTY_ORDER = {'EASY': 0, 'MEDIUM': 1, 'HARD': 2}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def engineer_features(df: pd.DataFrame, as_of: datetime) -> pd.DataFrame:
+    """
+    Model features from the per-(user, topic) aggregates of FEATURE_QUERY
+
+    Shared by QuizPreprocessor and the incremental scorer, which builds the
+    same aggregate columns from running statistics.
+    """
+    numeric = [
+        'avg_score', 'mean_squared_score', 'min_score', 'max_score', 'last_score',
+        'questions_answered', 'correct_answers', 'total_time_seconds',
+        'responses', 'correct_responses', 'avg_response_seconds'
+    ]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors='coerce')
+
+    # Population variance from the running sums the query returns
+    df['score_std'] = np.sqrt((df['mean_squared_score'] - df['avg_score'] ** 2).clip(lower=0))
+    df['score_trend'] = df['last_score'] - df['avg_score']
+
+    questions = df['questions_answered'].replace(0, np.nan)
+    df['accuracy'] = df['correct_answers'] / questions
+    df['seconds_per_question'] = df['total_time_seconds'] / questions
+    # Attempts without recorded responses fall back to the attempt totals
+    df['response_accuracy'] = (df['correct_responses'] / df['responses'].replace(0, np.nan)).fillna(df['accuracy'])
+    df['avg_response_seconds'] = df['avg_response_seconds'].fillna(df['seconds_per_question'])
+
+    first = pd.to_datetime(df['first_attempt_date'])
+    last = pd.to_datetime(df['last_attempt_date'])
+    df['last_attempt_date'] = last
+    df['days_since_last_attempt'] = (pd.Timestamp(as_of) - last).dt.total_seconds() / 86400
+    active_weeks = ((last - first).dt.total_seconds() / (7 * 86400)).clip(lower=1)
+    df['attempts_per_week'] = df['total_attempts'] / active_weeks
+
+    df['topic_difficulty'] = df['topic_difficulty'].map(DIFFICULTY_ORDER).fillna(DIFFICULTY_ORDER['MEDIUM'])
+
+    return df.drop(columns=['mean_squared_score', 'questions_answered', 'correct_answers',
+                            'total_time_seconds', 'responses', 'correct_responses',
+                            'response_attempts', 'first_attempt_date'])
+
+
+class QuizPreprocessor(BasePreprocessor):
+    def __init__(self, connection, cutoff: Optional[datetime] = None,
+                 label_window_days: int = 28, chunk_size: int = 10000):
+        """
+        Initialize quiz preprocessor
+
+        Args:
+            connection: DB-API connection to the platform database (MySQL or
+                the SQLite stand-in)
+            cutoff: end of the feature window for training; defaults to
+                label_window_days before the latest completed attempt
+            label_window_days: length of the window the target is averaged over
+            chunk_size: rows per fetch when reading query results
+        """
+        super().__init__("QUIZ")
+        self.connection = connection
+        self.cutoff = cutoff
+        self.label_window_days = label_window_days
+        self.chunk_size = chunk_size
+
+    def _read(self, query: str, params: Tuple) -> Iterator[pd.DataFrame]:
+        """Chunked read of a query written with {marker} parameter placeholders"""
+        return read_chunks(self.connection, query.format(marker=placeholder(self.connection)),
+                           params, self.chunk_size)
+
+    def _read_all(self, query: str, params: Tuple, columns) -> pd.DataFrame:
+        chunks = list(self._read(query, params))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def latest_attempt_time(self) -> Optional[datetime]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT MAX(completed_at) FROM quiz_attempts")
+            latest = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        return None if latest is None else pd.Timestamp(latest).to_pydatetime()
+
+    def iter_features(self, as_of: Optional[datetime] = None,
+                      after: Optional[Tuple[int, int]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Engineered features of every (user, topic) with attempts before as_of
+
+        Yields one DataFrame per chunk of chunk_size (user, topic) rows, so the
+        nightly scorer can stream the whole population in bounded memory.
+        Rows come in (user_id, topic_id) order; `after` starts past that key,
+        which lets an interrupted run resume without recomputing earlier rows.
+        """
+        as_of = as_of or datetime.now()
+        filters = 'qa.completed_at < {marker}'
+        params: Tuple = (as_of.strftime(TIMESTAMP_FORMAT),)
+        if after is not None:
+            filters += ' AND (qa.user_id > {marker} OR (qa.user_id = {marker} AND qa.topic_id > {marker}))'
+            params += (int(after[0]), int(after[0]), int(after[1]))
+        query = FEATURE_QUERY.format(filters=filters, marker='{marker}')
+        for chunk in self._read(query, params):
+            yield self.feature_engineering(chunk, as_of)
+
+    def read_aggregates(self, user_ids: Sequence[int]) -> pd.DataFrame:
+        """Raw FEATURE_QUERY aggregates over all attempts of the given users"""
+        markers = ', '.join(['{marker}'] * len(user_ids))
+        query = FEATURE_QUERY.format(filters=f'qa.user_id IN ({markers})', marker='{marker}')
+        return self._read_all(query, tuple(int(user_id) for user_id in user_ids), AGGREGATE_COLUMNS)
+
+    def load_features(self, as_of: Optional[datetime] = None) -> pd.DataFrame:
+        chunks = list(self.iter_features(as_of))
+        if not chunks:
+            return pd.DataFrame(columns=['user_id', 'topic_id', 'subject_id', 'last_attempt_date', 'last_attempt_id']
+                                + QUIZ_FEATURES)
+        return pd.concat(chunks, ignore_index=True)
+
+    def load_data(self) -> pd.DataFrame:
+        """Features before the cutoff joined with the target window after it"""
+        if self.cutoff is None:
+            latest = self.latest_attempt_time()
+            if latest is None:
+                raise ValueError("quiz_attempts is empty; nothing to preprocess")
+            self.cutoff = latest - timedelta(days=self.label_window_days)
+        label_end = self.cutoff + timedelta(days=self.label_window_days)
+        self.logger.info(f"Loading quiz features before {self.cutoff} and targets until {label_end}...")
+
+        features = self.load_features(self.cutoff)
+        window = (self.cutoff.strftime(TIMESTAMP_FORMAT), label_end.strftime(TIMESTAMP_FORMAT))
+        labels = self._read_all(LABEL_QUERY, window,
+                                ['user_id', 'topic_id', 'future_avg_score', 'future_attempts'])
+
+        # Only pairs practised in both windows have a target
+        self.raw_data = features.merge(labels, on=['user_id', 'topic_id'], how='inner')
+        self.report['original_shape'] = self.raw_data.shape
+        self.report['features_before'] = self.raw_data.columns.tolist()
+        self.report['cutoff'] = self.cutoff.strftime(TIMESTAMP_FORMAT)
+        self.report['label_window_days'] = self.label_window_days
+
+        return self.raw_data
+
+    @stage
+    def feature_engineering(self, df: pd.DataFrame, as_of: datetime) -> pd.DataFrame:
+        """Derived per-(user, topic) features from the SQL aggregates"""
+        return engineer_features(df, as_of)
+
+    def preprocess(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Build the temporal quiz training set"""
+
+        # Step 1: Load features and targets (aggregated in the database)
+        df = self.load_data()
+
+        # Step 2: Handle missing values
+        df = self.handle_missing_values(df)
+
+        # Step 3: Target from the post-cutoff window, same half-open bands as UpdateWeaknessAnalysis
+        df = self.create_weakness_level(df, 'future_avg_score', right=False)
+        df = df.drop(columns=['future_avg_score', 'future_attempts'])
+
+        # Step 4: Student-level split; a user's topics never span train and test
+        splitter = StudentGroupSplitter(df['user_id'], df['weakness_level'])
+        train_idx, test_idx = splitter.train_test_split(test_size=0.2, random_state=42)
+        train_df = df.iloc[train_idx].copy()
+        test_df = df.iloc[test_idx].copy()
+
+        self.logger.info(f"Train set: {len(train_df)} samples")
+        self.logger.info(f"Test set: {len(test_df)} samples")
+
+        # Step 5: Scale features
+        train_df, test_df = self.scale_features(train_df, test_df, QUIZ_FEATURES)
+
+        # Update report
+        self.report['final_shape'] = df.shape
+        self.report['features_after'] = QUIZ_FEATURES
+        self.report['class_distribution'] = {
+            'train': train_df['weakness_level'].value_counts().to_dict(),
+            'test': test_df['weakness_level'].value_counts().to_dict()
+        }
+
+        # Save processed data and report (model inputs and target only)
+        columns = QUIZ_FEATURES + ['weakness_level']
+        train_df, test_df = train_df[columns], test_df[columns]
+        self.save_data(train_df, test_df)
+        self.save_report()
+
+        return train_df, test_df
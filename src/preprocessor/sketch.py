@@ -0,0 +1,124 @@
+"""
+Mergeable quantile sketch (KLL) for cohort-relative percentile ranks
+
+A sketch is built per ranked column during preprocessing and saved with the
+processed data, so an incoming student can be ranked against the training
+cohort with a binary search instead of re-sorting the whole cohort. Sketches
+built on separate batches can be merged.
+"""
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class QuantileSketch:
+    """KLL sketch: compactor levels where an item at level h stands for 2**h values"""
+
+    def __init__(self, k: int = 256, seed: Optional[int] = 42):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._compiled = None
+
+    def _capacity(self, level: int) -> int:
+        # Lower levels shrink geometrically (factor 2/3) relative to the top level
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                # An odd item out stays behind so total weight is preserved
+                leftover, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = leftover
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+        self._compiled = None
+
+    def update(self, values) -> 'QuantileSketch':
+        """Add a batch of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.n += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold another sketch (e.g. from an incremental batch) into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compile(self):
+        """Flatten levels into sorted items with cumulative weights for lookups"""
+        if self._compiled is None:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([
+                np.full(len(level_items), 2.0 ** level)
+                for level, level_items in enumerate(self.levels)
+            ])
+            order = np.argsort(items, kind='stable')
+            cumulative = np.concatenate([[0.0], np.cumsum(weights[order])])
+            self._compiled = (items[order], cumulative)
+        return self._compiled
+
+    def rank(self, values) -> np.ndarray:
+        """
+        Percentile rank in (0, 1] of each value, O(log k) per value
+
+        Ties get the average rank, matching `Series.rank(pct=True)` exactly while
+        the cohort still fits in the sketch. NaN inputs give NaN.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.n == 0:
+            return np.full(values.shape, np.nan)
+
+        items, cumulative = self._compile()
+        less = cumulative[np.searchsorted(items, values, side='left')]
+        less_equal = cumulative[np.searchsorted(items, values, side='right')]
+        ranks = (less + less_equal + 1) / (2 * self.n)
+        return np.where(np.isnan(values), np.nan, np.minimum(ranks, 1.0))
+
+    def quantile(self, q) -> np.ndarray:
+        """Approximate value at quantile(s) q"""
+        items, cumulative = self._compile()
+        targets = np.asarray(q, dtype=np.float64) * cumulative[-1]
+        positions = np.searchsorted(cumulative[1:], targets, side='left')
+        return items[np.minimum(positions, len(items) - 1)]
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'n': self.n, 'levels': [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> 'QuantileSketch':
+        sketch = cls(k=payload['k'])
+        sketch.n = payload['n']
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in payload['levels']]
+        return sketch
+
+
+def save_sketches(sketches: Dict[str, QuantileSketch], path: Path):
+    """Save a column -> sketch mapping as JSON"""
+    with open(path, 'w') as f:
+        json.dump({column: sketch.to_dict() for column, sketch in sketches.items()}, f)
+
+
+def load_sketches(path: Path) -> Dict[str, QuantileSketch]:
+    """Load sketches saved by save_sketches()"""
+    with open(path) as f:
+        payload = json.load(f)
+    return {column: QuantileSketch.from_dict(entry) for column, entry in payload.items()}
@@ -0,0 +1,79 @@
+"""
+Student-level (group-aware) splitting shared by all preprocessors
+
+Frames with several rows per student must never put the same student in both
+train and test. The splitter sorts by student id once, keeps offset arrays for
+each student's row range and returns integer row indices, so callers can use
+`df.iloc[idx]` (or pass the folds as `cv=` to scikit-learn) without copying the
+frame to build the split.
+"""
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
+
+
+class StudentGroupSplitter:
+    """Train/test and K-fold splits that keep each student's rows together"""
+
+    def __init__(self, student_ids, labels=None):
+        student_ids = np.asarray(student_ids)
+
+        # One stable sort; each student's rows become a contiguous range
+        self.order = np.argsort(student_ids, kind='stable')
+        sorted_ids = student_ids[self.order]
+        boundaries = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+        self.offsets = np.concatenate([[0], boundaries, [len(sorted_ids)]])
+        self.students = sorted_ids[self.offsets[:-1]]
+
+        # Label of each student's first row, used for stratification
+        self.group_labels: Optional[np.ndarray] = None
+        if labels is not None:
+            self.group_labels = np.asarray(labels)[self.order][self.offsets[:-1]]
+
+    @property
+    def n_students(self) -> int:
+        return len(self.students)
+
+    def rows_for(self, groups: np.ndarray) -> np.ndarray:
+        """Row indices (in original frame order) of the given student positions"""
+        groups = np.asarray(groups, dtype=np.int64)
+        starts = self.offsets[groups]
+        lengths = self.offsets[groups + 1] - starts
+
+        # Expand [start, start + length) ranges without a Python loop
+        ends = np.cumsum(lengths)
+        positions = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        return np.sort(self.order[positions])
+
+    def _stratify_labels(self, stratify: bool) -> Optional[np.ndarray]:
+        if stratify and self.group_labels is None:
+            raise ValueError("Stratified split requested but no labels were given")
+        return self.group_labels if stratify else None
+
+    def train_test_split(self, test_size: float = 0.2, random_state: int = 42,
+                         stratify: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Split students (not rows) into train/test and return row indices for each"""
+        train_groups, test_groups = train_test_split(
+            np.arange(self.n_students),
+            test_size=test_size,
+            random_state=random_state,
+            stratify=self._stratify_labels(stratify)
+        )
+        return self.rows_for(train_groups), self.rows_for(test_groups)
+
+    def kfold(self, n_splits: int = 5, random_state: int = 42,
+              stratify: bool = True) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (train_idx, test_idx) row indices for K (stratified) student folds"""
+        labels = self._stratify_labels(stratify)
+        groups = np.arange(self.n_students)
+
+        if labels is not None:
+            folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+            splits = folds.split(groups, labels)
+        else:
+            folds = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+            splits = folds.split(groups)
+
+        for train_groups, test_groups in splits:
+            yield self.rows_for(train_groups), self.rows_for(test_groups)
@@ -0,0 +1,175 @@
+"""
+Opt-in profiling for training and preprocessing entry points
+
+Decorate an entry point with `@profiled('train_models')`; it runs unchanged
+unless profiling is switched on with LEARNMATE_PROFILE=1 or a `--profile`
+command-line flag. When on, each run writes to reports/profiles/:
+
+    <name>_<timestamp>.prof            cProfile stats of the main process
+    <name>_<timestamp>.collapsed       sampled stacks of all threads, ready for
+                                       flamegraph.pl or speedscope
+    <name>_<timestamp>_workers.prof    merged cProfile stats of joblib workers
+    <name>_<timestamp>_top30.txt       top 30 functions by cumulative time
+
+Joblib process workers (n_jobs=-1 with the loky backend) are profiled through
+the backend's worker initializer: each worker runs under cProfile from start-up
+and dumps its stats when it exits; the parent shuts the workers down and merges
+the stats when the entry point returns.
+"""
+import cProfile
+import io
+import logging
+import multiprocessing.util
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+from joblib import parallel_config
+from joblib.externals.loky import get_reusable_executor
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV_VAR = 'LEARNMATE_PROFILE'
+INTERVAL_ENV_VAR = 'LEARNMATE_PROFILE_INTERVAL'
+PROFILE_FLAG = '--profile'
+PROFILES_DIR = Path(__file__).resolve().parent.parent / 'reports' / 'profiles'
+
+
+def profiling_requested() -> bool:
+    """True if the --profile flag was passed (the flag is consumed) or the env var is set"""
+    if PROFILE_FLAG in sys.argv:
+        sys.argv.remove(PROFILE_FLAG)
+        return True
+    return os.environ.get(PROFILE_ENV_VAR, '').lower() not in ('', '0', 'false', 'no')
+
+
+class StackSampler:
+    """Low-overhead sampling profiler: a daemon thread that records every thread's stack"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='StackSampler', daemon=True)
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def save_collapsed(self, path: Path):
+        """Write stacks in the collapsed ('folded') format: 'root;...;leaf count' per line"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _dump_worker_profile(profiler: cProfile.Profile, output_dir: str):
+    profiler.disable()
+    profiler.dump_stats(os.path.join(output_dir, f"{os.getpid()}-{uuid.uuid4().hex}.prof"))
+
+
+def _start_worker_profile(output_dir: str):
+    """Loky worker initializer: profile the worker until it exits"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    # Workers leave through multiprocessing's exit path, which runs finalizers but not atexit
+    multiprocessing.util.Finalize(None, _dump_worker_profile, args=(profiler, output_dir), exitpriority=10)
+
+
+def _merge_worker_profiles(worker_dir: Path, output_path: Path) -> bool:
+    files = sorted(str(path) for path in worker_dir.glob('*.prof'))
+    if not files:
+        return False
+    pstats.Stats(*files).dump_stats(output_path)
+    for file in files:
+        os.remove(file)
+    worker_dir.rmdir()
+    return True
+
+
+def _top_functions(profile_paths, limit: int = 30) -> str:
+    stream = io.StringIO()
+    for path in profile_paths:
+        stream.write(f"==== {path.name} ====\n")
+        pstats.Stats(str(path), stream=stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+def run_profiled(func, name: str, *args, **kwargs):
+    """Run func under cProfile and the stack sampler and write the profile files"""
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    prefix = PROFILES_DIR / f"{name}_{time.strftime('%Y%m%d_%H%M%S')}"
+    worker_dir = Path(f"{prefix}_workers")
+    worker_dir.mkdir(exist_ok=True)
+
+    # Start n_jobs process pools with profiled workers
+    worker_config = parallel_config(backend='loky', initializer=_start_worker_profile,
+                                    initargs=(str(worker_dir),))
+
+    sampler = StackSampler(float(os.environ.get(INTERVAL_ENV_VAR, 0.005)))
+    profiler = cProfile.Profile()
+    logger.info(f"Profiling {name}; output prefix {prefix}")
+
+    sampler.start()
+    profiler.enable()
+    try:
+        with worker_config:
+            return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        sampler.stop()
+        # Workers dump their stats on exit
+        get_reusable_executor().shutdown(wait=True)
+
+        profile_paths = [Path(f"{prefix}.prof")]
+        profiler.dump_stats(profile_paths[0])
+        sampler.save_collapsed(Path(f"{prefix}.collapsed"))
+        if _merge_worker_profiles(worker_dir, Path(f"{prefix}_workers.prof")):
+            profile_paths.append(Path(f"{prefix}_workers.prof"))
+        else:
+            worker_dir.rmdir()
+
+        summary_path = Path(f"{prefix}_top30.txt")
+        with open(summary_path, 'w') as f:
+            f.write(_top_functions(profile_paths))
+        logger.info(f"Saved profiles to {PROFILES_DIR} (summary: {summary_path.name})")
+
+
+def profiled(name: str):
+    """Decorator for entry points: profile the call when profiling is requested"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiling_requested():
+                return func(*args, **kwargs)
+            return run_profiled(func, name, *args, **kwargs)
+        return wrapper
+    return decorator
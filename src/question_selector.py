@@ -0,0 +1,304 @@
+"""
+Adaptive question selection for quizzes
+
+QuestionIndex loads the active question bank (with options) once, into one
+shuffled array of question ids per (topic, difficulty). To start a quiz it:
+
+1. turns the student's estimate for the topic into a difficulty mix
+   (DIFFICULTY_MIX), or uses the difficulty picked on the slider. The
+   estimate is looked up server-side: the traced BKT mastery in [0, 1] when
+   a KnowledgeTracer is attached and has seen the student answer the topic,
+   else the strength level of the student's weakness_analysis row. A caller
+   can still pass an estimate to override it;
+2. takes a window of candidates starting at a random position in each
+   partition, drops recently seen ones with the student's bloom filter, and
+   keeps the first n; work depends on the quiz length, not the bank size;
+3. records the chosen questions in the filter.
+
+RecentQuestions keeps two bloom filters per user (current and previous
+generation); the current one is retired after `capacity` insertions, so
+"recent" means roughly the last capacity to 2 x capacity questions and
+memory per user is fixed.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from database import placeholder
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('EASY', 'MEDIUM', 'HARD')
+
+# Share of EASY, MEDIUM, HARD questions by strength level
+DIFFICULTY_MIX = {
+    'WEAK': (0.6, 0.3, 0.1),
+    'MODERATE': (0.2, 0.6, 0.2),
+    'STRONG': (0.1, 0.3, 0.6)
+}
+
+# Same bands as the UpdateWeaknessAnalysis procedure, on a 0-1 scale
+MASTERY_BANDS = (0.6, 0.8)
+
+QUESTION_COLUMNS = ['question_id', 'topic_id', 'question_text', 'question_type',
+                    'difficulty_level', 'correct_answer', 'explanation']
+
+SIGNATURE_QUERY = "SELECT COUNT(*), MAX(question_id), MAX(updated_at), SUM(is_active) FROM questions"
+
+ESTIMATE_QUERY = "SELECT strength_level FROM weakness_analysis WHERE user_id = {marker} AND topic_id = {marker}"
+
+# Multiply-add hash family for the bloom filters (P is the Mersenne prime 2^31 - 1)
+_P = np.uint64(2 ** 31 - 1)
+_HASH_A = np.array([1103515245, 1664525, 22695477, 134775813, 214013, 2531011, 69069, 1140671485], dtype=np.uint64)
+_HASH_B = np.array([12345, 1013904223, 1, 1, 2531011, 12820163, 1, 12820163], dtype=np.uint64)
+
+
+def strength_level(estimate: Union[str, float, None]) -> str:
+    """Strength level from a level name or a mastery in [0, 1] (MODERATE if unknown)"""
+    if estimate is None:
+        return 'MODERATE'
+    if isinstance(estimate, str):
+        level = estimate.upper()
+        if level not in DIFFICULTY_MIX:
+            raise ValueError(f"Unknown strength level: {estimate}")
+        return level
+    mastery = float(estimate)
+    if mastery < MASTERY_BANDS[0]:
+        return 'WEAK'
+    return 'MODERATE' if mastery < MASTERY_BANDS[1] else 'STRONG'
+
+
+def difficulty_counts(level: str, count: int) -> np.ndarray:
+    """Questions per difficulty (EASY, MEDIUM, HARD) for a quiz of `count` questions"""
+    shares = np.asarray(DIFFICULTY_MIX[level]) * count
+    counts = np.floor(shares).astype(int)
+    # Largest remainders get the questions lost to rounding
+    counts[np.argsort(counts - shares, kind='stable')[:count - counts.sum()]] += 1
+    return counts
+
+
+class RecentQuestions:
+    """Per-user bloom filters of recently served question ids"""
+
+    def __init__(self, bits: int = 2048, hashes: int = 4, capacity: int = 200, max_users: int = 100000):
+        """
+        Args:
+            bits: bits per filter (two filters per user)
+            hashes: hash functions per id (at most 8)
+            capacity: insertions before a filter generation is retired
+            max_users: users kept; the least recently active are forgotten
+        """
+        if hashes > len(_HASH_A):
+            raise ValueError(f"At most {len(_HASH_A)} hash functions are available")
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.max_users = max_users
+        # user_id -> [current bits, previous bits, insertions into current]
+        self._filters: 'OrderedDict[int, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _positions(self, question_ids: np.ndarray) -> np.ndarray:
+        """(hashes, n) bit positions of the ids"""
+        ids = np.asarray(question_ids, dtype=np.uint64)
+        return ((ids[None, :] * _HASH_A[:self.hashes, None] + _HASH_B[:self.hashes, None]) % _P
+                % np.uint64(self.bits)).astype(np.int64)
+
+    @staticmethod
+    def _contains(filter_bits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        return ((filter_bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=0).astype(bool)
+
+    def seen(self, user_id: int, question_ids: np.ndarray) -> np.ndarray:
+        """Boolean mask of ids the user was (probably) served recently"""
+        with self._lock:
+            state = self._filters.get(int(user_id))
+            if state is None or not len(question_ids):
+                return np.zeros(len(question_ids), dtype=bool)
+            positions = self._positions(question_ids)
+            return self._contains(state[0], positions) | self._contains(state[1], positions)
+
+    def add(self, user_id: int, question_ids: Sequence[int]):
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        if not len(question_ids):
+            return
+        positions = self._positions(question_ids).ravel()
+        with self._lock:
+            state = self._filters.get(int(user_id))
+            if state is None:
+                empty = np.zeros(self.bits // 8, dtype=np.uint8)
+                state = self._filters[int(user_id)] = [empty, empty.copy(), 0]
+            self._filters.move_to_end(int(user_id))
+            if state[2] + len(question_ids) > self.capacity:
+                state[0], state[1], state[2] = np.zeros_like(state[0]), state[0], 0
+            np.bitwise_or.at(state[0], positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+            state[2] += len(question_ids)
+            while len(self._filters) > self.max_users:
+                self._filters.popitem(last=False)
+
+
+class QuestionIndex:
+    """In-memory question bank partitioned by (topic, difficulty)"""
+
+    def __init__(self, connection, recent: Optional[RecentQuestions] = None,
+                 refresh_interval: Optional[float] = 300, oversample: int = 4, seed: Optional[int] = None,
+                 tracer=None):
+        """
+        Args:
+            connection: DB-API connection to the platform database
+            recent: recently-served filter (a new one if None)
+            refresh_interval: seconds between checks for changed questions (None disables them)
+            oversample: candidates examined per wanted question before falling
+                back to a full scan of the partition
+            seed: random seed, for reproducible selection
+            tracer: KnowledgeTracer whose mastery is preferred to the
+                weakness_analysis strength level (see knowledge_tracing.py)
+        """
+        self.connection = connection
+        self.tracer = tracer
+        self.recent = recent or RecentQuestions()
+        self.refresh_interval = refresh_interval
+        self.oversample = oversample
+        self.questions: Dict[int, Dict] = {}
+        self.partitions: Dict[Tuple[int, str], np.ndarray] = {}
+        self.refreshed_at = 0.0
+        self._signature = None
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _query(self, query: str, params: Sequence = ()) -> List[Tuple]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def refresh(self) -> bool:
+        """Reload the bank if any question changed; returns whether it was reloaded"""
+        with self._lock:
+            signature = tuple(self._query(SIGNATURE_QUERY)[0])
+            self.refreshed_at = time.monotonic()
+            if signature == self._signature:
+                return False
+
+            questions = {}
+            for row in self._query(f"SELECT {', '.join(QUESTION_COLUMNS)} FROM questions WHERE is_active"):
+                question = dict(zip(QUESTION_COLUMNS, row))
+                question['options'] = []
+                questions[question['question_id']] = question
+            for question_id, label, text, is_correct in self._query(
+                    "SELECT question_id, option_label, option_text, is_correct "
+                    "FROM question_options ORDER BY question_id, option_label"):
+                if question_id in questions:
+                    questions[question_id]['options'].append(
+                        {'option_label': label, 'option_text': text, 'is_correct': bool(is_correct)})
+
+            grouped: Dict[Tuple[int, str], List[int]] = {}
+            for question in questions.values():
+                key = (int(question['topic_id']), str(question['difficulty_level'] or 'MEDIUM').upper())
+                grouped.setdefault(key, []).append(question['question_id'])
+            # Shuffled once, so a random window of a partition is a random sample
+            self.partitions = {key: self._rng.permutation(np.asarray(ids, dtype=np.int64))
+                               for key, ids in grouped.items()}
+            self.questions = questions
+            self._signature = signature
+
+        logger.info(f"Question index: {len(questions)} questions in {len(self.partitions)} partitions")
+        return True
+
+    def maybe_refresh(self):
+        if self.refresh_interval is not None and time.monotonic() - self.refreshed_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current bank
+                logger.error(f"Error refreshing question index: {str(e)}")
+
+    def student_estimate(self, user_id: int, topic_id: int) -> Union[str, float, None]:
+        """The student's traced mastery of the topic, else their weakness_analysis level (None if neither)"""
+        if self.tracer is not None:
+            column = int(self.tracer.columns(np.array([topic_id]))[0])
+            if column >= 0:
+                mastery = float(self.tracer.mastery_matrix([user_id])[0, column])
+                if mastery == mastery:
+                    return mastery
+        try:
+            with self._lock:
+                rows = self._query(ESTIMATE_QUERY.format(marker=placeholder(self.connection)),
+                                   (int(user_id), int(topic_id)))
+        except Exception as e:
+            # Select with the default mix rather than fail the quiz
+            logger.error(f"Error reading weakness_analysis for user {user_id}: {str(e)}")
+            return None
+        return rows[0][0] if rows else None
+
+    def _take(self, user_id: int, partition: np.ndarray, count: int, exclude: set) -> List[int]:
+        """Up to count unseen ids from a random window of the partition"""
+        if count <= 0 or not len(partition):
+            return []
+        window = min(len(partition), count * self.oversample)
+        start = int(self._rng.integers(len(partition)))
+        candidates = np.take(partition, np.arange(start, start + window), mode='wrap')
+        chosen = [question_id for question_id in candidates[~self.recent.seen(user_id, candidates)].tolist()
+                  if question_id not in exclude][:count]
+        if len(chosen) < count and window < len(partition):
+            # The window was mostly seen; scan the rest of the partition
+            rest = np.take(partition, np.arange(start + window, start + len(partition)), mode='wrap')
+            chosen += [question_id for question_id in rest[~self.recent.seen(user_id, rest)].tolist()
+                       if question_id not in exclude][:count - len(chosen)]
+        return chosen
+
+    def select(self, user_id: int, topic_id: int, count: int = 10,
+               estimate: Union[str, float, None] = None, difficulty: Optional[str] = None) -> List[Dict]:
+        """
+        Next quiz for a student
+
+        Args:
+            user_id: student
+            topic_id: quiz topic
+            count: questions wanted
+            estimate: mastery of the topic in [0, 1] or strength level
+                (WEAK/MODERATE/STRONG) overriding the student's stored estimate
+                (student_estimate); sets the difficulty mix
+            difficulty: EASY/MEDIUM/HARD from the slider; overrides the mix
+
+        Returns:
+            Question dicts with their options. Recently seen questions are only
+            repeated when the topic has too few unseen ones.
+        """
+        self.maybe_refresh()
+        partitions, questions = self.partitions, self.questions
+        if difficulty is not None:
+            difficulty = difficulty.upper()
+            if difficulty not in DIFFICULTIES:
+                raise ValueError(f"Unknown difficulty: {difficulty}")
+            wanted = np.array([count if level == difficulty else 0 for level in DIFFICULTIES])
+        else:
+            if estimate is None:
+                estimate = self.student_estimate(user_id, topic_id)
+            wanted = difficulty_counts(strength_level(estimate), count)
+
+        chosen: List[int] = []
+        for level, n in zip(DIFFICULTIES, wanted):
+            chosen += self._take(user_id, partitions.get((topic_id, level), np.empty(0, np.int64)), n, set(chosen))
+
+        # Short difficulties fall back to the nearest others, then to seen questions
+        if len(chosen) < count:
+            target = DIFFICULTIES.index(difficulty) if difficulty else int(np.argmax(wanted))
+            for level in sorted(DIFFICULTIES, key=lambda level: abs(DIFFICULTIES.index(level) - target)):
+                chosen += self._take(user_id, partitions.get((topic_id, level), np.empty(0, np.int64)),
+                                     count - len(chosen), set(chosen))
+        if len(chosen) < count:
+            for level in DIFFICULTIES:
+                taken = set(chosen)
+                partition = partitions.get((topic_id, level), np.empty(0, np.int64))
+                chosen += [question_id for question_id in partition.tolist()
+                           if question_id not in taken][:count - len(chosen)]
+
+        self.recent.add(user_id, chosen)
+        return [questions[question_id] for question_id in chosen]
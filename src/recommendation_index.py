@@ -0,0 +1,222 @@
+"""
+In-memory index of learning_resources for recommendations
+
+The index holds, for every (topic, strength level), the top RESOURCE_SLOTS
+active resources, precomputed when it is built:
+
+- resources whose difficulty matches the level come first (WEAK -> BEGINNER,
+  MODERATE -> INTERMEDIATE, STRONG -> ADVANCED), then the nearest other
+  difficulties;
+- within a difficulty, higher relevance_score comes first.
+
+The slots are one int64 array of shape (topics, 3, RESOURCE_SLOTS). A batch of
+(topic, level) lookups is a single fancy-indexing operation, whose cost does not
+depend on how many resources the table holds.
+
+refresh() reads the served columns of learning_resources (not the
+descriptions) and hashes each topic's rows. It re-ranks only the topics
+whose hash changed, so an edited difficulty, title or url, or a resource
+swapped for another, is picked up while unchanged topics keep their slots.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Resources kept per (topic, strength level); lookups can ask for up to this many
+RESOURCE_SLOTS = 10
+
+STRENGTH_CODES = {'WEAK': 0, 'MODERATE': 1, 'STRONG': 2}
+RESOURCE_DIFFICULTY_CODES = {'BEGINNER': 0, 'INTERMEDIATE': 1, 'ADVANCED': 2}
+
+RESOURCE_COLUMNS = ['resource_id', 'topic_id', 'resource_type', 'title', 'url',
+                    'difficulty_level', 'duration_minutes', 'relevance_score']
+
+RESOURCE_QUERY = (f"SELECT {', '.join(RESOURCE_COLUMNS)}, is_active FROM learning_resources "
+                  f"ORDER BY topic_id, resource_id")
+
+
+def strength_code(level: Union[str, int]) -> int:
+    """Index of a strength level: 'WEAK'/'weak'/0, 'MODERATE'/1, 'STRONG'/2"""
+    if isinstance(level, (int, np.integer)):
+        if not 0 <= level <= 2:
+            raise ValueError(f"Unknown strength level: {level}")
+        return int(level)
+    try:
+        return STRENGTH_CODES[str(level).upper()]
+    except KeyError:
+        raise ValueError(f"Unknown strength level: {level}")
+
+
+def rank_topic_resources(resources: List[Dict], slots: int = RESOURCE_SLOTS) -> np.ndarray:
+    """Resource ids of one topic ranked for each strength level, shape (3, slots), -1 padded"""
+    ranked = np.full((len(STRENGTH_CODES), slots), -1, dtype=np.int64)
+    if not resources:
+        return ranked
+
+    ids = np.array([resource['resource_id'] for resource in resources], dtype=np.int64)
+    relevance = np.array([float(resource['relevance_score'] or 0) for resource in resources])
+    difficulty = np.array([
+        RESOURCE_DIFFICULTY_CODES.get(resource['difficulty_level'], RESOURCE_DIFFICULTY_CODES['INTERMEDIATE'])
+        for resource in resources
+    ])
+    for level in range(len(STRENGTH_CODES)):
+        # lexsort sorts by the last key first: difficulty distance, then relevance, then id
+        order = np.lexsort((ids, -relevance, np.abs(difficulty - level)))[:slots]
+        ranked[level, :len(order)] = ids[order]
+    return ranked
+
+
+class RecommendationIndex:
+    """Top resources per (topic, strength level), refreshed incrementally from the database"""
+
+    def __init__(self, connection, slots: int = RESOURCE_SLOTS, refresh_interval: Optional[float] = 300):
+        """
+        Args:
+            connection: DB-API connection to the platform database
+            slots: resources precomputed per (topic, level)
+            refresh_interval: seconds after which maybe_refresh() re-checks the
+                table (None disables automatic refreshes)
+        """
+        self.connection = connection
+        self.slots = slots
+        self.refresh_interval = refresh_interval
+        self.resources: Dict[int, Dict] = {}
+        self.topic_names: Dict[str, int] = {}
+        self.refreshed_at = 0.0
+        self._topic_resources: Dict[int, List[int]] = {}
+        self._signatures: Dict[int, str] = {}
+        # topic_id -> row of _slots (-1 for topics without resources)
+        self._rows = np.full(0, -1, dtype=np.int64)
+        self._slots = np.full((0, len(STRENGTH_CODES), slots), -1, dtype=np.int64)
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _query(self, query: str, params: Sequence = ()) -> List[Tuple]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def refresh(self) -> int:
+        """Re-rank the topics whose resources changed; returns how many were rebuilt"""
+        with self._lock:
+            topic_rows: Dict[int, List[Tuple]] = {}
+            for row in self._query(RESOURCE_QUERY):
+                topic_rows.setdefault(int(row[1]), []).append(row)
+            # Rows are in resource_id order, so equal content gives an equal hash
+            signatures = {topic_id: hashlib.sha1(repr(rows).encode()).hexdigest()
+                          for topic_id, rows in topic_rows.items()}
+            changed = sorted(topic_id for topic_id, signature in signatures.items()
+                             if self._signatures.get(topic_id) != signature)
+            removed = [topic_id for topic_id in self._signatures if topic_id not in signatures]
+            self.refreshed_at = time.monotonic()
+            if not changed and not removed:
+                return 0
+
+            for topic_id in changed + removed:
+                for resource_id in self._topic_resources.pop(topic_id, []):
+                    self.resources.pop(resource_id, None)
+
+            by_topic: Dict[int, List[Dict]] = {topic_id: [] for topic_id in changed}
+            for topic_id in changed:
+                for row in topic_rows[topic_id]:
+                    if not row[-1]:
+                        continue
+                    resource = dict(zip(RESOURCE_COLUMNS, row))
+                    resource['relevance_score'] = float(resource['relevance_score'] or 0)
+                    self.resources[resource['resource_id']] = resource
+                    by_topic[topic_id].append(resource)
+
+            # Build new arrays and swap them in, so a lookup never sees a half-updated index
+            size = max([len(self._rows) - 1, *signatures]) + 1
+            rows = np.full(size, -1, dtype=np.int64)
+            rows[:len(self._rows)] = self._rows
+            rows[removed] = -1
+            new_topics = [topic_id for topic_id in changed if rows[topic_id] < 0]
+            rows[new_topics] = np.arange(len(self._slots), len(self._slots) + len(new_topics))
+            slots = np.concatenate([
+                self._slots, np.full((len(new_topics), len(STRENGTH_CODES), self.slots), -1, dtype=np.int64)
+            ])
+            for topic_id in changed:
+                self._topic_resources[topic_id] = [resource['resource_id'] for resource in by_topic[topic_id]]
+                slots[rows[topic_id]] = rank_topic_resources(by_topic[topic_id], self.slots)
+
+            self._rows, self._slots = rows, slots
+            for topic_id in removed:
+                del self._signatures[topic_id]
+            self._signatures.update({topic_id: signatures[topic_id] for topic_id in changed})
+            self.topic_names = {str(name).lower(): int(topic_id)
+                                for topic_id, name in self._query("SELECT topic_id, topic_name FROM topics")}
+
+        logger.info(f"Recommendation index: re-ranked {len(changed)} topic(s), "
+                    f"{len(self.resources)} active resources")
+        return len(changed)
+
+    def maybe_refresh(self):
+        """Refresh if the last check is older than refresh_interval"""
+        if self.refresh_interval is not None and time.monotonic() - self.refreshed_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current index
+                logger.error(f"Error refreshing recommendation index: {str(e)}")
+
+    def topic_id(self, topic: Union[int, str]) -> Optional[int]:
+        """Topic id from an id, a topic name, or a 'topic_<name>' feature name"""
+        if isinstance(topic, (int, np.integer)):
+            return int(topic)
+        name = str(topic).lower()
+        if name in self.topic_names:
+            return self.topic_names[name]
+        if name.startswith('topic_'):
+            return self.topic_names.get(name[len('topic_'):].replace('_', ' '))
+        return None
+
+    def top_k(self, topic_ids: np.ndarray, levels: np.ndarray, k: int = 3) -> np.ndarray:
+        """
+        Vectorized lookup of the top k resource ids for many (topic, level) pairs
+
+        Args:
+            topic_ids: topic ids, -1 for unknown topics
+            levels: strength codes (see strength_code)
+            k: resources per pair, at most `slots`
+
+        Returns:
+            int64 array of shape (n, k); -1 where a topic has fewer resources
+        """
+        if k > self.slots:
+            raise ValueError(f"k={k} exceeds the {self.slots} precomputed slots")
+        rows_of, slots = self._rows, self._slots
+        topic_ids = np.asarray(topic_ids, dtype=np.int64)
+        if not len(rows_of) or not len(slots):
+            # No topic has resources yet
+            return np.full((len(topic_ids), k), -1, dtype=np.int64)
+        known = (topic_ids >= 0) & (topic_ids < len(rows_of))
+        rows = np.where(known, rows_of[np.where(known, topic_ids, 0)], -1)
+        result = slots[np.maximum(rows, 0), np.asarray(levels, dtype=np.int64), :k]
+        result[rows < 0] = -1
+        return result
+
+    def recommend_batch(self, requests: Sequence[Tuple[Union[int, str], Union[str, int]]],
+                        k: int = 3) -> List[List[Dict]]:
+        """Top k resources for each (topic, strength level) request, in one lookup"""
+        self.maybe_refresh()
+        if not requests:
+            return []
+        topic_ids = np.array([
+            -1 if topic_id is None else topic_id
+            for topic_id in (self.topic_id(topic) for topic, _ in requests)
+        ], dtype=np.int64)
+        levels = np.array([strength_code(level) for _, level in requests], dtype=np.int64)
+
+        resources = self.resources
+        return [[resources[resource_id] for resource_id in row if resource_id >= 0 and resource_id in resources]
+                for row in self.top_k(topic_ids, levels, k).tolist()]
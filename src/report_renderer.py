@@ -0,0 +1,107 @@
+"""
+Deferred, headless rendering of report figures
+
+Evaluation and analysis code queues a `PlotSpec` for each figure instead of
+drawing it inline: a module-level draw function, the output path and only the
+small arrays the figure needs (ROC points, a confusion matrix, bar heights).
+Once the metrics are final, `ReportRenderer.render()` draws every queued
+figure in a process pool. Draw functions receive a standalone matplotlib
+`Figure`, so no pyplot state or GUI backend is involved.
+
+Set LEARNMATE_SKIP_FIGURES=1 (or pass enabled=False) to skip rendering, e.g.
+in CI or production retrains.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKIP_ENV_VAR = 'LEARNMATE_SKIP_FIGURES'
+
+
+def figures_enabled() -> bool:
+    return os.environ.get(SKIP_ENV_VAR, '').lower() in ('', '0', 'false', 'no')
+
+
+class PlotSpec:
+    """Everything needed to draw one figure in another process"""
+
+    def __init__(self, draw: Callable[..., None], save_path, data: Dict[str, Any],
+                 figsize: Tuple[float, float] = (8, 6), style: Optional[str] = None,
+                 savefig_kwargs: Optional[Dict[str, Any]] = None):
+        self.draw = draw
+        self.save_path = Path(save_path)
+        self.data = data
+        self.figsize = figsize
+        self.style = style
+        self.savefig_kwargs = savefig_kwargs or {}
+
+
+def render_spec(spec: PlotSpec) -> Path:
+    """Draw and save one figure (runs in a worker process)"""
+    import matplotlib.style
+    from matplotlib.figure import Figure
+
+    style = nullcontext()
+    if spec.style is not None:
+        if spec.style in matplotlib.style.available:
+            style = matplotlib.style.context(spec.style)
+        else:
+            logger.warning(f"Unknown matplotlib style {spec.style!r}; using the default style")
+
+    with style:
+        fig = Figure(figsize=spec.figsize)
+        spec.draw(fig, **spec.data)
+        spec.save_path.parent.mkdir(parents=True, exist_ok=True)
+        fig.savefig(spec.save_path, **spec.savefig_kwargs)
+    return spec.save_path
+
+
+class ReportRenderer:
+    """Queue of figures rendered together once results are final"""
+
+    def __init__(self, max_workers: Optional[int] = None, enabled: Optional[bool] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.enabled = figures_enabled() if enabled is None else enabled
+        self.pending: List[PlotSpec] = []
+
+    def add(self, draw: Callable[..., None], save_path, figsize: Tuple[float, float] = (8, 6),
+            style: Optional[str] = None, savefig_kwargs: Optional[Dict[str, Any]] = None, **data):
+        """Queue a figure; data is passed to draw(fig, **data) when rendered"""
+        if self.enabled:
+            self.pending.append(PlotSpec(draw, save_path, data, figsize, style, savefig_kwargs))
+
+    def render(self) -> List[Path]:
+        """Render all queued figures and return the paths written"""
+        specs, self.pending = self.pending, []
+        if not specs:
+            return []
+
+        workers = min(self.max_workers, len(specs))
+        logger.info(f"Rendering {len(specs)} figure(s) with {workers} worker(s)...")
+
+        # A single figure (or worker) is not worth starting a pool for
+        if workers == 1:
+            return [path for path in map(self._render_safely, specs) if path is not None]
+
+        written = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_spec, spec): spec for spec in specs}
+            for future in as_completed(futures):
+                try:
+                    written.append(future.result())
+                except Exception as e:
+                    logger.error(f"Error rendering {futures[future].save_path}: {str(e)}")
+        return written
+
+    @staticmethod
+    def _render_safely(spec: PlotSpec) -> Optional[Path]:
+        try:
+            return render_spec(spec)
+        except Exception as e:
+            logger.error(f"Error rendering {spec.save_path}: {str(e)}")
+            return None
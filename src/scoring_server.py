@@ -0,0 +1,144 @@
+"""
+Flask scoring server for the weakness model
+
+Run from src/:
+    python scoring_server.py
+
+Endpoints:
+    GET  /health                      model status
+    POST /api/ml/predict-weakness     one student (JSON object) or a batch (JSON list)
+    POST /api/ml/next-questions       next quiz for a student from the in-memory question bank
+                                      (requires LEARNMATE_DB_URL; see question_selector.py)
+    POST /api/ml/attempt-completed    queue a saved quiz attempt for incremental re-scoring
+                                      (requires LEARNMATE_EVENT_QUEUE; see incremental_scoring.py)
+    GET  /metrics                     Prometheus text exposition of the prediction metrics
+"""
+import logging
+import os
+from pathlib import Path
+
+from flask import Flask, Response, jsonify, request
+
+from attempt_events import SQLiteEventQueue
+from database import DB_URL_ENV_VAR, connect
+from knowledge_tracing import KnowledgeTracer
+from metrics import CONTENT_TYPE, REGISTRY
+from model_registry import ModelRegistry
+from predict import WeaknessPredictor
+from shadow_scoring import ShadowScorer
+from question_selector import QuestionIndex
+from recommendation_index import RecommendationIndex
+from topic_mastery import TopicMastery, TopicVocabulary
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(os.environ.get('LEARNMATE_MODEL_DIR', Path(__file__).resolve().parent.parent / 'models'))
+# Topic vocabulary and weak-topic thresholds (see topic_mastery.py); without it or a
+# database the model's topic_* features are the vocabulary
+TOPIC_CONFIG = os.environ.get('LEARNMATE_TOPIC_CONFIG')
+# With a model registry (see model_registry.py) new CURRENT versions are swapped in while serving
+MODEL_REGISTRY = ModelRegistry(MODEL_DIR / 'registry')
+RELOAD_SECONDS = float(os.environ.get('LEARNMATE_MODEL_RELOAD_SECONDS', 30))
+# Saved BKT state (see knowledge_tracing.py); its mastery sets the difficulty mix of
+# /api/ml/next-questions, falling back to the student's weakness_analysis row
+BKT_STATE = os.environ.get('LEARNMATE_BKT_STATE')
+# Registry version scored in the background on live traffic for comparison (see shadow_scoring.py)
+SHADOW_VERSION = os.environ.get('LEARNMATE_SHADOW_VERSION')
+
+app = Flask(__name__)
+# Learning resources and topic ids are attached to predictions when the platform database is configured.
+# The indexes refresh on request threads under their own locks, and DB-API connections are not
+# thread-safe, so each index has its own connection.
+database_configured = bool(os.environ.get(DB_URL_ENV_VAR))
+recommendation_index = RecommendationIndex(connect()) if database_configured else None
+question_index = (QuestionIndex(connect(), tracer=KnowledgeTracer.load(BKT_STATE) if BKT_STATE else None)
+                  if database_configured else None)
+if TOPIC_CONFIG:
+    topic_mastery = TopicMastery.from_config(TOPIC_CONFIG)
+elif database_configured:
+    # Read once at startup, before any request thread uses the connection
+    topic_mastery = TopicMastery(TopicVocabulary.from_database(recommendation_index.connection))
+else:
+    topic_mastery = None
+predictor = WeaknessPredictor(MODEL_DIR, recommendation_index=recommendation_index, topic_mastery=topic_mastery,
+                              registry=MODEL_REGISTRY,
+                              shadow=ShadowScorer.from_registry(MODEL_REGISTRY, SHADOW_VERSION) if SHADOW_VERSION else None)
+# Watched even before the first promotion; until then the model in MODEL_DIR is served
+predictor.watch_registry(RELOAD_SECONDS)
+# Queue file shared with the incremental_scoring.py worker
+event_queue = SQLiteEventQueue(os.environ['LEARNMATE_EVENT_QUEUE']) if os.environ.get('LEARNMATE_EVENT_QUEUE') else None
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    model_loaded = predictor.model is not None and predictor.scaler is not None
+    return jsonify({
+        'status': 'healthy' if model_loaded else 'degraded',
+        'model_loaded': model_loaded,
+        'model_path': str(predictor.model_path),
+        'model_version': predictor.model_version,
+        'shadow_version': predictor.shadow.version if predictor.shadow is not None else None
+    }), 200 if model_loaded else 503
+
+
+@app.route('/api/ml/predict-weakness', methods=['POST'])
+def predict_weakness():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, (dict, list)) or not payload:
+        return jsonify({'error': 'Expected a JSON object or a non-empty list of objects'}), 400
+
+    records = payload if isinstance(payload, list) else [payload]
+    results = predictor.predict_batch(records)
+    if results is None:
+        return jsonify({'error': 'Prediction failed; see server logs'}), 422
+
+    return jsonify(results if isinstance(payload, list) else results[0])
+
+
+@app.route('/api/ml/next-questions', methods=['POST'])
+def next_questions():
+    if question_index is None:
+        return jsonify({'error': 'Question selection is not enabled (LEARNMATE_DB_URL)'}), 503
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or 'user_id' not in payload or 'topic_id' not in payload:
+        return jsonify({'error': 'Expected a JSON object with user_id and topic_id'}), 400
+    try:
+        questions = question_index.select(
+            int(payload['user_id']), int(payload['topic_id']),
+            count=int(payload.get('count', 10)),
+            # Mastery in [0, 1] or a strength level overriding the stored estimate;
+            # the slider's difficulty wins if given
+            estimate=payload.get('mastery', payload.get('strength_level')),
+            difficulty=payload.get('difficulty')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'questions': questions})
+
+
+@app.route('/api/ml/attempt-completed', methods=['POST'])
+def attempt_completed():
+    if event_queue is None:
+        return jsonify({'error': 'Incremental scoring is not enabled (LEARNMATE_EVENT_QUEUE)'}), 503
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        event_queue.put(payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'queued': True}), 202
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
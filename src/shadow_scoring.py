@@ -0,0 +1,128 @@
+"""
+Shadow scoring of a candidate model on live traffic
+
+WeaknessPredictor(shadow=ShadowScorer(...)) answers every request with its
+own (primary) model and hands the same input batch to the shadow. The
+candidate scores it on its own thread pool, and the comparison goes to the
+metrics registry (served on /metrics):
+
+    learnmate_shadow_batches{outcome}       scored, dropped (queue full), error
+    learnmate_shadow_records{agreement}     per-record agreement of predicted classes
+    learnmate_shadow_probability_delta      max |p_primary - p_shadow| over shared classes, per record
+    learnmate_shadow_model_seconds{model}   scaler + model time of primary and shadow per batch
+
+The primary path only pays for submit: a non-blocking semaphore check and
+an executor submit. When max_pending batches are already queued or running,
+the batch is dropped instead of queued, so a slow candidate cannot build a
+backlog or hold memory.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from metrics import REGISTRY
+from model_registry import MODEL_FILE, SCALER_FILE, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+SHADOW_BATCHES = REGISTRY.counter(
+    'learnmate_shadow_batches', 'Batches handed to the shadow model by outcome', ['outcome'])
+SHADOW_RECORDS = REGISTRY.counter(
+    'learnmate_shadow_records', 'Shadow-scored records by agreement with the primary model', ['agreement'])
+PROBABILITY_DELTA = REGISTRY.histogram(
+    'learnmate_shadow_probability_delta', 'Largest class-probability difference between primary and shadow per record',
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0))
+MODEL_SECONDS = REGISTRY.histogram(
+    'learnmate_shadow_model_seconds', 'Scaler and model time per batch of the primary and shadow models', ['model'])
+
+
+class ShadowScorer:
+    """Candidate model scored asynchronously next to the primary"""
+
+    def __init__(self, model, scaler, version: Optional[str] = None, workers: int = 1, max_pending: int = 4):
+        """
+        Args:
+            model: candidate estimator with predict_proba
+            scaler: its fitted transform
+            version: name reported in the logs
+            workers: scoring threads (they share the CPU with the primary)
+            max_pending: batches queued or running before new ones are dropped
+        """
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='shadow-scoring')
+
+    @classmethod
+    def from_directory(cls, path, **kwargs) -> 'ShadowScorer':
+        path = Path(path)
+        return cls(joblib.load(path / MODEL_FILE), joblib.load(path / SCALER_FILE), **kwargs)
+
+    @classmethod
+    def from_registry(cls, registry: ModelRegistry, version: str, **kwargs) -> 'ShadowScorer':
+        scorer = cls.from_directory(registry.version_dir(version), version=version, **kwargs)
+        logger.info(f"Shadow scoring with model version {version}")
+        return scorer
+
+    def submit(self, input_df: pd.DataFrame, classes: np.ndarray, probabilities: np.ndarray,
+               primary_seconds: float) -> bool:
+        """
+        Queue a batch the primary has scored; never blocks
+
+        Args:
+            input_df: the batch's input records (not modified afterwards)
+            classes: primary model classes_
+            probabilities: primary predict_proba output
+            primary_seconds: primary scaler + model time
+
+        Returns:
+            Whether the batch was queued (False: dropped on overload)
+        """
+        if not self._slots.acquire(blocking=False):
+            SHADOW_BATCHES.labels(outcome='dropped').inc()
+            return False
+        MODEL_SECONDS.labels(model='primary').observe(primary_seconds)
+        try:
+            future = self._executor.submit(self._score, input_df, classes, probabilities)
+        except RuntimeError:
+            # Executor shut down
+            self._slots.release()
+            SHADOW_BATCHES.labels(outcome='dropped').inc()
+            return False
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def _score(self, input_df: pd.DataFrame, classes: np.ndarray, probabilities: np.ndarray):
+        try:
+            start = time.perf_counter()
+            shadow_probabilities = self.model.predict_proba(
+                self.scaler.transform(input_df[self.scaler.feature_names_in_]))
+            MODEL_SECONDS.labels(model='shadow').observe(time.perf_counter() - start)
+
+            shadow_classes = self.model.classes_
+            agree = int((classes[probabilities.argmax(axis=1)] == shadow_classes[shadow_probabilities.argmax(axis=1)]).sum())
+            SHADOW_RECORDS.labels(agreement='agree').inc(agree)
+            SHADOW_RECORDS.labels(agreement='disagree').inc(len(probabilities) - agree)
+
+            # Compare probabilities of the classes both models know, matched by label
+            shared, primary_columns, shadow_columns = np.intersect1d(classes, shadow_classes, return_indices=True)
+            if len(shared):
+                deltas = np.abs(probabilities[:, primary_columns] - shadow_probabilities[:, shadow_columns]).max(axis=1)
+                for delta in deltas:
+                    PROBABILITY_DELTA.observe(float(delta))
+            SHADOW_BATCHES.labels(outcome='scored').inc()
+        except Exception as e:
+            SHADOW_BATCHES.labels(outcome='error').inc()
+            logger.error(f"Error in shadow scoring: {str(e)}")
+
+    def close(self, wait: bool = True):
+        """Stop accepting batches; with wait, finish the queued ones first"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
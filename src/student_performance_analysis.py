@@ -1,8 +1,7 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Tuple, List
+from typing import Tuple, List, Optional
+from report_renderer import ReportRenderer
 
 def load_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Load both math and portuguese datasets"""
@@ -55,38 +54,54 @@ def analyze_dataset(df: pd.DataFrame, subject: str) -> dict:
     
     return results, df
 
-def create_visualizations(df: pd.DataFrame, subject: str):
-    """Create and save visualizations"""
-    plt.style.use('seaborn')
-    
-    # Set up the figure size
-    plt.figure(figsize=(15, 10))
+def draw_subject_overview(fig, subject: str, grades, category_counts, correlations, box_df):
+    """Four-panel overview of one UCI subject"""
+    import seaborn as sns
     
     # 1. Distribution of final grades
-    plt.subplot(2, 2, 1)
-    sns.histplot(data=df, x='G3', bins=20)
-    plt.title(f'{subject} - Distribution of Final Grades')
+    ax = fig.add_subplot(2, 2, 1)
+    sns.histplot(x=grades, bins=20, ax=ax)
+    ax.set_xlabel('G3')
+    ax.set_title(f'{subject} - Distribution of Final Grades')
     
     # 2. Class distribution
-    plt.subplot(2, 2, 2)
-    sns.countplot(data=df, x='grade_category')
-    plt.title(f'{subject} - Grade Categories Distribution')
+    ax = fig.add_subplot(2, 2, 2)
+    sns.barplot(x=category_counts.index.astype(str), y=category_counts.values, ax=ax)
+    ax.set_xlabel('grade_category')
+    ax.set_ylabel('count')
+    ax.set_title(f'{subject} - Grade Categories Distribution')
     
     # 3. Correlation heatmap
-    plt.subplot(2, 2, 3)
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    sns.heatmap(df[numeric_cols].corr(), annot=True, cmap='coolwarm', fmt='.2f')
-    plt.title(f'{subject} - Correlation Heatmap')
+    ax = fig.add_subplot(2, 2, 3)
+    sns.heatmap(correlations, annot=True, cmap='coolwarm', fmt='.2f', ax=ax)
+    ax.set_title(f'{subject} - Correlation Heatmap')
     
     # 4. Box plots
-    plt.subplot(2, 2, 4)
+    ax = fig.add_subplot(2, 2, 4)
+    box_df.boxplot(ax=ax)
+    ax.set_title(f'{subject} - Key Features Distribution')
+    
+    fig.tight_layout()
+
+def create_visualizations(df: pd.DataFrame, subject: str, renderer: Optional[ReportRenderer] = None):
+    """Queue visualizations on renderer, or render them right away if none is given"""
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
     key_features = ['studytime', 'failures', 'absences', 'G1', 'G2', 'G3']
-    df[key_features].boxplot()
-    plt.title(f'{subject} - Key Features Distribution')
     
-    plt.tight_layout()
-    plt.savefig(f'{subject.lower()}_analysis.png')
-    plt.close()
+    target = renderer or ReportRenderer()
+    target.add(
+        draw_subject_overview,
+        f'{subject.lower()}_analysis.png',
+        figsize=(15, 10),
+        style='seaborn-v0_8',
+        subject=subject,
+        grades=df['G3'].to_numpy(),
+        category_counts=df['grade_category'].value_counts(sort=False),
+        correlations=df[numeric_cols].corr(),
+        box_df=df[key_features]
+    )
+    if renderer is None:
+        target.render()
 
 def save_report(math_results: dict, por_results: dict):
     """Save analysis report to file"""
@@ -136,12 +151,14 @@ def main():
     math_results, math_df = analyze_dataset(math_df, 'Mathematics')
     por_results, por_df = analyze_dataset(por_df, 'Portuguese')
     
-    # Create visualizations
-    create_visualizations(math_df, 'Mathematics')
-    create_visualizations(por_df, 'Portuguese')
+    # Queue visualizations; they are rendered in parallel once the report is saved
+    renderer = ReportRenderer()
+    create_visualizations(math_df, 'Mathematics', renderer)
+    create_visualizations(por_df, 'Portuguese', renderer)
     
     # Save report
     save_report(math_results, por_results)
+    renderer.render()
     
     # Print summaries
     print_summary(math_results, 'Mathematics')
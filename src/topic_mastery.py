@@ -0,0 +1,200 @@
+"""
+Per-topic mastery vectors and vectorized weak-topic detection
+
+A TopicVocabulary fixes the order of the topics, so each student's mastery
+is one float32 row (NaN = no evidence) and a batch is a (students x topics)
+matrix. Weak topics are the cells below their subject's threshold, ranked
+by how far below it they are. The whole batch is thresholded and ranked
+with array operations.
+
+The vocabulary comes from the topics table, a JSON config file, or (as a
+fallback) the topic_* features of the loaded model. Records carry mastery
+either as flat feature keys ('topic_data_structures': 0.45) or as a
+'topic_mastery' mapping keyed by topic id, name or feature name.
+
+Config file layout:
+    {
+      "default_threshold": 0.6,
+      "subject_thresholds": {"1": 0.5},
+      "topics": [{"topic_id": 1, "topic_name": "Arrays", "subject_id": 1}, ...]
+    }
+"""
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.6
+MASTERY_KEY = 'topic_mastery'
+FEATURE_PREFIX = 'topic_'
+# Model features that start with the prefix but are not mastery scores
+NON_MASTERY_FEATURES = ('topic_difficulty',)
+
+
+def topic_feature_name(topic_name: str) -> str:
+    """Flat feature key of a topic: 'Data Structures' -> 'topic_data_structures'"""
+    return FEATURE_PREFIX + re.sub(r'[^0-9a-z]+', '_', str(topic_name).lower()).strip('_')
+
+
+class TopicVocabulary:
+    """Fixed ordering of topics shared by every mastery matrix"""
+
+    def __init__(self, topic_names: Sequence[str], topic_ids: Optional[Sequence[int]] = None,
+                 subject_ids: Optional[Sequence[int]] = None, features: Optional[Sequence[str]] = None):
+        """
+        Args:
+            topic_names: display names, one per column
+            topic_ids: database ids (None when the vocabulary is not from the database)
+            subject_ids: subject of each topic, for per-subject thresholds
+            features: flat record keys (default: topic_feature_name of each name)
+        """
+        self.topic_names = [str(name) for name in topic_names]
+        self.topic_ids = None if topic_ids is None else np.asarray(topic_ids, dtype=np.int64)
+        self.subject_ids = (np.full(len(self.topic_names), -1, dtype=np.int64) if subject_ids is None
+                            else np.asarray(subject_ids, dtype=np.int64))
+        self.features = list(features) if features is not None else [topic_feature_name(name) for name in topic_names]
+
+        # Every key a record may use for a topic -> column
+        self._columns: Dict[Union[int, str], int] = {}
+        for column, (name, feature) in enumerate(zip(self.topic_names, self.features)):
+            self._columns[name.lower()] = column
+            self._columns[feature.lower()] = column
+        if self.topic_ids is not None:
+            self._columns.update({int(topic_id): column for column, topic_id in enumerate(self.topic_ids)})
+
+    def __len__(self) -> int:
+        return len(self.topic_names)
+
+    @classmethod
+    def from_database(cls, connection) -> 'TopicVocabulary':
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT topic_id, topic_name, subject_id FROM topics ORDER BY topic_id")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return cls([row[1] for row in rows], [row[0] for row in rows], [row[2] for row in rows])
+
+    @classmethod
+    def from_records(cls, topics: List[Dict]) -> 'TopicVocabulary':
+        """From dicts with topic_name and optional topic_id, subject_id and feature"""
+        has_ids = all('topic_id' in topic for topic in topics)
+        return cls(
+            [topic['topic_name'] for topic in topics],
+            [topic['topic_id'] for topic in topics] if has_ids else None,
+            [topic.get('subject_id', -1) for topic in topics],
+            [topic.get('feature') or topic_feature_name(topic['topic_name']) for topic in topics]
+        )
+
+    @classmethod
+    def from_feature_names(cls, feature_names: Sequence[str]) -> 'TopicVocabulary':
+        """The topic_* columns of a model's features; names are the feature names themselves"""
+        features = [str(feature) for feature in feature_names
+                    if str(feature).lower().startswith(FEATURE_PREFIX) and feature not in NON_MASTERY_FEATURES]
+        return cls(features, features=features)
+
+    def column(self, topic: Union[int, str]) -> Optional[int]:
+        """Column of a topic id, name or feature name"""
+        if isinstance(topic, (int, np.integer)):
+            return self._columns.get(int(topic))
+        return self._columns.get(str(topic).lower())
+
+    def mastery_matrix(self, records: Sequence[Dict]) -> np.ndarray:
+        """(len(records), len(self)) float32 mastery, NaN where a record has no value"""
+        frame = pd.DataFrame.from_records(records) if len(records) else pd.DataFrame()
+        matrix = (frame.reindex(columns=self.features)
+                       .apply(pd.to_numeric, errors='coerce')
+                       .to_numpy(dtype=np.float32, copy=True))
+        if MASTERY_KEY in frame.columns:
+            for row, mastery in enumerate(frame[MASTERY_KEY]):
+                if not isinstance(mastery, dict):
+                    continue
+                for topic, value in mastery.items():
+                    key = int(topic) if isinstance(topic, str) and topic.isdigit() else topic
+                    column = self.column(key)
+                    if column is not None and value is not None:
+                        matrix[row, column] = value
+        return matrix
+
+    def scatter(self, rows: np.ndarray, topic_ids: np.ndarray, values: np.ndarray, n_rows: int) -> np.ndarray:
+        """
+        Dense mastery from long-format rows (e.g. weakness_analysis avg_score / 100)
+
+        Args:
+            rows: student row of each value, in [0, n_rows)
+            topic_ids: topic id of each value
+            values: mastery values
+            n_rows: number of students
+        """
+        if self.topic_ids is None:
+            raise ValueError("Vocabulary has no topic ids")
+        order = np.argsort(self.topic_ids)
+        positions = np.searchsorted(self.topic_ids, topic_ids, sorter=order)
+        positions = np.minimum(positions, len(order) - 1)
+        columns = order[positions]
+        known = self.topic_ids[columns] == topic_ids
+        matrix = np.full((n_rows, len(self)), np.nan, dtype=np.float32)
+        matrix[np.asarray(rows)[known], columns[known]] = np.asarray(values, dtype=np.float32)[known]
+        return matrix
+
+
+class TopicMastery:
+    """Weak-topic detection over a TopicVocabulary with per-subject thresholds"""
+
+    def __init__(self, vocabulary: TopicVocabulary, default_threshold: float = DEFAULT_THRESHOLD,
+                 subject_thresholds: Optional[Dict[int, float]] = None, max_topics: Optional[int] = None):
+        """
+        Args:
+            vocabulary: topic ordering
+            default_threshold: mastery below this is weak
+            subject_thresholds: overrides of the threshold by subject_id
+            max_topics: keep at most this many weak topics per student (weakest first)
+        """
+        self.vocabulary = vocabulary
+        self.max_topics = max_topics
+        self.thresholds = np.full(len(vocabulary), default_threshold, dtype=np.float32)
+        for subject_id, threshold in (subject_thresholds or {}).items():
+            self.thresholds[vocabulary.subject_ids == int(subject_id)] = threshold
+
+    @classmethod
+    def from_config(cls, path, max_topics: Optional[int] = None) -> 'TopicMastery':
+        with open(Path(path)) as f:
+            config = json.load(f)
+        return cls(TopicVocabulary.from_records(config['topics']),
+                   config.get('default_threshold', DEFAULT_THRESHOLD),
+                   config.get('subject_thresholds'), max_topics)
+
+    def weak_columns(self, mastery: np.ndarray) -> List[np.ndarray]:
+        """Columns of each row's weak topics, largest shortfall first"""
+        if not len(mastery):
+            return []
+        shortfall = self.thresholds - mastery
+        # NaN (no evidence) compares False, so it is never weak
+        weak = shortfall > 0
+        order = np.argsort(np.where(weak, -shortfall, np.inf), axis=1, kind='stable')
+        counts = weak.sum(axis=1)
+        if self.max_topics is not None:
+            counts = np.minimum(counts, self.max_topics)
+        keep = np.arange(mastery.shape[1]) < counts[:, None]
+        return np.split(order[keep], np.cumsum(counts)[:-1])
+
+    def weak_topics(self, records: Sequence[Dict]) -> List[np.ndarray]:
+        """Weak-topic columns for a batch of records"""
+        if not len(self.vocabulary):
+            return [np.empty(0, dtype=np.int64) for _ in records]
+        return self.weak_columns(self.vocabulary.mastery_matrix(records))
+
+    def topic_names(self, columns: np.ndarray) -> List[str]:
+        return [self.vocabulary.topic_names[column] for column in columns]
+
+    def topic_ids(self, columns: np.ndarray) -> Optional[List[int]]:
+        """Database ids of the columns, or None if the vocabulary has none"""
+        if self.vocabulary.topic_ids is None:
+            return None
+        return self.vocabulary.topic_ids[columns].tolist()
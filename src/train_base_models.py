@@ -1,9 +1,12 @@
+import argparse
 import pandas as pd
 import numpy as np
 from base_models import BaseModels
+from preprocessor.ou_enhanced import OUEnhancedPreprocessor
 import logging
 import os
 import json
+from profiling import profiled
 
 # Set up logging
 logging.basicConfig(
@@ -22,7 +25,10 @@ def load_dataset(dataset_name):
     train_data = pd.read_csv(train_path)
     test_data = pd.read_csv(test_path)
     
-    # Separate features and target
+    return split_target(train_data, test_data)
+
+def split_target(train_data, test_data):
+    """Separate features and target of the train and test frames"""
     X_train = train_data.drop('weakness_level', axis=1)
     y_train = train_data['weakness_level']
     X_test = test_data.drop('weakness_level', axis=1)
@@ -30,23 +36,39 @@ def load_dataset(dataset_name):
     
     return X_train, X_test, y_train, y_test
 
-def train_base_models(dataset_name):
-    """Train base models for a specific dataset"""
+def train_base_models(dataset_name, preprocessor=None):
+    """Train base models for a specific dataset
+    
+    Args:
+        dataset_name: Dataset name, used for the saved results and registry
+        preprocessor: Optional preprocessor to take the train/test split from
+                      instead of data/processed; if it was built with
+                      balance_strategy='class_weight', its sample_weights()
+                      weight every fit
+    """
     logging.info(f"Training base models for {dataset_name} dataset")
     
     try:
         # Load data
-        X_train, X_test, y_train, y_test = load_dataset(dataset_name)
+        sample_weight = None
+        if preprocessor is None:
+            X_train, X_test, y_train, y_test = load_dataset(dataset_name)
+        else:
+            X_train, X_test, y_train, y_test = split_target(*preprocessor.preprocess())
+            if getattr(preprocessor, 'class_weights', None) is not None:
+                sample_weight = preprocessor.sample_weights(y_train)
+                logging.info(f"Weighting fits with class weights {preprocessor.class_weights}")
         
         # Initialize base models
         base_models = BaseModels(random_state=42)
         
         # Train all models
         logging.info("Starting model training...")
-        base_models.train_all_models(X_train, y_train, n_iter=20)
+        base_models.train_all_models(X_train, y_train, n_iter=20, sample_weight=sample_weight)
         
         # Save results
         base_models.save_results(dataset_name)
+        base_models.register_models(dataset_name, X_train.columns)
         
         # Get and save feature importance
         feature_importance = base_models.get_feature_importance(X_train.columns)
@@ -64,15 +86,25 @@ def train_base_models(dataset_name):
         logging.error(f"Error training models for {dataset_name}: {str(e)}")
         raise
 
+@profiled('train_base_models')
 def main():
     """Train base models for all datasets"""
+    parser = argparse.ArgumentParser(description="Train base models for all datasets")
+    parser.add_argument('--ou-balance', choices=['smote', 'class_weight'],
+                        help="Re-run OU preprocessing with this balance strategy instead of "
+                             "reading data/processed; 'class_weight' weights the fits")
+    args = parser.parse_args()
+    
     datasets = ['AI', 'UCI', 'OU']
     trained_models = {}
     
     for dataset in datasets:
         logging.info(f"\nProcessing {dataset} dataset...")
+        preprocessor = None
+        if dataset == 'OU' and args.ou_balance:
+            preprocessor = OUEnhancedPreprocessor(balance_strategy=args.ou_balance)
         try:
-            trained_models[dataset] = train_base_models(dataset)
+            trained_models[dataset] = train_base_models(dataset, preprocessor)
             logging.info(f"Successfully trained models for {dataset} dataset")
         except Exception as e:
             logging.error(f"Failed to train models for {dataset} dataset: {str(e)}")
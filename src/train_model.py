@@ -10,18 +10,39 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import GridSearchCV, StratifiedKFold
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 from sklearn.metrics import confusion_matrix, roc_curve, auc
-import xgboost as xgb
-import matplotlib.pyplot as plt
-import seaborn as sns
 import json
 import joblib
 from pathlib import Path
 import logging
+from model_registry import ModelRegistry
+from profiling import profiled
+from report_renderer import ReportRenderer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def draw_confusion_matrix(fig, cm, title):
+    """Annotated confusion-matrix heatmap"""
+    import seaborn as sns
+    
+    ax = fig.add_subplot()
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax)
+    ax.set_title(title)
+    ax.set_ylabel('True Label')
+    ax.set_xlabel('Predicted Label')
+
+
+def draw_feature_importance(fig, features, importances, title):
+    """Horizontal bar chart of feature importances (already sorted)"""
+    ax = fig.add_subplot()
+    ax.barh(features, importances)
+    ax.set_title(title)
+    ax.set_xlabel('Importance')
+    fig.tight_layout()
+
+
 class WeaknessClassifier:
     def __init__(self, base_path=None):
         """Initialize the classifier with data path"""
@@ -42,6 +63,7 @@ class WeaknessClassifier:
         self.model = None
         self.feature_columns = None
         self.target_column = 'weakness_level'  # Assuming target column name
+        self.renderer = ReportRenderer()
         
         logger.info(f"Using data path: {self.data_path}")
         logger.info(f"Using models path: {self.models_path}")
@@ -71,6 +93,8 @@ class WeaknessClassifier:
 
     def prepare_model(self):
         """Create the voting classifier with RF and XGBoost"""
+        import xgboost as xgb
+        
         logger.info("Preparing model...")
         
         # Initialize base models with regularization
@@ -177,36 +201,39 @@ class WeaknessClassifier:
         return metrics
 
     def _plot_confusion_matrix(self, y_true, y_pred, dataset_name):
-        """Plot confusion matrix for a dataset"""
-        plt.figure(figsize=(8, 6))
-        cm = confusion_matrix(y_true, y_pred)
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-        plt.title(f'Confusion Matrix - {dataset_name}')
-        plt.ylabel('True Label')
-        plt.xlabel('Predicted Label')
-        plt.savefig(f'reports/confusion_matrix_{dataset_name.lower()}.png')
-        plt.close()
+        """Queue the confusion matrix plot for a dataset"""
+        self.renderer.add(
+            draw_confusion_matrix,
+            f'reports/confusion_matrix_{dataset_name.lower()}.png',
+            cm=confusion_matrix(y_true, y_pred),
+            title=f'Confusion Matrix - {dataset_name}'
+        )
 
     def plot_feature_importance(self):
-        """Plot feature importance for Random Forest component"""
+        """Queue the feature importance plot for the Random Forest component"""
         rf_model = self.model.named_estimators_['rf']
         importance = rf_model.feature_importances_
         
-        plt.figure(figsize=(10, 6))
         importance_df = pd.DataFrame({
             'feature': self.feature_columns,
             'importance': importance
         }).sort_values('importance', ascending=True)
         
-        plt.barh(importance_df['feature'], importance_df['importance'])
-        plt.title('Feature Importance (Random Forest)')
-        plt.xlabel('Importance')
-        plt.tight_layout()
-        plt.savefig('reports/feature_importance.png')
-        plt.close()
+        self.renderer.add(
+            draw_feature_importance,
+            'reports/feature_importance.png',
+            figsize=(10, 6),
+            features=importance_df['feature'].tolist(),
+            importances=importance_df['importance'].to_numpy(),
+            title='Feature Importance (Random Forest)'
+        )
+
+    def render_figures(self):
+        """Render every queued figure (after the metrics are final)"""
+        return self.renderer.render()
 
-    def save_model(self):
-        """Save the trained model and scaler"""
+    def save_model(self, metrics=None):
+        """Save the trained model and scaler, and register them as the current version"""
         logger.info("Saving model and scaler...")
         
         try:
@@ -219,11 +246,17 @@ class WeaknessClassifier:
             
             logger.info(f"Model saved to: {model_path}")
             logger.info(f"Scaler saved to: {scaler_path}")
+            
+            # Immutable copy that running predictors with a registry swap in
+            version = ModelRegistry(self.models_path / 'registry').register(
+                self.model, self.scaler, self.feature_columns, metrics)
+            logger.info(f"Registered model version: {version}")
             return True
         except Exception as e:
             logger.error(f"Error saving model: {str(e)}")
             return False
 
+@profiled('train_model')
 def main():
     """Main execution function"""
     # Get the current working directory
@@ -241,22 +274,24 @@ def main():
     classifier.prepare_model()
     best_score = classifier.train_model()
     
-    # Save model immediately after training
-    classifier.save_model()
-    
-    logger.info(f"Model training completed successfully with best CV score: {best_score:.4f}")
-    
     # Save basic metrics
     metrics = {
         'cross_validation_score': best_score,
         'model_parameters': classifier.model.get_params()
     }
     
+    # Save model immediately after training
+    classifier.save_model(metrics)
+    
+    logger.info(f"Model training completed successfully with best CV score: {best_score:.4f}")
+    
     metrics_path = classifier.reports_path / 'model_metrics.json'
     with open(metrics_path, 'w') as f:
         json.dump(metrics, f, indent=4)
     
     logger.info(f"Metrics saved to: {metrics_path}")
+    
+    classifier.render_figures()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -17,6 +17,8 @@ import seaborn as sns
 import joblib
 from pathlib import Path
 import warnings
+from profiling import profiled
+from bootstrap_metrics import bootstrap_intervals, format_interval
 warnings.filterwarnings('ignore')
 
 def train_and_evaluate_dataset(dataset_name, train_path, test_path):
@@ -113,6 +115,11 @@ def train_and_evaluate_dataset(dataset_name, train_path, test_path):
     print(f"Recall:    {recall:.4f}")
     print(f"F1-Score:  {f1:.4f}")
     
+    intervals = bootstrap_intervals(y_test, y_pred)
+    print(f"\n95% bootstrap CI ({len(y_test)} test samples, 10000 resamples):")
+    for metric, interval in intervals.items():
+        print(f"  {metric.title():10s} {format_interval(interval)}")
+    
     print(f"\nPer-Class Metrics:")
     print(classification_report(y_test, y_pred, 
                                target_names=['Weak', 'Moderate', 'Strong'],
@@ -221,12 +228,17 @@ def train_and_evaluate_dataset(dataset_name, train_path, test_path):
         'precision': precision,
         'recall': recall,
         'f1_score': f1,
+        'accuracy_ci_lower': intervals['accuracy']['lower'],
+        'accuracy_ci_upper': intervals['accuracy']['upper'],
+        'f1_ci_lower': intervals['f1']['lower'],
+        'f1_ci_upper': intervals['f1']['upper'],
         'cv_f1_mean': cv_scores.mean(),
         'cv_f1_std': cv_scores.std(),
         'improvement': improvement,
         'baseline_avg': avg_baseline
     }
 
+@profiled('train_models')
 def main():
     """Main execution"""
     base_dir = Path('data') / 'processed'